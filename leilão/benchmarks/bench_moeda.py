@@ -0,0 +1,61 @@
+"""
+Microbenchmark: conversor vetorizado de moeda x cadeia de ``str.replace``.
+
+Uso: python leilão/benchmarks/bench_moeda.py [linhas ...]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nucleo.moeda import para_centavos, para_reais  # noqa: E402
+
+
+def cadeia_str_replace(serie):
+    """
+    Limpeza usada originalmente nas páginas
+    """
+    serie = serie.str.replace('R$', '', regex=False)
+    serie = serie.str.replace('.', '', regex=False)
+    serie = serie.str.replace(',', '.', regex=False)
+    serie = serie.str.strip()
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def gerar_valores(linhas, semente=0):
+    """
+    Série de valores "R$x.xxx,xx" com ~30% de células vazias
+    """
+    rng = np.random.default_rng(semente)
+    centavos = rng.integers(50_000, 50_000_000, size=linhas)
+    texto = [
+        'R$' + f'{c / 100:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        for c in centavos
+    ]
+    serie = pd.Series(texto, dtype=object)
+    serie[rng.random(linhas) < 0.3] = np.nan
+    return serie
+
+
+def medir(funcao, serie, repeticoes=5):
+    return min(timeit.repeat(lambda: funcao(serie), number=1, repeat=repeticoes))
+
+
+def main(tamanhos):
+    print(f"{'linhas':>10} {'str.replace':>12} {'para_reais':>12} {'para_centavos':>14} {'ganho':>7}")
+    for linhas in tamanhos:
+        serie = gerar_valores(linhas)
+        assert np.allclose(cadeia_str_replace(serie), para_reais(serie), equal_nan=True)
+
+        t_cadeia = medir(cadeia_str_replace, serie)
+        t_reais = medir(para_reais, serie)
+        t_centavos = medir(para_centavos, serie)
+        print(f'{linhas:>10} {t_cadeia:>11.4f}s {t_reais:>11.4f}s {t_centavos:>13.4f}s {t_cadeia / t_reais:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
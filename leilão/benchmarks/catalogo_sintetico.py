@@ -0,0 +1,163 @@
+"""
+Gerador de catálogos sintéticos de leilão, com as colunas de tabela.csv.
+
+As distribuições vêm do catálogo real: cada lote sorteia um veículo real
+(marca, modelo, tipo e avaliação de referência), com município, UF e cor
+pelas frequências observadas. A avaliação recebe uma variação log-normal,
+o lance inicial segue a razão lance/avaliação do veículo sorteado e a
+arrematação acontece com a taxa observada para o TIPO, com o ágio sorteado
+entre os ágios reais do mesmo TIPO. Os valores saem como "R$x.xxx,xx".
+
+Uso: python leilão/benchmarks/catalogo_sintetico.py linhas saida [--leiloes N] [--semente S]
+
+Com ``--leiloes`` o catálogo é dividido em N leilões mensais, no layout
+particionado de ``nucleo.dados`` (saida/leiloes/leilao=.../data=.../);
+sem, vira saida/tabela.csv. ``LEILAO_DADOS=saida`` abre o app nele.
+"""
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from nucleo.dados import COLUNAS_MOEDA, ler_tabela  # noqa: E402
+
+# Catálogo real de onde saem as distribuições (independe de LEILAO_DADOS)
+CATALOGO_REAL = RAIZ / 'dados' / 'tabela.csv'
+
+COLUNAS_VEICULO = ['CLASSIFICAÇÃO', 'PÁTIO', 'FAB/MOD', 'MARCA', 'MODELO', 'TIPO', 'NOME_POPULAR']
+
+# Linhas geradas e gravadas por vez, para limitar a memória em 10⁷ linhas
+LINHAS_POR_BLOCO = 500_000
+
+PRIMEIRO_LOTE = 30_000_000
+
+
+def formatar_reais(valores):
+    """
+    Valores em reais como "R$x.xxx,xx" (None onde ausente)
+    """
+    centavos = np.round(np.asarray(valores, dtype=np.float64) * 100)
+    ausentes = np.isnan(centavos)
+    inteiros = np.where(ausentes, 0, centavos).astype(np.int64)
+    texto = [f'R${c // 100:_},{c % 100:02d}'.replace('_', '.') for c in inteiros.tolist()]
+    return pd.Series(texto, dtype=object).mask(ausentes)
+
+
+class ModeloCatalogo:
+    """
+    Distribuições empíricas de um catálogo real, para sortear lotes
+    """
+
+    def __init__(self, caminho=CATALOGO_REAL):
+        brutos = pd.read_csv(caminho, dtype=str, encoding='utf-8')
+        limpos = ler_tabela(caminho)
+        self.veiculos = brutos[COLUNAS_VEICULO].reset_index(drop=True)
+        self.avaliacao = limpos['AVALIAÇÃO'].to_numpy(dtype=np.float64)
+        self.razao_lance = (limpos['Lance Inicial'] / limpos['AVALIAÇÃO']).fillna(0.3).to_numpy(dtype=np.float64)
+
+        self.frequencias = {
+            col: brutos[col].value_counts(normalize=True) for col in ['MUNICÍPIO', 'UF', 'COR']
+        }
+
+        self.taxa_arrematacao = {}
+        self.agios = {}
+        for tipo, grupo in limpos.groupby('TIPO', observed=True):
+            vendidos = grupo['Valor da Arrematação'].notna()
+            self.taxa_arrematacao[tipo] = vendidos.mean()
+            agio = grupo['Valor da Arrematação'] / grupo['Lance Inicial']
+            self.agios[tipo] = agio[vendidos].dropna().to_numpy(dtype=np.float64)
+
+    def _categorica(self, col, linhas, rng):
+        frequencias = self.frequencias[col]
+        return frequencias.index.to_numpy()[rng.choice(len(frequencias), size=linhas, p=frequencias.to_numpy())]
+
+    def gerar(self, linhas, primeiro_lote=PRIMEIRO_LOTE, rng=None):
+        """
+        DataFrame de ``linhas`` lotes no formato do CSV original
+        """
+        rng = rng or np.random.default_rng(0)
+        origem = rng.integers(0, len(self.veiculos), size=linhas)
+        veiculos = self.veiculos.iloc[origem].reset_index(drop=True)
+
+        avaliacao = np.round(self.avaliacao[origem] * rng.lognormal(0, 0.15, size=linhas))
+        lance = np.round(avaliacao * self.razao_lance[origem], 2)
+
+        arrematacao = np.full(linhas, np.nan)
+        tipos = veiculos['TIPO'].to_numpy()
+        for tipo, taxa in self.taxa_arrematacao.items():
+            posicoes = np.flatnonzero((tipos == tipo) & (rng.random(linhas) < taxa))
+            if len(self.agios[tipo]):
+                agio = self.agios[tipo][rng.integers(0, len(self.agios[tipo]), size=len(posicoes))]
+                arrematacao[posicoes] = np.round(lance[posicoes] * agio, 2)
+
+        df = pd.DataFrame({
+            'LOTE': np.arange(primeiro_lote, primeiro_lote + linhas),
+            'MUNICÍPIO': self._categorica('MUNICÍPIO', linhas, rng),
+            'CLASSIFICAÇÃO': veiculos['CLASSIFICAÇÃO'],
+            'PÁTIO': veiculos['PÁTIO'],
+            'FAB/MOD': veiculos['FAB/MOD'],
+            'UF': self._categorica('UF', linhas, rng),
+            'MARCA': veiculos['MARCA'],
+            'MODELO': veiculos['MODELO'],
+            'TIPO': veiculos['TIPO'],
+            'COR': self._categorica('COR', linhas, rng),
+            'NOME_POPULAR': veiculos['NOME_POPULAR'],
+        })
+        for col, valores in zip(COLUNAS_MOEDA, [avaliacao, lance, arrematacao]):
+            df[col] = formatar_reais(valores)
+        return df
+
+
+def gravar_csv(modelo, linhas, caminho, primeiro_lote=PRIMEIRO_LOTE, rng=None):
+    """
+    Gera ``linhas`` lotes em blocos e grava em ``caminho``
+    """
+    rng = rng or np.random.default_rng(0)
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    for inicio in range(0, linhas, LINHAS_POR_BLOCO):
+        bloco = modelo.gerar(min(LINHAS_POR_BLOCO, linhas - inicio), primeiro_lote + inicio, rng)
+        bloco.to_csv(caminho, mode='w' if inicio == 0 else 'a', header=inicio == 0, index=False, encoding='utf-8')
+    return caminho
+
+
+def gerar_catalogo(linhas, saida, leiloes=None, semente=0, modelo=None):
+    """
+    Grava um catálogo sintético em ``saida`` e devolve os CSVs criados
+    """
+    modelo = modelo or ModeloCatalogo()
+    rng = np.random.default_rng(semente)
+    saida = Path(saida)
+    if not leiloes:
+        return [gravar_csv(modelo, linhas, saida / 'tabela.csv', rng=rng)]
+
+    caminhos = []
+    limites = np.linspace(0, linhas, leiloes + 1).astype(np.int64)
+    for i in range(leiloes):
+        data = date(2024 + i // 12, i % 12 + 1, 15)
+        caminho = saida / 'leiloes' / f'leilao=sintetico-{i + 1:02d}' / f'data={data}' / 'catalogo.csv'
+        quantidade = int(limites[i + 1] - limites[i])
+        caminhos.append(gravar_csv(modelo, quantidade, caminho, PRIMEIRO_LOTE + int(limites[i]), rng))
+    return caminhos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas', type=int)
+    parser.add_argument('saida', type=Path)
+    parser.add_argument('--leiloes', type=int, help='divide o catálogo em N leilões particionados')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    for caminho in gerar_catalogo(args.linhas, args.saida, args.leiloes, args.semente):
+        print(caminho)
+
+
+if __name__ == '__main__':
+    main()
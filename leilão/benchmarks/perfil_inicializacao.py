@@ -0,0 +1,104 @@
+"""
+Perfil de inicialização das páginas: tempo de import e do primeiro render.
+
+Cada página roda em um processo novo, como em um contêiner recém-iniciado.
+Primeiro são executados só os imports do topo do script, medidos um a um;
+depois vem o primeiro render completo pelo AppTest do Streamlit (com os
+caches vazios, inclui a carga dos dados) e um rerun, para comparação.
+
+Uso: python leilão/benchmarks/perfil_inicializacao.py [--json arquivo] [páginas ...]
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def paginas_do_app():
+    """
+    Script principal seguido das páginas, na ordem do menu
+    """
+    return sorted(RAIZ.glob('*.py')) + sorted((RAIZ / 'pages').glob('*.py'))
+
+
+def medir_pagina(pagina):
+    """
+    Mede, no processo atual, os imports do topo e os dois primeiros renders
+    """
+    pagina = Path(pagina).resolve()
+    sys.path.insert(0, str(RAIZ))
+    os.chdir(RAIZ)
+
+    arvore = ast.parse(pagina.read_text(encoding='utf-8'))
+    imports = {}
+    for no in arvore.body:
+        if isinstance(no, (ast.Import, ast.ImportFrom)):
+            codigo = compile(ast.Module([no], type_ignores=[]), str(pagina), 'exec')
+            inicio = time.perf_counter()
+            exec(codigo, {})
+            imports[ast.unparse(no)] = time.perf_counter() - inicio
+
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(pagina), default_timeout=300)
+    inicio = time.perf_counter()
+    app.run()
+    primeiro_render = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    app.run()
+    rerun = time.perf_counter() - inicio
+
+    return {
+        'pagina': pagina.name,
+        'imports': sum(imports.values()),
+        'primeiro_render': primeiro_render,
+        'rerun': rerun,
+        'imports_mais_lentos': sorted(imports.items(), key=lambda item: -item[1])[:3],
+        'erros': [str(erro.value) for erro in app.exception],
+    }
+
+
+def perfilar(pagina):
+    """
+    Roda ``medir_pagina`` em um processo Python novo
+    """
+    saida = subprocess.run(
+        [sys.executable, __file__, '--filho', str(pagina)],
+        capture_output=True, text=True, encoding='utf-8', check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paginas', nargs='*', type=Path)
+    parser.add_argument('--json', type=Path, help='grava os resultados neste arquivo')
+    parser.add_argument('--filho', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(medir_pagina(args.filho), ensure_ascii=False))
+        return
+
+    resultados = [perfilar(pagina) for pagina in args.paginas or paginas_do_app()]
+
+    print(f"{'página':<45} {'imports':>8} {'1º render':>10} {'rerun':>7}  import mais lento")
+    for r in resultados:
+        lento, segundos = r['imports_mais_lentos'][0] if r['imports_mais_lentos'] else ('-', 0)
+        print(f"{r['pagina'][:45]:<45} {r['imports']:>7.2f}s {r['primeiro_render']:>9.2f}s {r['rerun']:>6.2f}s  {lento} ({segundos:.2f}s)")
+        for erro in r['erros']:
+            print(f'    erro: {erro}')
+
+    if args.json:
+        args.json.write_text(json.dumps(resultados, ensure_ascii=False, indent=1), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
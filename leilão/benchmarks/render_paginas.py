@@ -0,0 +1,295 @@
+"""
+Render headless das páginas com tempo por seção, memória de pico e relatório JSON.
+
+Cada página roda pelo AppTest do Streamlit em um processo novo, com os
+dados de ``--dados`` (ou um catálogo sintético de ``--linhas`` lotes) e,
+opcionalmente, com valores de widgets aplicados antes do render medido.
+Os métodos de elementos do Streamlit são instrumentados: o tempo desde o
+elemento anterior (cálculo + envio) é atribuído ao elemento seguinte, e
+os elementos são agrupados em seções - o bloco de métricas, cada gráfico
+e cada tabela - rotuladas pelo último título/expander visto.
+
+Estado dos widgets (``--estado``): JSON {"tipo:rótulo": valor}, aplicado nas
+páginas que têm o widget, por exemplo
+{"multiselect:Marcas:": ["FIAT"], "toggle:🎲 Simular aluguel de caminhões": true}.
+
+Uso: python leilão/benchmarks/render_paginas.py [páginas ...] [--dados DIR | --linhas N]
+     [--estado arquivo] [--json relatorio] [--base relatorio_anterior]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import wraps
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from perfil_inicializacao import RAIZ, paginas_do_app  # noqa: E402
+
+# Método do Streamlit -> tipo de seção
+ELEMENTOS = {
+    'metric': 'métricas',
+    'plotly_chart': 'gráfico',
+    'pyplot': 'gráfico',
+    'image': 'gráfico',
+    'map': 'gráfico',
+    'dataframe': 'tabela',
+    'table': 'tabela',
+    'data_editor': 'tabela',
+}
+
+# Métodos cujo primeiro argumento rotula as seções seguintes
+TITULOS = ('title', 'header', 'subheader', 'expander')
+
+
+class Cronometro:
+    """
+    Tempos por seção de um render, alimentados pelos métodos instrumentados
+    """
+
+    def __init__(self):
+        self.iniciar()
+
+    def iniciar(self):
+        self.ultimo = time.perf_counter()
+        self.titulo = None
+        self.secoes = []
+
+    def rotular(self, titulo):
+        self.titulo = str(titulo)
+
+    def registrar(self, tipo, nome, inicio, fim):
+        anterior = self.secoes[-1] if self.secoes else None
+        # Métricas seguidas sob o mesmo título formam um único bloco
+        if tipo == 'métricas' and anterior and anterior['tipo'] == tipo and anterior['titulo'] == self.titulo:
+            anterior['segundos'] += fim - inicio
+            anterior['elementos'] += 1
+        else:
+            self.secoes.append({
+                'secao': f'{tipo}: {nome or self.titulo or "-"}',
+                'tipo': tipo,
+                'titulo': self.titulo,
+                'segundos': fim - inicio,
+                'elementos': 1,
+            })
+        self.ultimo = fim
+
+    def encerrar(self):
+        """
+        Fecha o render: o que veio depois do último elemento vira 'restante'
+        """
+        restante = time.perf_counter() - self.ultimo
+        return self.secoes + [{'secao': 'restante', 'tipo': 'restante', 'titulo': None,
+                               'segundos': restante, 'elementos': 0}]
+
+
+def _nome_figura(argumentos):
+    """
+    Título da figura Plotly passada ao elemento, se houver
+    """
+    figura = argumentos[0] if argumentos else None
+    try:
+        return figura.layout.title.text
+    except AttributeError:
+        return None
+
+
+def instrumentar(cronometro):
+    """
+    Envolve os métodos de ``DeltaGenerator`` (e os atalhos ``st.*``) para
+    alimentar o cronômetro
+    """
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+
+    def envolver_elemento(metodo, tipo):
+        @wraps(metodo)
+        def envolvido(self, *args, **kwargs):
+            inicio = cronometro.ultimo
+            resultado = metodo(self, *args, **kwargs)
+            cronometro.registrar(tipo, _nome_figura(args) if tipo == 'gráfico' else None, inicio, time.perf_counter())
+            return resultado
+        return envolvido
+
+    def envolver_titulo(metodo):
+        @wraps(metodo)
+        def envolvido(self, *args, **kwargs):
+            if args:
+                cronometro.rotular(args[0])
+            return metodo(self, *args, **kwargs)
+        return envolvido
+
+    for nome, tipo in ELEMENTOS.items():
+        setattr(DeltaGenerator, nome, envolver_elemento(getattr(DeltaGenerator, nome), tipo))
+    for nome in TITULOS:
+        setattr(DeltaGenerator, nome, envolver_titulo(getattr(DeltaGenerator, nome)))
+    for nome in [*ELEMENTOS, *TITULOS]:
+        setattr(st, nome, getattr(st._main, nome))
+
+
+def aplicar_estado(app, estado):
+    """
+    Define no AppTest os valores de widgets {"tipo:rótulo": valor} que
+    existem na página; devolve as chaves aplicadas
+    """
+    aplicadas = []
+    for chave, valor in estado.items():
+        tipo, _, rotulo = chave.partition(':')
+        widgets = [w for w in getattr(app, tipo) if w.label == rotulo]
+        if widgets:
+            widgets[0].set_value(valor)
+            aplicadas.append(chave)
+    return aplicadas
+
+
+def medir_render(app, cronometro, memoria):
+    """
+    Executa um render e devolve tempo total, seções e memória de pico
+    """
+    if memoria:
+        tracemalloc.start()
+    cronometro.iniciar()
+    inicio = time.perf_counter()
+    app.run()
+    segundos = time.perf_counter() - inicio
+    secoes = cronometro.encerrar()
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return {
+        'segundos': segundos,
+        'memoria_pico_mb': pico,
+        'secoes': [{k: v for k, v in secao.items() if k != 'titulo'} for secao in secoes],
+        'erros': [str(erro.value) for erro in app.exception],
+    }
+
+
+def medir_pagina(pagina, estado, memoria):
+    """
+    Renders de uma página no processo atual: primeiro (caches vazios),
+    com o estado dos widgets (se houver) e um rerun
+    """
+    pagina = Path(pagina).resolve()
+    sys.path.insert(0, str(RAIZ))
+    os.chdir(RAIZ)
+
+    from streamlit.testing.v1 import AppTest
+
+    cronometro = Cronometro()
+    instrumentar(cronometro)
+    app = AppTest.from_file(str(pagina), default_timeout=600)
+
+    renders = {'primeiro': medir_render(app, cronometro, memoria)}
+    aplicadas = aplicar_estado(app, estado)
+    if aplicadas:
+        renders['com_estado'] = medir_render(app, cronometro, memoria)
+    renders['rerun'] = medir_render(app, cronometro, memoria)
+
+    return {
+        'pagina': pagina.name,
+        'estado_aplicado': aplicadas,
+        'renders': renders,
+        # Pico de memória residente do processo inteiro (imports incluídos)
+        'rss_pico_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def renderizar(pagina, estado, memoria, dados):
+    """
+    Roda ``medir_pagina`` em um processo Python novo, com LEILAO_DADOS=dados
+    """
+    ambiente = {**os.environ, **({'LEILAO_DADOS': str(dados)} if dados else {})}
+    comando = [sys.executable, __file__, '--filho', str(pagina), '--estado-json', json.dumps(estado)]
+    if not memoria:
+        comando.append('--sem-memoria')
+    saida = subprocess.run(
+        comando, capture_output=True, text=True, encoding='utf-8', check=True, env=ambiente
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def comparar(atual, base):
+    """
+    Diferenças de tempo por página, render e seção entre dois relatórios
+    """
+    anteriores = {p['pagina']: p for p in base['paginas']}
+    for pagina in atual['paginas']:
+        anterior = anteriores.get(pagina['pagina'])
+        if anterior is None:
+            continue
+        print(pagina['pagina'])
+        for render, medidas in pagina['renders'].items():
+            antes = anterior['renders'].get(render)
+            if antes is None:
+                continue
+            print(f"  {render:<12} {antes['segundos']:>8.3f}s -> {medidas['segundos']:>8.3f}s")
+            secoes_antes = {s['secao']: s['segundos'] for s in antes['secoes']}
+            for secao in medidas['secoes']:
+                if secao['secao'] in secoes_antes:
+                    delta = secao['segundos'] - secoes_antes[secao['secao']]
+                    print(f"    {secao['secao'][:60]:<60} {delta:>+8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paginas', nargs='*', type=Path)
+    parser.add_argument('--dados', type=Path, help='diretório de dados (LEILAO_DADOS)')
+    parser.add_argument('--linhas', type=int, help='gera um catálogo sintético com N lotes')
+    parser.add_argument('--estado', type=Path, help='JSON com valores de widgets')
+    parser.add_argument('--sem-memoria', action='store_true', help='não mede a memória (tracemalloc deixa o render mais lento)')
+    parser.add_argument('--json', type=Path, help='grava o relatório neste arquivo')
+    parser.add_argument('--base', type=Path, help='relatório anterior para comparação')
+    parser.add_argument('--filho', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--estado-json', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        resultado = medir_pagina(args.filho, json.loads(args.estado_json), not args.sem_memoria)
+        print(json.dumps(resultado, ensure_ascii=False))
+        return
+
+    estado = json.loads(args.estado.read_text(encoding='utf-8')) if args.estado else {}
+    with tempfile.TemporaryDirectory() as temporario:
+        dados = args.dados
+        if args.linhas:
+            from catalogo_sintetico import gerar_catalogo
+
+            gerar_catalogo(args.linhas, temporario)
+            dados = Path(temporario)
+
+        paginas = [renderizar(p, estado, not args.sem_memoria, dados) for p in args.paginas or paginas_do_app()]
+
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=RAIZ).stdout.strip()
+    relatorio = {
+        'commit': commit or None,
+        'dados': str(args.dados) if args.dados else (f'sintetico:{args.linhas}' if args.linhas else 'padrao'),
+        'estado': estado,
+        'paginas': paginas,
+    }
+
+    for pagina in paginas:
+        primeiro = pagina['renders']['primeiro']
+        memoria = f"{primeiro['memoria_pico_mb']:.1f} MB" if primeiro['memoria_pico_mb'] is not None else '-'
+        print(f"{pagina['pagina']}  {primeiro['segundos']:.3f}s  pico {memoria}")
+        for secao in sorted(primeiro['secoes'], key=lambda s: -s['segundos'])[:5]:
+            print(f"    {secao['secao'][:60]:<60} {secao['segundos']:>8.3f}s")
+        for render in pagina['renders'].values():
+            for erro in render['erros']:
+                print(f'    erro: {erro}')
+
+    if args.json:
+        args.json.write_text(json.dumps(relatorio, ensure_ascii=False, indent=1), encoding='utf-8')
+
+    if args.base:
+        comparar(relatorio, json.loads(args.base.read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
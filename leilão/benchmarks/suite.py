@@ -0,0 +1,187 @@
+"""
+Suíte de benchmarks em catálogos sintéticos: carga, filtros, agregações e figuras.
+
+Para cada tamanho é gerado um catálogo (benchmarks/catalogo_sintetico.py)
+em um diretório temporário e cada etapa usada pelas páginas é cronometrada
+no processo atual (melhor de N repetições). Com ``--paginas``, cada página
+também é renderizada pelo AppTest em um processo novo com ``LEILAO_DADOS``
+apontando para o catálogo, como em perfil_inicializacao.py.
+
+Com ``--base`` os tempos são comparados a um JSON gravado antes com
+``--json``; etapas mais lentas que a tolerância são listadas e o script
+termina com código 1.
+
+Uso: python leilão/benchmarks/suite.py [linhas ...] [--paginas] [--json arquivo] [--base arquivo]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import plotly.express as px  # noqa: E402
+
+from catalogo_sintetico import ModeloCatalogo, gerar_catalogo  # noqa: E402
+from nucleo.amostragem import amostra_por_densidade  # noqa: E402
+from nucleo.cubo import CuboAgregado  # noqa: E402
+from nucleo.dados import carregar_tabela, ler_tabela, preprocessar  # noqa: E402
+from nucleo.derivadas import adicionar_derivadas  # noqa: E402
+from nucleo.esbocos import esbocos_por_tipo  # noqa: E402
+from nucleo.filtros import IndiceFiltros  # noqa: E402
+from nucleo.geo import IndiceLocalizacoes, oportunidades_no_raio  # noqa: E402
+from nucleo.ingestao import upsert  # noqa: E402
+from nucleo.metricas import calcular_metricas_gerais  # noqa: E402
+
+# Diferença mínima (s) para uma etapa mais lenta contar como regressão
+RUIDO_SEGUNDOS = 0.005
+
+
+def medir(funcao, repeticoes):
+    return min(timeit.repeat(funcao, number=1, repeat=repeticoes))
+
+
+def etapas(caminho):
+    """
+    (nome, função) de cada etapa, na ordem em que as páginas as executam.
+    As funções compartilham o estado das anteriores (tabela, índice, cubo).
+    """
+    estado = {}
+
+    def carregar():
+        estado['df'] = adicionar_derivadas(carregar_tabela(caminho))
+
+    def indice():
+        estado['indice'] = IndiceFiltros(estado['df'], ['MUNICÍPIO', 'Categoria Valor', 'TIPO'])
+
+    def selecao():
+        # Metade dos municípios, todos os tipos: filtro típico da página 2
+        municipios = sorted(estado['indice'].valores('MUNICÍPIO'))
+        return {'MUNICÍPIO': municipios[::2], 'TIPO': estado['indice'].valores('TIPO')}
+
+    def filtro_pandas():
+        df, filtros = estado['df'], selecao()
+        return df[df['MUNICÍPIO'].isin(filtros['MUNICÍPIO']) & df['TIPO'].isin(filtros['TIPO'])]
+
+    def cubo():
+        estado['cubo'] = CuboAgregado.de_linhas(estado['df'])
+
+    def ingestao():
+        # Resultado novo para 1% dos lotes: upsert com derivadas + cubo incremental
+        delta = estado['df'][['LOTE', 'Lance Inicial']].iloc[::100].rename(
+            columns={'Lance Inicial': 'Valor da Arrematação'})
+        _, removidas, inseridas = upsert(estado['df'], delta, completar=adicionar_derivadas)
+        return estado['cubo'].atualizar(removidas, inseridas)
+
+    def busca_raio():
+        # Base em Cuiabá, 300 km: distâncias de todos os lotes e ranking por margem
+        localizacoes = IndiceLocalizacoes(estado['df'])
+        distancias = localizacoes.distancias(-15.601, -56.0974)
+        return oportunidades_no_raio(estado['df'], distancias, 300, 5.0)
+
+    def treemap():
+        dados = estado['cubo'].agregar(['MARCA', 'NOME_POPULAR'])
+        return px.treemap(dados, path=['MARCA', 'NOME_POPULAR'], values='qtd_lotes')
+
+    def dispersao():
+        pontos = amostra_por_densidade(estado['df'], 'AVALIAÇÃO', 'Valor da Arrematação')
+        return px.scatter(
+            pontos, x='AVALIAÇÃO', y='Valor da Arrematação', color='TIPO',
+            render_mode='webgl' if len(pontos) > 1000 else 'svg'
+        )
+
+    return [
+        ('ler_csv', lambda: ler_tabela(caminho)),
+        ('preprocessar', lambda: preprocessar(caminho)),
+        ('carregar_feather', carregar),
+        ('metricas_gerais', lambda: calcular_metricas_gerais(estado['df'])),
+        ('indice_filtros', indice),
+        ('filtro_bitmap', lambda: estado['df'][estado['indice'].mascara(selecao())]),
+        ('filtro_pandas', filtro_pandas),
+        ('groupby_municipio', lambda: estado['df'].groupby('MUNICÍPIO', observed=True).agg(
+            lotes=('LOTE', 'count'), arrematacao=('Valor da Arrematação', 'mean'))),
+        ('cubo', cubo),
+        ('cubo_filtrar_agregar', lambda: estado['cubo'].filtrar(selecao()).agregar(['MUNICÍPIO'])),
+        ('ingestao_delta', ingestao),
+        ('esbocos_lances', lambda: esbocos_por_tipo(estado['df'])),
+        ('busca_raio', busca_raio),
+        ('figura_treemap', treemap),
+        ('figura_dispersao', dispersao),
+    ]
+
+
+def medir_catalogo(linhas, modelo, repeticoes, paginas):
+    """
+    Tempos de cada etapa (e de cada página, se pedido) para ``linhas`` lotes
+    """
+    resultados = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho, = gerar_catalogo(linhas, diretorio, modelo=modelo)
+        for nome, funcao in etapas(caminho):
+            resultados[nome] = medir(funcao, repeticoes)
+
+        if paginas:
+            from perfil_inicializacao import paginas_do_app, perfilar
+
+            os.environ['LEILAO_DADOS'] = diretorio
+            try:
+                for pagina in paginas_do_app():
+                    perfil = perfilar(pagina)
+                    resultados[f"pagina:{perfil['pagina']}"] = perfil['primeiro_render']
+                    resultados[f"rerun:{perfil['pagina']}"] = perfil['rerun']
+            finally:
+                del os.environ['LEILAO_DADOS']
+    return resultados
+
+
+def regressoes(atuais, base, tolerancia):
+    """
+    Etapas (linhas, nome, base, atual) mais lentas que a base além da tolerância
+    """
+    lentas = []
+    for linhas, tempos in atuais.items():
+        for nome, atual in tempos.items():
+            anterior = base.get(linhas, {}).get(nome)
+            if anterior is not None and atual > anterior * (1 + tolerancia) and atual - anterior > RUIDO_SEGUNDOS:
+                lentas.append((linhas, nome, anterior, atual))
+    return lentas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas', nargs='*', type=int)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--paginas', action='store_true', help='renderiza também cada página (AppTest)')
+    parser.add_argument('--json', type=Path, help='grava os resultados neste arquivo')
+    parser.add_argument('--base', type=Path, help='compara com resultados gravados antes')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='fração de lentidão aceita (padrão 0,25)')
+    args = parser.parse_args()
+
+    modelo = ModeloCatalogo()
+    resultados = {}
+    for linhas in args.linhas or [1_000, 100_000, 1_000_000]:
+        resultados[str(linhas)] = medir_catalogo(linhas, modelo, args.repeticoes, args.paginas)
+
+    tamanhos = list(resultados)
+    print(f"{'etapa':<50}" + ''.join(f'{linhas:>12}' for linhas in tamanhos))
+    for nome in resultados[tamanhos[0]]:
+        print(f'{nome[:50]:<50}' + ''.join(f'{resultados[linhas][nome]:>11.4f}s' for linhas in tamanhos))
+
+    if args.json:
+        args.json.write_text(json.dumps(resultados, ensure_ascii=False, indent=1), encoding='utf-8')
+
+    if args.base:
+        lentas = regressoes(resultados, json.loads(args.base.read_text(encoding='utf-8')), args.tolerancia)
+        for linhas, nome, anterior, atual in lentas:
+            print(f'REGRESSÃO {nome} ({linhas} linhas): {anterior:.4f}s -> {atual:.4f}s')
+        if lentas:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Verificação da ingestão incremental: carga incremental == carga do zero.
+
+Monta um catálogo sintético particionado por UF do pátio
+(leiloes/leilao=.../data=.../uf=MT|GO/) em que as duas partições usam os
+mesmos números de LOTE e a coluna UF (emplacamento) difere da UF da
+partição. Registra deltas com resultados de lotes existentes e lotes
+novos em cada partição e compara a tabela e o cubo atualizados pelos
+deltas (``CargasIncrementais``) com os de uma carga nova dos mesmos
+arquivos. Nas rodadas pares os deltas são consolidados antes da
+comparação, que também confere que a versão não mudou com isso. Termina
+com código 1 se houver diferença.
+
+Uso: python leilão/benchmarks/verificar_ingestao.py [linhas] [--rodadas N]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# O diretório de dados precisa ser definido antes de importar nucleo.dados
+DIRETORIO = Path(tempfile.mkdtemp(prefix='leilao-ingestao-'))
+os.environ['LEILAO_DADOS'] = str(DIRETORIO)
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from catalogo_sintetico import PRIMEIRO_LOTE, ModeloCatalogo, gravar_csv  # noqa: E402
+from nucleo.cubo import CuboAgregado  # noqa: E402
+from nucleo.dados import COLUNA_PARTICAO, caminho_cache, listar_particoes, versao_dados  # noqa: E402
+from nucleo.ingestao import CargasIncrementais, consolidar_deltas, gravar_delta  # noqa: E402
+
+
+def montar_catalogo(linhas, rng):
+    """
+    Duas partições do mesmo leilão (pátios em MT e GO) com os mesmos LOTEs
+    """
+    modelo = ModeloCatalogo()
+    particao = DIRETORIO / 'leiloes' / 'leilao=verificacao' / 'data=2024-01-15'
+    for uf in ('MT', 'GO'):
+        gravar_csv(modelo, linhas, particao / f'uf={uf}' / 'catalogo.csv', PRIMEIRO_LOTE, rng)
+
+
+def _reais(valores):
+    return [f'R${valor:.2f}'.replace('.', ',') for valor in valores]
+
+
+def registrar_rodada(df, rng, proximo_lote):
+    """
+    Dois deltas por partição: resultado de 5% dos lotes e três lotes novos
+    """
+    for caminho in listar_particoes()['caminho']:
+        lotes = df.loc[df[COLUNA_PARTICAO] == caminho.relative_to(DIRETORIO).as_posix(), 'LOTE'].to_numpy()
+        atualizados = rng.choice(lotes, size=max(1, len(lotes) // 20), replace=False)
+        resultados = pd.DataFrame({
+            'LOTE': atualizados,
+            'Valor da Arrematação': _reais(rng.uniform(1_000, 50_000, size=len(atualizados))),
+        })
+        gravar_delta(resultados.to_csv(index=False).encode('utf-8'), caminho)
+
+        avaliacoes = rng.uniform(5_000, 80_000, size=3)
+        novos = pd.DataFrame({
+            'LOTE': np.arange(proximo_lote, proximo_lote + 3),
+            'MUNICÍPIO': 'Cuiabá',
+            'UF': 'SP',
+            'TIPO': 'Carro',
+            'AVALIAÇÃO': _reais(avaliacoes),
+            'Lance Inicial': _reais(avaliacoes * 0.3),
+        })
+        gravar_delta(novos.to_csv(index=False).encode('utf-8'), caminho)
+        proximo_lote += 3
+    return proximo_lote
+
+
+def ordenada(df):
+    # Colunas de texto lidas do cache colunar trazem None onde o CSV traz NaN
+    textos = df.select_dtypes(object).columns
+    df = df.assign(**{col: df[col].where(df[col].notna(), np.nan) for col in textos})
+    return df.sort_values([COLUNA_PARTICAO, 'LOTE'], kind='stable', ignore_index=True)
+
+
+def comparar(incremental, cubo_incremental, nova):
+    """
+    Diferenças entre a carga incremental e a carga do zero (lista vazia = iguais)
+    """
+    problemas = []
+    for nome, df in (('incremental', incremental), ('do zero', nova)):
+        repetidos = df.duplicated([COLUNA_PARTICAO, 'LOTE']).sum()
+        if repetidos:
+            problemas.append(f'carga {nome}: {repetidos} LOTE(s) repetido(s) na mesma partição')
+    if len(incremental) != len(nova):
+        problemas.append(f'linhas: {len(incremental)} (incremental) != {len(nova)} (do zero)')
+    else:
+        try:
+            pd.testing.assert_frame_equal(ordenada(incremental), ordenada(nova), check_categorical=False)
+        except AssertionError as erro:
+            problemas.append(f'tabela: {erro}')
+
+    esperado, obtido = CuboAgregado.de_linhas(nova).total(), cubo_incremental.total()
+    for medida, valor in esperado.items():
+        if not np.isclose(obtido[medida], valor, rtol=1e-6, equal_nan=True):
+            problemas.append(f'cubo {medida}: {obtido[medida]} (incremental) != {valor} (do zero)')
+    return problemas
+
+
+def verificar(linhas, rodadas):
+    rng = np.random.default_rng(0)
+    montar_catalogo(linhas, rng)
+    cargas = CargasIncrementais()
+    df = cargas.tabela(versao_dados())
+    cargas.cubo(versao_dados(), cargas.tabela)
+
+    proximo_lote = PRIMEIRO_LOTE + linhas
+    for rodada in range(1, rodadas + 1):
+        proximo_lote = registrar_rodada(df, rng, proximo_lote)
+        versao = versao_dados()
+        problemas = []
+        if rodada % 2 == 0:
+            for caminho in listar_particoes()['caminho']:
+                consolidar_deltas(caminho)
+            if versao_dados() != versao:
+                problemas.append(f'a consolidação mudou a versão: {versao} -> {versao_dados()}')
+        df = cargas.tabela(versao)
+        cubo = cargas.cubo(versao, cargas.tabela)
+        # Carga do zero: CSV + deltas, sem o cache colunar
+        for caminho in listar_particoes()['caminho']:
+            caminho_cache(caminho).unlink(missing_ok=True)
+        problemas += comparar(df, cubo, CargasIncrementais().tabela(versao))
+        for problema in problemas:
+            print(f'DIFERENÇA (rodada {rodada}): {problema}')
+        if problemas:
+            sys.exit(1)
+        print(f'rodada {rodada}: {len(df)} lotes, carga incremental igual à carga do zero')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas', nargs='?', type=int, default=2_000, help='lotes por partição')
+    parser.add_argument('--rodadas', type=int, default=3, help='deltas registrados por partição')
+    args = parser.parse_args()
+
+    try:
+        verificar(args.linhas, args.rodadas)
+    finally:
+        shutil.rmtree(DIRETORIO, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
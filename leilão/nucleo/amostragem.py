@@ -0,0 +1,75 @@
+"""
+Amostragem de pontos para gráficos de dispersão grandes.
+
+A nuvem é dividida em uma grade de células e cada célula fica com a
+mesma fração dos seus pontos, de modo que a densidade relativa entre as
+regiões se mantém. Para que outliers e caudas não desapareçam, toda
+célula guarda pelo menos ``MINIMO_POR_CELULA`` pontos (ou todos, se tiver
+menos); a fração é calculada sobre o que sobra do orçamento.
+"""
+import numpy as np
+
+# Acima deste número de pontos o gráfico de dispersão usa WebGL (Scattergl)
+PONTOS_WEBGL = 1000
+
+# Máximo de pontos enviados ao navegador em um gráfico de dispersão
+MAXIMO_PONTOS_DISPERSAO = 20000
+
+# Pontos garantidos em cada célula ocupada, mesmo nas mais esparsas
+MINIMO_POR_CELULA = 3
+
+
+def _faixas(valores, celulas):
+    """
+    Índice da faixa (0 .. celulas-1) de cada valor
+    """
+    minimo, maximo = np.nanmin(valores), np.nanmax(valores)
+    if maximo == minimo:
+        return np.zeros(len(valores), dtype=np.int64)
+    faixa = ((valores - minimo) / (maximo - minimo) * celulas).astype(np.int64)
+    return np.minimum(faixa, celulas - 1)
+
+
+def _cotas_por_celula(contagens, maximo, minimo=MINIMO_POR_CELULA):
+    """
+    Pontos mantidos em cada célula: o mínimo garantido mais a mesma fração
+    do excedente de todas as células, com sum(cotas) <= maximo
+    """
+    # Com células demais para o mínimo, o mínimo cai até caber no orçamento
+    minimo = min(minimo, maximo // max(np.count_nonzero(contagens), 1))
+    garantidos = np.minimum(contagens, minimo)
+    excedentes = contagens - garantidos
+    fracao = (maximo - garantidos.sum()) / max(excedentes.sum(), 1)
+    return garantidos + np.floor(excedentes * min(fracao, 1.0)).astype(np.int64)
+
+
+def amostra_por_densidade(df, x, y, maximo=MAXIMO_PONTOS_DISPERSAO, celulas=64, semente=0):
+    """
+    Até ``maximo`` linhas de ``df`` que preservam a densidade da nuvem (x, y):
+    cada célula da grade mantém a mesma fração dos seus pontos, com um
+    mínimo por célula para as regiões esparsas.
+
+    Linhas sem x ou y são descartadas, pois não aparecem no gráfico. A
+    escolha dentro de cada célula é aleatória, com semente fixa para que a
+    mesma seleção gere sempre a mesma amostra.
+    """
+    if len(df) <= maximo:
+        return df
+
+    valores_x = df[x].to_numpy(dtype=np.float64)
+    valores_y = df[y].to_numpy(dtype=np.float64)
+    validos = np.flatnonzero(~(np.isnan(valores_x) | np.isnan(valores_y)))
+    if len(validos) <= maximo:
+        return df.iloc[validos]
+
+    celula = _faixas(valores_x[validos], celulas) * celulas + _faixas(valores_y[validos], celulas)
+    cotas = _cotas_por_celula(np.bincount(celula, minlength=celulas * celulas), maximo)
+
+    # Ordena por célula e, dentro dela, aleatoriamente; mantém as primeiras de cada cota
+    aleatorio = np.random.default_rng(semente).random(len(validos))
+    ordem = np.lexsort((aleatorio, celula))
+    celulas_ordenadas = celula[ordem]
+    posicao = np.arange(len(ordem)) - np.searchsorted(celulas_ordenadas, celulas_ordenadas)
+
+    escolhidos = np.sort(validos[ordem[posicao < cotas[celulas_ordenadas]]])
+    return df.iloc[escolhidos]
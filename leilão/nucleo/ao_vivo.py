@@ -0,0 +1,264 @@
+"""
+Modo ao vivo: resultados do leilão em andamento levados aos painéis abertos.
+
+Durante o pregão, cada martelo é acrescentado a um log CSV (só acréscimos)
+em ``DIRETORIO_AO_VIVO`` (``LEILAO_AO_VIVO``; padrão dados/ao_vivo/), um
+arquivo por leilão: ``<leilão>.csv``, com cabeçalho, a coluna LOTE e o
+``Valor da Arrematação`` (ou outras colunas de tabela.csv). O nome do
+arquivo é o nome do leilão no catálogo (``tabela`` sem leilões particionados).
+
+Uma thread do servidor (``observador_ao_vivo``) lê, a cada
+``INTERVALO_LEITURA`` segundos, só os bytes novos de cada log (até a última
+linha completa), registra o lote de registros como delta da partição
+(``nucleo.ingestao``) e avança as cargas compartilhadas: tabela e cubo
+recebem só os lotes novos, uma vez para todas as sessões. A posição lida
+fica em ``<log>.posicao``, para que um reinício não repita registros.
+O log traz resultados de lotes publicados: um LOTE fora do catálogo é
+descartado (e relatado), nunca vira um lote novo.
+
+A cada ``INTERVALO_CONSOLIDACAO`` segundos os deltas das partições que
+receberam resultados são consolidados em um só arquivo e no cache colunar
+(``nucleo.ingestao.consolidar_deltas``), sem mudar a versão dos dados.
+
+``painel_ao_vivo`` é um fragmento que se redesenha a cada
+``INTERVALO_PAINEL`` segundos com taxa de arrematação, valor total
+arrematado e desconto médio, lidos do cubo já atualizado: as sessões não
+leem o log nem a tabela.
+"""
+import io
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from nucleo.dados import DIRETORIO_DADOS, carregar_cubo, carregar_tabela, listar_particoes
+from nucleo.ingestao import cargas_incrementais, consolidar_deltas, gravar_delta, ler_delta
+
+DIRETORIO_AO_VIVO = Path(os.environ.get('LEILAO_AO_VIVO') or DIRETORIO_DADOS / 'ao_vivo')
+
+# Segundos entre duas leituras dos logs (tamanho máximo de um micro-lote)
+INTERVALO_LEITURA = 2
+
+# Segundos entre dois redesenhos do painel em cada sessão
+INTERVALO_PAINEL = 5
+
+# Segundos entre duas consolidações dos deltas gravados pelo observador
+INTERVALO_CONSOLIDACAO = 60
+
+
+def modo_ao_vivo():
+    """
+    O modo ao vivo fica ativo enquanto o diretório dos logs existir
+    """
+    return DIRETORIO_AO_VIVO.is_dir()
+
+
+def _caminho_posicao(log):
+    return log.with_name(f'{log.name}.posicao')
+
+
+def ler_novos(log, posicao):
+    """
+    Cabeçalho do log e linhas completas gravadas depois de ``posicao``
+    (em bytes), com a nova posição. Uma linha ainda pela metade fica para
+    a próxima leitura.
+    """
+    with open(log, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        if not cabecalho.endswith(b'\n'):
+            return cabecalho, b'', posicao
+        inicio = max(posicao, len(cabecalho))
+        arquivo.seek(inicio)
+        novos = arquivo.read()
+    fim = novos.rfind(b'\n') + 1
+    return cabecalho, novos[:fim], inicio + fim
+
+
+def _distribuir(registros, particoes):
+    """
+    Registros (texto, como no log) de cada partição do leilão, pela
+    partição que já tem o lote, e a máscara dos lotes fora do catálogo
+    """
+    lotes = pd.to_numeric(registros['LOTE'])
+    restantes = pd.Series(True, index=registros.index)
+    grupos = {}
+    for particao in particoes:
+        deste = restantes & lotes.isin(carregar_tabela(particao)['LOTE'])
+        grupos[particao] = registros[deste]
+        restantes &= ~deste
+    return grupos, restantes
+
+
+def _validos(registros):
+    """
+    Máscara dos registros que formam um delta válido. O log só cresce: um
+    registro inválido é descartado (e relatado) em vez de travar a leitura.
+    """
+    def valido(parte):
+        try:
+            ler_delta(io.BytesIO(parte.to_csv(index=False).encode('utf-8')))
+            return True
+        except ValueError:
+            return False
+
+    if valido(registros):
+        return pd.Series(True, index=registros.index)
+    return pd.Series([valido(registros.iloc[[i]]) for i in range(len(registros))], index=registros.index)
+
+
+class ObservadorAoVivo:
+    """
+    Thread que acompanha os logs de resultados e os transforma em deltas
+    """
+
+    def __init__(self, diretorio=DIRETORIO_AO_VIVO, intervalo=INTERVALO_LEITURA):
+        self.diretorio = Path(diretorio)
+        self.intervalo = intervalo
+        self.registros = 0
+        self.ultima_atualizacao = None
+        self.erros = {}
+        self._a_consolidar = set()
+        self._ultima_consolidacao = time.monotonic()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, name='leilao-ao-vivo', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _rodar(self):
+        while not self._parar.wait(self.intervalo):
+            self.verificar()
+
+    def verificar(self):
+        """
+        Uma passada por todos os logs; devolve quantos registros novos entraram
+        """
+        novos = 0
+        for log in sorted(self.diretorio.glob('*.csv')):
+            try:
+                aceitos, rejeitados = self._ler_log(log)
+            except Exception as erro:  # um log com problema não derruba o observador
+                self.erros[log.name] = f'{type(erro).__name__}: {erro}'
+                continue
+            novos += aceitos
+            if rejeitados:
+                self.erros[log.name] = f'{rejeitados} registro(s) inválido(s) ou de LOTE fora do catálogo descartado(s)'
+            elif aceitos:
+                self.erros.pop(log.name, None)
+        if novos:
+            cargas_incrementais().avancar()
+            self.registros += novos
+            self.ultima_atualizacao = time.time()
+        if self._a_consolidar and time.monotonic() - self._ultima_consolidacao >= INTERVALO_CONSOLIDACAO:
+            self.consolidar()
+        return novos
+
+    def consolidar(self):
+        """
+        Consolida os deltas das partições que receberam resultados
+        """
+        for particao in sorted(self._a_consolidar):
+            try:
+                consolidar_deltas(particao)
+            except Exception as erro:  # tenta de novo na próxima consolidação
+                self.erros[Path(particao).name] = f'Consolidação: {type(erro).__name__}: {erro}'
+                continue
+            self._a_consolidar.discard(particao)
+        self._ultima_consolidacao = time.monotonic()
+
+    def _ler_log(self, log):
+        arquivo_posicao = _caminho_posicao(log)
+        posicao = int(arquivo_posicao.read_text()) if arquivo_posicao.exists() else 0
+        if posicao > log.stat().st_size:
+            # Log recriado: começa de novo
+            posicao = 0
+
+        cabecalho, linhas, nova_posicao = ler_novos(log, posicao)
+        if not linhas:
+            return 0, 0
+
+        particoes = listar_particoes()
+        particoes = list(particoes.loc[particoes['leilao'] == log.stem, 'caminho'])
+        if not particoes:
+            raise ValueError(f'Leilão {log.stem!r} não está no catálogo')
+
+        malformadas = []
+        registros = pd.read_csv(
+            io.BytesIO(cabecalho + linhas), dtype=str, encoding='utf-8',
+            engine='python', on_bad_lines=malformadas.append,
+        )
+        validos = _validos(registros)
+        grupos, desconhecidos = _distribuir(registros[validos], particoes)
+        for particao, grupo in grupos.items():
+            if len(grupo):
+                gravar_delta(grupo.to_csv(index=False).encode('utf-8'), particao)
+                self._a_consolidar.add(particao)
+
+        temporario = arquivo_posicao.with_name(f'{arquivo_posicao.name}.tmp')
+        temporario.write_text(str(nova_posicao))
+        os.replace(temporario, arquivo_posicao)
+        aceitos = int(validos.sum()) - int(desconhecidos.sum())
+        return aceitos, len(registros) - aceitos + len(malformadas)
+
+
+@st.cache_resource
+def observador_ao_vivo():
+    """
+    Observador único no processo do servidor, iniciado no primeiro acesso
+    """
+    return ObservadorAoVivo().iniciar()
+
+
+@st.fragment(run_every=INTERVALO_PAINEL)
+def _painel(leiloes):
+    observador = observador_ao_vivo()
+    cubo = carregar_cubo(leiloes)
+    total = cubo.total()
+    arrematados = cubo.filtrar({'Status Arrematação': ['Arrematado']}).total()
+
+    st.subheader("🔴 Leilão ao vivo")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Taxa de Arrematação", f"{total['taxa_arrematacao'] * 100:.1f}%")
+    col2.metric("Valor Total Arrematado", f"R$ {total['soma_arrematacao']:,.0f}")
+    if arrematados['qtd_arrematados'] > 0:
+        desconto = (1 - arrematados['soma_arrematacao'] / arrematados['soma_avaliacao']) * 100
+        col3.metric("Desconto Médio", f"{desconto:.1f}%")
+    else:
+        col3.metric("Desconto Médio", "N/A")
+
+    if observador.ultima_atualizacao is None:
+        st.caption(f"Aguardando resultados em {DIRETORIO_AO_VIVO} · atualiza a cada {INTERVALO_PAINEL} s")
+    else:
+        hora = datetime.fromtimestamp(observador.ultima_atualizacao).strftime('%H:%M:%S')
+        st.caption(f"{observador.registros} resultados recebidos · último às {hora} · atualiza a cada {INTERVALO_PAINEL} s")
+    for log, erro in list(observador.erros.items()):
+        st.warning(f"⚠️ {log}: {erro}")
+
+
+def painel_ao_vivo(leiloes):
+    """
+    KPIs do leilão em andamento, redesenhados periodicamente (só no modo ao vivo)
+    """
+    if modo_ao_vivo():
+        _painel(leiloes)
+
+
+if __name__ == '__main__':
+    # python -m nucleo.ao_vivo (a partir de leilão/) ingere os logs sem abrir o app
+    observador = ObservadorAoVivo()
+    print(f'Acompanhando {DIRETORIO_AO_VIVO} a cada {observador.intervalo} s (Ctrl+C para sair)')
+    while True:
+        novos = observador.verificar()
+        if novos:
+            print(f'{datetime.now():%H:%M:%S} {novos} registros')
+        for log, erro in observador.erros.items():
+            print(f'{log}: {erro}')
+        time.sleep(observador.intervalo)
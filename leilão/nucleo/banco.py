@@ -0,0 +1,434 @@
+"""
+Motor SQL embutido (DuckDB ou SQLite) para as agregações das páginas.
+
+Ativado pela variável de ambiente ``LEILAO_MOTOR_SQL`` (``duckdb`` ou
+``sqlite``). O catálogo limpo é gravado, partição por partição, em um banco
+de arquivo único ao lado do CSV, e as agregações (células do cubo e lances
+por percentil) são consultas SQL: o DuckDB as executa fora da memória e em
+várias threads, então o catálogo não precisa caber na RAM para essas
+consultas. O DuckDB é opcional (``pip install duckdb``); o SQLite vem com o
+Python.
+
+A página geral (contagens por tipo e por cor), a de marcas e a de estratégia
+(lances, caminhões e valores arrematados para o bootstrap) leem do banco só
+as linhas e colunas que usam. As páginas geográfica e financeira filtram
+lote a lote e ainda carregam as linhas dos leilões selecionados na memória.
+
+O banco guarda a versão (mtime e último delta) de cada partição. Quando o
+catálogo muda, só as partições alteradas são regravadas e, de uma partição
+que só recebeu deltas, só os lotes tocados por eles: um resultado do modo ao
+vivo não refaz o banco inteiro.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+import streamlit as st
+
+from nucleo.cubo import DIMENSOES, MEDIDAS, CuboAgregado
+from nucleo.dados import (
+    CAMINHO_TABELA, COLUNA_PARTICAO, MOTOR_SQL, VERSOES_EM_CACHE, carregar_particoes, deltas_entre,
+    identificador_particao, versao_dados,
+)
+from nucleo.derivadas import ROTULOS_CATEGORIA_VALOR, ROTULOS_STATUS, adicionar_derivadas
+from nucleo.ingestao import lotes_dos_deltas
+from nucleo.instrumentacao import consultar_cache, medido, registrar_falta
+from nucleo.metricas import MetricasGerais
+
+CAMINHOS_BANCO = {
+    'duckdb': CAMINHO_TABELA.with_suffix('.duckdb'),
+    'sqlite': CAMINHO_TABELA.with_suffix('.sqlite'),
+}
+
+# Colunas gravadas no banco: só o que as consultas usam, mais a partição de
+# origem e o LOTE, para regravar só as linhas que mudaram
+COLUNAS_BANCO = {
+    COLUNA_PARTICAO: 'TEXT',
+    'LOTE': 'INTEGER',
+    'LEILÃO': 'TEXT',
+    'TIPO': 'TEXT',
+    'MARCA': 'TEXT',
+    'NOME_POPULAR': 'TEXT',
+    'MUNICÍPIO': 'TEXT',
+    'COR': 'TEXT',
+    'COR_AJUSTADA': 'TEXT',
+    'Status Arrematação': 'TEXT',
+    'Categoria Valor': 'TEXT',
+    'AVALIAÇÃO': 'DOUBLE',
+    'Valor da Arrematação': 'DOUBLE',
+    'Eficiência Arrematação': 'DOUBLE',
+}
+
+# Parte inteira de um número não negativo em cada dialeto
+_PISO = {
+    'duckdb': 'FLOOR({})',
+    'sqlite': 'CAST({} AS INTEGER)',
+}
+
+_CATEGORIAS_LANCES = ['Total', 'Carro', 'Moto', 'Caminhão']
+
+# Uma atualização do banco por vez no processo
+_TRAVA_BANCO = threading.Lock()
+
+
+def _coluna(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _abrir(caminho, motor=MOTOR_SQL):
+    """
+    Conexão com o banco do motor escolhido
+    """
+    if motor == 'duckdb':
+        import duckdb  # dependência opcional, importada só quando o motor é usado
+        return duckdb.connect(str(caminho))
+    if motor == 'sqlite':
+        return sqlite3.connect(caminho)
+    raise ValueError(f"Motor SQL desconhecido: {motor!r} (use 'duckdb' ou 'sqlite')")
+
+
+def _consultar(caminho, sql, parametros=(), motor=MOTOR_SQL):
+    """
+    Executa uma consulta em uma conexão própria e devolve um DataFrame
+    """
+    with closing(_abrir(caminho, motor)) as con:
+        if motor == 'duckdb':
+            return con.execute(sql, list(parametros)).df()
+        return pd.read_sql_query(sql, con, params=list(parametros))
+
+
+def _inserir(con, parte, motor):
+    """
+    Acrescenta uma partição já limpa à tabela de lotes
+    """
+    parte = parte[list(COLUNAS_BANCO)].astype(object)
+    parte = parte.where(parte.notna(), None)
+    if motor == 'duckdb':
+        # Números em tipo anulável para que ausentes cheguem como NULL, e não NaN
+        parte = parte.astype({col: 'Float64' for col, tipo in COLUNAS_BANCO.items() if tipo == 'DOUBLE'})
+        con.register('parte', parte)
+        con.execute('INSERT INTO lotes SELECT * FROM parte')
+        con.unregister('parte')
+    else:
+        marcadores = ', '.join('?' * len(COLUNAS_BANCO))
+        con.executemany(f'INSERT INTO lotes VALUES ({marcadores})', parte.itertuples(index=False, name=None))
+
+
+def construir_banco(versao, motor=MOTOR_SQL):
+    """
+    Grava o catálogo no banco, uma partição por vez, com a versão de cada uma.
+
+    Assim como o cache colunar, o banco é montado em um arquivo temporário e
+    substituído de forma atômica.
+    """
+    caminho = CAMINHOS_BANCO[motor]
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+    temporario.unlink(missing_ok=True)
+
+    colunas = ', '.join(f'{_coluna(col)} {tipo}' for col, tipo in COLUNAS_BANCO.items())
+    with closing(_abrir(temporario, motor)) as con:
+        con.execute(f'CREATE TABLE lotes ({colunas})')
+        con.execute('CREATE TABLE particoes (arquivo TEXT, mtime BIGINT, delta BIGINT)')
+        for arquivo, mtime, ultimo in versao:
+            _inserir(con, adicionar_derivadas(carregar_particoes([arquivo])), motor)
+            con.execute('INSERT INTO particoes VALUES (?, ?, ?)', [arquivo, mtime, ultimo])
+        if motor == 'sqlite':
+            con.commit()
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def _particoes_gravadas(caminho, motor):
+    """
+    (mtime, último delta) de cada partição gravada no banco, ou None se o
+    banco não existe ou é de um formato anterior (outras tabelas ou colunas)
+    """
+    if not caminho.exists():
+        return None
+    try:
+        gravadas = _consultar(caminho, 'SELECT arquivo, mtime, delta FROM particoes', motor=motor)
+        colunas = _consultar(caminho, 'SELECT * FROM lotes LIMIT 0', motor=motor).columns
+    except Exception:
+        return None
+    if list(colunas) != list(COLUNAS_BANCO):
+        return None
+    return {arquivo: (int(mtime), int(delta)) for arquivo, mtime, delta in gravadas.itertuples(index=False)}
+
+
+def _regravar_particao(con, arquivo, anterior, mtime, ultimo, motor):
+    """
+    Substitui as linhas da partição no banco: só as dos lotes tocados pelos
+    deltas novos, se o CSV não mudou, ou a partição inteira
+    """
+    particao = identificador_particao(arquivo)
+    parte = carregar_particoes([arquivo])
+    lotes = None
+    if anterior is not None and anterior[0] == mtime and anterior[1] < ultimo:
+        try:
+            lotes = lotes_dos_deltas(deltas_entre(arquivo, anterior[1]))
+        except FileNotFoundError:
+            # Deltas consolidados durante a leitura: regrava a partição inteira
+            lotes = None
+
+    if lotes is None:
+        con.execute(f'DELETE FROM lotes WHERE {_coluna(COLUNA_PARTICAO)} = ?', [particao])
+    else:
+        parte = parte[parte['LOTE'].isin(lotes)]
+        con.executemany(
+            f'DELETE FROM lotes WHERE {_coluna(COLUNA_PARTICAO)} = ? AND LOTE = ?',
+            [(particao, int(lote)) for lote in lotes]
+        )
+    _inserir(con, adicionar_derivadas(parte), motor)
+
+
+def atualizar_banco(versao, motor=MOTOR_SQL):
+    """
+    Leva o banco à versão do catálogo regravando só as partições que mudaram
+    (numa transação); sem banco, ou com um de formato anterior, constrói do zero
+    """
+    caminho = CAMINHOS_BANCO[motor]
+    with _TRAVA_BANCO:
+        gravadas = _particoes_gravadas(caminho, motor)
+        if gravadas is None:
+            return construir_banco(versao, motor)
+        atuais = {arquivo: (mtime, ultimo) for arquivo, mtime, ultimo in versao}
+        if gravadas == atuais:
+            return caminho
+
+        with closing(_abrir(caminho, motor)) as con:
+            con.execute('BEGIN TRANSACTION')
+            for arquivo in gravadas.keys() - atuais.keys():
+                con.execute(f'DELETE FROM lotes WHERE {_coluna(COLUNA_PARTICAO)} = ?', [identificador_particao(arquivo)])
+            for arquivo, (mtime, ultimo) in atuais.items():
+                anterior = gravadas.get(arquivo)
+                if anterior != (mtime, ultimo):
+                    _regravar_particao(con, arquivo, anterior, mtime, ultimo, motor)
+            con.execute('DELETE FROM particoes')
+            con.executemany('INSERT INTO particoes VALUES (?, ?, ?)', [list(linha) for linha in versao])
+            con.execute('COMMIT')
+    return caminho
+
+
+@st.cache_resource(max_entries=1, show_spinner="Preparando banco de dados...")
+def _banco_versao(versao):
+    return atualizar_banco(versao)
+
+
+def _versao(leiloes=None):
+    """
+    Versão dos leilões escolhidos (do catálogo inteiro, sem escolha)
+    """
+    versao = versao_dados(leiloes)
+    if versao is None:
+        raise FileNotFoundError(f'Arquivo de dados não encontrado: {CAMINHO_TABELA}')
+    return versao
+
+
+def _filtro_leiloes(leiloes):
+    """
+    Cláusula WHERE (e parâmetros) que restringe a consulta aos leilões escolhidos
+    """
+    if leiloes is None:
+        return 'WHERE 1 = 1', []
+    if not leiloes:
+        return 'WHERE 1 = 0', []
+    return f'WHERE {_coluna("LEILÃO")} IN ({", ".join("?" * len(leiloes))})', list(leiloes)
+
+
+@medido('sql: cubo')
+def carregar_cubo(leiloes=None):
+    """
+    Cubo de agregação dos leilões escolhidos, com as células somadas pelo banco
+    """
+    consultar_cache('cubo_sql')
+    return _cubo_sql(_versao(leiloes), None if leiloes is None else tuple(leiloes))
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, show_spinner="Preparando agregados...")
+def _cubo_sql(versao, leiloes):
+    # Chaveado pela versão só dos leilões escolhidos: deltas de outros leilões
+    # atualizam o banco, mas não refazem este cubo
+    registrar_falta('cubo_sql')
+    caminho = _banco_versao(_versao())
+    onde, parametros = _filtro_leiloes(leiloes)
+    avaliacao, arrematacao = _coluna('AVALIAÇÃO'), _coluna('Valor da Arrematação')
+    dimensoes = ', '.join(_coluna(col) for col in DIMENSOES)
+
+    celulas = _consultar(caminho, f"""
+        SELECT {dimensoes},
+            COUNT(*) AS qtd_lotes,
+            COUNT({avaliacao}) AS qtd_avaliacao,
+            COUNT({arrematacao}) AS qtd_arrematados,
+            COALESCE(SUM({avaliacao}), 0) AS soma_avaliacao,
+            COALESCE(SUM({avaliacao} * {avaliacao}), 0) AS soma2_avaliacao,
+            COALESCE(SUM({arrematacao}), 0) AS soma_arrematacao,
+            COALESCE(SUM({arrematacao} * {arrematacao}), 0) AS soma2_arrematacao,
+            COALESCE(SUM({_coluna('Eficiência Arrematação')}), 0) AS soma_eficiencia,
+            COUNT({avaliacao} * {arrematacao}) AS qtd_pares,
+            COALESCE(SUM(CASE WHEN {arrematacao} IS NOT NULL THEN {avaliacao} END), 0) AS soma_avaliacao_par,
+            COALESCE(SUM(CASE WHEN {avaliacao} IS NOT NULL THEN {arrematacao} END), 0) AS soma_arrematacao_par,
+            COALESCE(SUM(CASE WHEN {arrematacao} IS NOT NULL THEN {avaliacao} * {avaliacao} END), 0) AS soma2_avaliacao_par,
+            COALESCE(SUM(CASE WHEN {avaliacao} IS NOT NULL THEN {arrematacao} * {arrematacao} END), 0) AS soma2_arrematacao_par,
+            COALESCE(SUM({avaliacao} * {arrematacao}), 0) AS soma_produto,
+            SUM(CASE WHEN {arrematacao} > {avaliacao} THEN 1 ELSE 0 END) AS qtd_acima_avaliacao
+        FROM lotes
+        {onde}
+        GROUP BY {dimensoes}
+    """, parametros)
+
+    # Mesmos tipos e ordem das células montadas em pandas (CuboAgregado.de_linhas)
+    tipos = {
+        'Status Arrematação': pd.CategoricalDtype(ROTULOS_STATUS),
+        'Categoria Valor': pd.CategoricalDtype(ROTULOS_CATEGORIA_VALOR, ordered=True),
+    }
+    for col in DIMENSOES:
+        celulas[col] = celulas[col].astype(
+            tipos.get(col, pd.CategoricalDtype(sorted(celulas[col].dropna().unique())))
+        )
+    celulas = celulas.sort_values(DIMENSOES, ignore_index=True)
+    return CuboAgregado(celulas[DIMENSOES + MEDIDAS])
+
+
+@medido('sql: métricas gerais')
+def metricas_gerais(leiloes=None):
+    """
+    Contagens da página geral (``MetricasGerais``) agrupadas pelo banco
+    """
+    consultar_cache('metricas_sql')
+    return _metricas_sql(_versao(leiloes), None if leiloes is None else tuple(leiloes))
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _metricas_sql(versao, leiloes):
+    registrar_falta('metricas_sql')
+    caminho = _banco_versao(_versao())
+    onde, parametros = _filtro_leiloes(leiloes)
+    contagens = _consultar(caminho, f"""
+        SELECT TIPO, COR, COR_AJUSTADA,
+            CASE WHEN {_coluna('Valor da Arrematação')} IS NOT NULL THEN 1 ELSE 0 END AS arrematado,
+            COUNT(*) AS lotes
+        FROM lotes
+        {onde}
+        GROUP BY 1, 2, 3, 4
+    """, parametros)
+    return MetricasGerais.de_contagens(contagens)
+
+
+@medido('sql: lotes')
+def lotes_sql(leiloes=None, colunas=tuple(COLUNAS_BANCO), tipo=None, arrematados=False, limite=None):
+    """
+    Só as ``colunas`` dos lotes dos leilões escolhidos, opcionalmente de um
+    TIPO, só os arrematados ou só os ``limite`` primeiros
+    """
+    consultar_cache('lotes_sql')
+    return _lotes_sql(
+        _versao(leiloes), None if leiloes is None else tuple(leiloes), tuple(colunas), tipo, arrematados, limite
+    )
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _lotes_sql(versao, leiloes, colunas, tipo, arrematados, limite):
+    registrar_falta('lotes_sql')
+    caminho = _banco_versao(_versao())
+    onde, parametros = _filtro_leiloes(leiloes)
+    if tipo is not None:
+        onde += ' AND TIPO = ?'
+        parametros.append(tipo)
+    if arrematados:
+        onde += f" AND {_coluna('Valor da Arrematação')} IS NOT NULL"
+    # Ordem estável (partição, LOTE) para que ``limite`` devolva sempre os mesmos lotes
+    ordem = f'ORDER BY {_coluna(COLUNA_PARTICAO)}, LOTE LIMIT {int(limite)}' if limite is not None else ''
+
+    lotes = _consultar(caminho, f"""
+        SELECT {', '.join(_coluna(col) for col in colunas)}
+        FROM lotes
+        {onde}
+        {ordem}
+    """, parametros)
+    # Colunas só com NULL chegam como object; números voltam a float64
+    return lotes.astype({col: 'float64' for col in colunas if COLUNAS_BANCO[col] == 'DOUBLE'})
+
+
+def _quantil(p, motor):
+    """
+    Expressão SQL do percentil ``p`` com interpolação linear (como
+    ``Series.quantile``), sobre linhas numeradas por ``i`` dentro de ``n``
+    """
+    posicao = f'((n - 1) * {p!r})'
+    inferior = _PISO[motor].format(posicao)
+    fracao = f'({posicao} - {inferior})'
+    return (
+        f'SUM(CASE WHEN i = {inferior} THEN valor * (1 - {fracao}) '
+        f'WHEN i = {inferior} + 1 THEN valor * {fracao} ELSE 0 END)'
+    )
+
+
+@medido('sql: lances')
+def lances_estrategicos(leiloes=None):
+    """
+    Média, mediana e percentis 75/90 dos valores de arrematação por tipo (e no
+    total), no mesmo formato de ``calcular_lances_estrategicos``
+    """
+    consultar_cache('lances_sql')
+    return _lances_sql(_versao(leiloes), None if leiloes is None else tuple(leiloes))
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _lances_sql(versao, leiloes):
+    registrar_falta('lances_sql')
+    caminho = _banco_versao(_versao())
+    onde, parametros = _filtro_leiloes(leiloes)
+    arrematacao = _coluna('Valor da Arrematação')
+
+    resumo = _consultar(caminho, f"""
+        WITH valores AS (
+            SELECT TIPO AS categoria, {arrematacao} AS valor
+            FROM lotes {onde} AND {arrematacao} IS NOT NULL
+            UNION ALL
+            SELECT 'Total' AS categoria, {arrematacao} AS valor
+            FROM lotes {onde} AND {arrematacao} IS NOT NULL
+        ),
+        ordenados AS (
+            SELECT categoria, valor,
+                ROW_NUMBER() OVER (PARTITION BY categoria ORDER BY valor) - 1 AS i,
+                COUNT(*) OVER (PARTITION BY categoria) AS n
+            FROM valores
+        ),
+        quantis AS (
+            SELECT categoria, n AS amostra,
+                AVG(valor) AS media_arremate,
+                {_quantil(0.5, MOTOR_SQL)} AS mediana_arremate,
+                {_quantil(0.75, MOTOR_SQL)} AS lance_competitivo,
+                {_quantil(0.9, MOTOR_SQL)} AS lance_maximo
+            FROM ordenados
+            GROUP BY categoria, n
+        )
+        SELECT q.categoria, q.amostra, q.media_arremate, q.mediana_arremate,
+            q.lance_competitivo, q.lance_maximo,
+            100.0 * SUM(CASE WHEN o.valor <= q.lance_competitivo THEN 1 ELSE 0 END) / q.amostra
+                AS taxa_sucesso_estimada
+        FROM quantis q JOIN ordenados o ON o.categoria = q.categoria
+        GROUP BY q.categoria, q.amostra, q.media_arremate, q.mediana_arremate,
+            q.lance_competitivo, q.lance_maximo
+    """, parametros * 2).set_index('categoria')
+
+    estrategia = {}
+    for categoria in _CATEGORIAS_LANCES:
+        if categoria in resumo.index:
+            linha = resumo.loc[categoria]
+            estrategia[categoria] = {
+                'media_arremate': float(linha['media_arremate']),
+                'mediana_arremate': float(linha['mediana_arremate']),
+                'lance_competitivo': float(linha['lance_competitivo']),
+                'lance_maximo': float(linha['lance_maximo']),
+                'taxa_sucesso_estimada': float(linha['taxa_sucesso_estimada']),
+                'amostra': int(linha['amostra']),
+            }
+    return estrategia
+
+
+if __name__ == '__main__':
+    # LEILAO_MOTOR_SQL=duckdb python -m nucleo.banco (a partir de leilão/) regrava o banco
+    print(construir_banco(versao_dados()))
@@ -0,0 +1,89 @@
+"""
+Intervalos de confiança por bootstrap para os valores de arrematação.
+
+As reamostragens são sorteadas de uma vez como uma matriz de índices
+(reamostragens x n); média, mediana, p75 e p90 saem por eixo, sem laço em
+Python. A matriz é gerada em blocos para limitar a memória e, em históricos
+grandes, os blocos são distribuídos entre processos. Cada bloco tem sua
+semente derivada da semente principal, então o resultado é o mesmo com ou
+sem o pool de processos.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+REAMOSTRAGENS = 2000
+
+NIVEL_CONFIANCA = 0.95
+
+ESTATISTICAS_BOOTSTRAP = ('media', 'mediana', 'p75', 'p90')
+
+# Elementos (reamostragens x n) por bloco: ~32 MB em float64
+ELEMENTOS_POR_BLOCO = 4_000_000
+
+# A partir deste total de elementos os blocos vão para um pool de processos
+ELEMENTOS_PARALELO = 50_000_000
+
+
+def _estatisticas(amostras):
+    """
+    Média, mediana, p75 e p90 de cada linha da matriz de reamostragens
+    """
+    quantis = np.quantile(amostras, [0.5, 0.75, 0.9], axis=1)
+    return np.column_stack([amostras.mean(axis=1), *quantis])
+
+
+def _bloco(valores, reamostragens, semente):
+    """
+    Estatísticas de ``reamostragens`` reamostras com reposição de ``valores``
+    """
+    rng = np.random.default_rng(semente)
+    indices = rng.integers(0, len(valores), size=(reamostragens, len(valores)))
+    return _estatisticas(valores[indices])
+
+
+def intervalos_bootstrap(valores, reamostragens=REAMOSTRAGENS, nivel=NIVEL_CONFIANCA, semente=0, processos=None):
+    """
+    Intervalo percentil de cada estatística em ``ESTATISTICAS_BOOTSTRAP``.
+
+    Devolve {estatística: (inferior, superior)}; vazio com menos de 2 valores.
+    ``processos=1`` força a execução no processo atual.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if len(valores) < 2:
+        return {}
+
+    por_bloco = max(1, ELEMENTOS_POR_BLOCO // len(valores))
+    tamanhos = [min(por_bloco, reamostragens - inicio) for inicio in range(0, reamostragens, por_bloco)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+
+    processos = processos or os.cpu_count() or 1
+    if processos > 1 and len(tamanhos) > 1 and reamostragens * len(valores) >= ELEMENTOS_PARALELO:
+        # spawn: o servidor do Streamlit tem várias threads, fork não é seguro
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(processos, len(tamanhos)), mp_context=contexto) as pool:
+            blocos = list(pool.map(_bloco, [valores] * len(tamanhos), tamanhos, sementes))
+    else:
+        blocos = [_bloco(valores, tamanho, seq) for tamanho, seq in zip(tamanhos, sementes)]
+
+    alfa = (1 - nivel) / 2
+    limites = np.quantile(np.concatenate(blocos), [alfa, 1 - alfa], axis=0)
+    return {
+        nome: (float(limites[0, i]), float(limites[1, i]))
+        for i, nome in enumerate(ESTATISTICAS_BOOTSTRAP)
+    }
+
+
+def intervalos_por_tipo(df, coluna='Valor da Arrematação', categorias=('Carro', 'Moto', 'Caminhão'), **opcoes):
+    """
+    Intervalos do total (chave 'Total') e de cada TIPO em ``categorias``
+    """
+    valores = df[coluna].to_numpy(dtype=np.float64)
+    intervalos = {'Total': intervalos_bootstrap(valores, **opcoes)}
+    tipos = df['TIPO'].to_numpy()
+    for categoria in categorias:
+        intervalos[categoria] = intervalos_bootstrap(valores[tipos == categoria], **opcoes)
+    return intervalos
@@ -0,0 +1,156 @@
+"""
+Cubo de agregação sobre as dimensões filtráveis do leilão.
+
+O cubo guarda, para cada combinação observada de TIPO × MARCA ×
+NOME_POPULAR × MUNICÍPIO × status × faixa de valor, apenas medidas aditivas
+(contagens, somas e somas de quadrados). Qualquer resumo por um subconjunto
+dessas dimensões sai somando células do cubo, sem reler as linhas.
+"""
+import numpy as np
+import pandas as pd
+
+DIMENSOES = ['TIPO', 'MARCA', 'NOME_POPULAR', 'MUNICÍPIO', 'Status Arrematação', 'Categoria Valor']
+
+MEDIDAS = [
+    'qtd_lotes', 'qtd_avaliacao', 'qtd_arrematados',
+    'soma_avaliacao', 'soma2_avaliacao',
+    'soma_arrematacao', 'soma2_arrematacao',
+    'soma_eficiencia',
+    # Pares (avaliação, arrematação) completos, para nucleo.regressao
+    'qtd_pares', 'soma_avaliacao_par', 'soma_arrematacao_par',
+    'soma2_avaliacao_par', 'soma2_arrematacao_par', 'soma_produto',
+    'qtd_acima_avaliacao',
+]
+
+
+def _dividir(numerador, denominador):
+    """
+    Divisão que devolve NaN (e não inf) quando o denominador é zero
+    """
+    return numerador / denominador.where(denominador != 0)
+
+
+class CuboAgregado:
+    """
+    Medidas aditivas por célula das dimensões filtráveis
+    """
+
+    def __init__(self, celulas):
+        self.celulas = celulas
+
+    @classmethod
+    def de_linhas(cls, df):
+        """
+        Constrói o cubo a partir das linhas da tabela limpa (com as colunas
+        de ``nucleo.derivadas``)
+        """
+        avaliacao = df['AVALIAÇÃO'].astype(np.float64)
+        arrematacao = df['Valor da Arrematação'].astype(np.float64)
+        par = avaliacao.notna() & arrematacao.notna()
+        avaliacao_par = avaliacao.where(par, 0)
+        arrematacao_par = arrematacao.where(par, 0)
+
+        linhas = pd.DataFrame({
+            'TIPO': df['TIPO'],
+            'MARCA': df['MARCA'],
+            'NOME_POPULAR': df['NOME_POPULAR'],
+            'MUNICÍPIO': df['MUNICÍPIO'],
+            'Status Arrematação': df['Status Arrematação'],
+            'Categoria Valor': df['Categoria Valor'],
+            'qtd_lotes': 1,
+            'qtd_avaliacao': avaliacao.notna().astype(np.int64),
+            'qtd_arrematados': arrematacao.notna().astype(np.int64),
+            'soma_avaliacao': avaliacao.fillna(0),
+            'soma2_avaliacao': (avaliacao ** 2).fillna(0),
+            'soma_arrematacao': arrematacao.fillna(0),
+            'soma2_arrematacao': (arrematacao ** 2).fillna(0),
+            'soma_eficiencia': df['Eficiência Arrematação'].astype(np.float64),
+            'qtd_pares': par.astype(np.int64),
+            'soma_avaliacao_par': avaliacao_par,
+            'soma_arrematacao_par': arrematacao_par,
+            'soma2_avaliacao_par': avaliacao_par ** 2,
+            'soma2_arrematacao_par': arrematacao_par ** 2,
+            'soma_produto': avaliacao_par * arrematacao_par,
+            'qtd_acima_avaliacao': (arrematacao > avaliacao).astype(np.int64),
+        }, index=df.index)
+
+        celulas = (
+            linhas.groupby(DIMENSOES, observed=True, dropna=False)[MEDIDAS]
+            .sum()
+            .reset_index()
+        )
+        return cls(celulas)
+
+    def atualizar(self, removidas, inseridas):
+        """
+        Novo cubo com as linhas ``removidas`` descontadas e as ``inseridas``
+        somadas: como as medidas são aditivas, um upsert de lotes atualiza o
+        cubo sem reler a tabela
+        """
+        descontar = CuboAgregado.de_linhas(removidas).celulas
+        descontar[MEDIDAS] = -descontar[MEDIDAS]
+        partes = [self.celulas, CuboAgregado.de_linhas(inseridas).celulas, descontar]
+
+        for col in DIMENSOES:
+            if all(isinstance(parte[col].dtype, pd.CategoricalDtype) for parte in partes):
+                categorias = partes[0][col].cat.categories
+                for parte in partes[1:]:
+                    categorias = categorias.union(parte[col].cat.categories)
+                partes = [parte.assign(**{col: parte[col].cat.set_categories(categorias)}) for parte in partes]
+
+        celulas = (
+            pd.concat(partes, ignore_index=True)
+            .groupby(DIMENSOES, observed=True, dropna=False)[MEDIDAS]
+            .sum()
+            .reset_index()
+        )
+        return CuboAgregado(celulas[celulas['qtd_lotes'] > 0].reset_index(drop=True))
+
+    def filtrar(self, selecoes):
+        """
+        Novo cubo só com as células cujas dimensões estão nas seleções
+        """
+        mascara = np.ones(len(self.celulas), dtype=bool)
+        for col, valores in selecoes.items():
+            mascara &= self.celulas[col].isin(valores).to_numpy()
+        return CuboAgregado(self.celulas[mascara])
+
+    def agregar(self, dimensoes):
+        """
+        Soma as células pelas dimensões pedidas e acrescenta as medidas derivadas
+        (médias, desvios-padrão e taxa de arrematação)
+        """
+        resumo = (
+            self.celulas.groupby(dimensoes, observed=True, sort=True)[MEDIDAS]
+            .sum()
+            .reset_index()
+        )
+        return self._derivar(resumo)
+
+    def total(self):
+        """
+        Soma de todas as células, com as medidas derivadas
+        """
+        return self._derivar(self.celulas[MEDIDAS].sum().to_frame().T).iloc[0]
+
+    def valores(self, col):
+        """
+        Valores observados de uma dimensão
+        """
+        return self.celulas[col].dropna().unique()
+
+    @staticmethod
+    def _derivar(resumo):
+        media_avaliacao = _dividir(resumo['soma_avaliacao'], resumo['qtd_avaliacao'])
+        media_arrematacao = _dividir(resumo['soma_arrematacao'], resumo['qtd_arrematados'])
+        variancia_avaliacao = _dividir(resumo['soma2_avaliacao'], resumo['qtd_avaliacao']) - media_avaliacao ** 2
+        variancia_arrematacao = _dividir(resumo['soma2_arrematacao'], resumo['qtd_arrematados']) - media_arrematacao ** 2
+
+        return resumo.assign(
+            media_avaliacao=media_avaliacao,
+            media_arrematacao=media_arrematacao,
+            desvio_avaliacao=np.sqrt(variancia_avaliacao.clip(lower=0)),
+            desvio_arrematacao=np.sqrt(variancia_arrematacao.clip(lower=0)),
+            taxa_arrematacao=_dividir(resumo['qtd_arrematados'], resumo['qtd_lotes']),
+            eficiencia_media=_dividir(resumo['soma_eficiencia'], resumo['qtd_lotes']),
+        )
@@ -0,0 +1,461 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import streamlit as st
+
+from nucleo.instrumentacao import consultar_cache, medido, registrar_falta
+from nucleo.moeda import para_reais
+
+# LEILAO_DADOS aponta o app para outro diretório de dados (ex.: catálogos
+# sintéticos gerados por benchmarks/catalogo_sintetico.py)
+DIRETORIO_DADOS = Path(os.environ.get('LEILAO_DADOS') or Path(__file__).resolve().parent.parent / 'dados')
+
+CAMINHO_TABELA = DIRETORIO_DADOS / 'tabela.csv'
+
+# Catálogo com vários leilões, particionado em diretórios chave=valor:
+#   dados/leiloes/leilao=<nome>/data=<AAAA-MM-DD>/uf=<UF>/<arquivo>.csv
+# Sem esse diretório, tabela.csv é tratada como um catálogo de um só leilão.
+DIRETORIO_LEILOES = CAMINHO_TABELA.parent / 'leiloes'
+
+# Chave de partição -> coluna acrescentada à tabela. A UF da partição é a
+# do pátio e fica em coluna própria: a coluna UF do CSV é a do emplacamento.
+CHAVES_PARTICAO = {'leilao': 'LEILÃO', 'data': 'DATA LEILÃO', 'uf': 'UF PÁTIO'}
+
+# Partição de origem de cada linha (caminho relativo ao diretório de dados):
+# identifica as linhas de uma partição mesmo quando as chaves se repetem
+COLUNA_PARTICAO = 'PARTIÇÃO'
+
+# Quantas seleções de leilões diferentes ficam em cache ao mesmo tempo
+VERSOES_EM_CACHE = 4
+
+# Motor SQL embutido para as agregações ('duckdb' ou 'sqlite'; vazio = pandas)
+MOTOR_SQL = os.environ.get('LEILAO_MOTOR_SQL', '').strip().lower() or None
+
+COLUNAS_MOEDA = ['AVALIAÇÃO', 'Lance Inicial', 'Valor da Arrematação']
+
+COLUNAS_CATEGORICAS = [
+    'TIPO', 'COR', 'MARCA', 'MUNICÍPIO', 'UF', 'CLASSIFICAÇÃO', 'PÁTIO', 'NOME_POPULAR'
+]
+
+# Tipos das colunas da tabela limpa. Valores monetários ficam em float32:
+# a precisão (~7 dígitos significativos) sobra para os valores exibidos
+# em reais inteiros e ocupa metade da memória de float64.
+ESQUEMA = {
+    'LOTE': np.int32,
+    **{col: 'category' for col in COLUNAS_CATEGORICAS},
+    **{col: np.float32 for col in COLUNAS_MOEDA},
+}
+
+# Incrementar sempre que ESQUEMA mudar, para invalidar caches colunares antigos
+VERSAO_ESQUEMA = '2'
+_CHAVE_VERSAO = b'leilao.versao_esquema'
+
+# Deltas de lotes de uma partição (nucleo.ingestao) ficam em <csv>.deltas/
+SUFIXO_DELTAS = '.deltas'
+
+# Número do último delta que o cache colunar já contém
+_CHAVE_DELTAS = b'leilao.deltas'
+
+
+def ler_tabela(caminho=CAMINHO_TABELA):
+    """
+    Lê o CSV do leilão e limpa as colunas monetárias (sem cache)
+    """
+    tipos_leitura = {col: tipo for col, tipo in ESQUEMA.items() if col not in COLUNAS_MOEDA}
+    df = pd.read_csv(caminho, encoding='utf-8', dtype=tipos_leitura)
+
+    for col in COLUNAS_MOEDA:
+        df[col] = para_reais(df[col]).astype(ESQUEMA[col])
+
+    return df
+
+
+def caminho_cache(caminho=CAMINHO_TABELA):
+    """
+    Arquivo colunar (Feather/Arrow IPC) mantido ao lado do CSV
+    """
+    return Path(caminho).with_suffix('.feather')
+
+
+def caminho_deltas(caminho=CAMINHO_TABELA):
+    """
+    Diretório com os deltas de lotes da partição (``nucleo.ingestao``), ao lado do CSV
+    """
+    return Path(caminho).with_suffix(SUFIXO_DELTAS)
+
+
+def listar_deltas(caminho=CAMINHO_TABELA):
+    """
+    Arquivos de delta da partição, na ordem em que foram registrados
+    """
+    diretorio = caminho_deltas(caminho)
+    return sorted(diretorio.glob('*.csv')) if diretorio.is_dir() else []
+
+
+def numero_delta(arquivo):
+    """
+    Número de sequência de um arquivo de delta (``000123.csv`` -> 123)
+    """
+    return int(Path(arquivo).stem)
+
+
+def ultimo_delta(caminho=CAMINHO_TABELA, deltas=None):
+    """
+    Número do último delta registrado na partição (0 sem deltas). Só cresce:
+    a consolidação (``nucleo.ingestao.consolidar_deltas``) mantém o número.
+    """
+    deltas = listar_deltas(caminho) if deltas is None else deltas
+    return numero_delta(deltas[-1]) if deltas else 0
+
+
+def primeiro_delta(caminho=CAMINHO_TABELA, deltas=None):
+    """
+    Número do delta mais antigo da partição (0 sem deltas). Não muda com
+    novos deltas, só quando eles são consolidados em um único arquivo.
+    """
+    deltas = listar_deltas(caminho) if deltas is None else deltas
+    return numero_delta(deltas[0]) if deltas else 0
+
+
+def deltas_entre(caminho, depois, ate=None, deltas=None):
+    """
+    Arquivos de delta com número em (``depois``, ``ate``]
+    """
+    deltas = listar_deltas(caminho) if deltas is None else deltas
+    return [arquivo for arquivo in deltas if depois < numero_delta(arquivo) and (ate is None or numero_delta(arquivo) <= ate)]
+
+
+def cache_atualizado(caminho=CAMINHO_TABELA):
+    """
+    Indica se o cache colunar existe, é mais novo que o CSV e segue o ESQUEMA atual
+    """
+    cache = caminho_cache(caminho)
+    if not cache.exists() or cache.stat().st_mtime_ns < Path(caminho).stat().st_mtime_ns:
+        return False
+
+    with pa.memory_map(str(cache)) as arquivo:
+        metadados = pa.ipc.open_file(arquivo).schema.metadata or {}
+    return metadados.get(_CHAVE_VERSAO) == VERSAO_ESQUEMA.encode()
+
+
+def gravar_cache(df, caminho=CAMINHO_TABELA, deltas=0):
+    """
+    Grava a tabela tipada no cache colunar, com a versão do esquema e o
+    número do último delta já aplicado.
+
+    O arquivo é gravado sem compressão para poder ser lido com memory mapping,
+    e substituído de forma atômica para que leitores concorrentes nunca vejam
+    um cache pela metade.
+    """
+    cache = caminho_cache(caminho)
+    temporario = cache.with_name(f'{cache.name}.{os.getpid()}.tmp')
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        _CHAVE_VERSAO: VERSAO_ESQUEMA.encode(),
+        _CHAVE_DELTAS: str(deltas).encode(),
+    })
+    feather.write_feather(tabela, temporario, compression='uncompressed')
+    os.replace(temporario, cache)
+
+
+def _ler_com_deltas(caminho, deltas):
+    df = ler_tabela(caminho)
+    if deltas:
+        from nucleo.ingestao import aplicar_deltas  # evita import circular
+        df = aplicar_deltas(df, deltas)
+    return df
+
+
+def preprocessar(caminho=CAMINHO_TABELA):
+    """
+    Limpa o CSV, aplica os deltas registrados e grava o cache colunar
+    """
+    deltas = listar_deltas(caminho)
+    df = _ler_com_deltas(caminho, deltas)
+    gravar_cache(df, caminho, ultimo_delta(caminho, deltas))
+    return df
+
+
+def carregar_tabela(caminho=CAMINHO_TABELA):
+    """
+    Lê a tabela limpa do cache colunar, reconstruindo-o quando estiver velho.
+
+    Deltas registrados depois da gravação do cache são aplicados só sobre
+    os lotes que eles tocam, e o cache é regravado sem reler o CSV.
+    """
+    try:
+        return _carregar_tabela(caminho)
+    except FileNotFoundError:
+        if not Path(caminho).exists():
+            raise
+        # Deltas consolidados durante a leitura: a nova listagem tem o consolidado
+        return _carregar_tabela(caminho)
+
+
+def _carregar_tabela(caminho):
+    deltas = listar_deltas(caminho)
+    ultimo = ultimo_delta(caminho, deltas)
+    if cache_atualizado(caminho):
+        tabela = feather.read_table(caminho_cache(caminho), memory_map=True)
+        aplicados = int((tabela.schema.metadata or {}).get(_CHAVE_DELTAS, b'0'))
+        if aplicados == ultimo:
+            return tabela.to_pandas()
+        if aplicados < ultimo:
+            from nucleo.ingestao import aplicar_deltas  # evita import circular
+            df = aplicar_deltas(tabela.to_pandas(), deltas_entre(caminho, aplicados, deltas=deltas))
+            try:
+                gravar_cache(df, caminho, ultimo)
+            except OSError:
+                pass
+            return df
+
+    try:
+        return preprocessar(caminho)
+    except OSError:
+        # Diretório somente leitura: segue sem cache
+        return _ler_com_deltas(caminho, deltas)
+
+
+def _chaves_particao(caminho, raiz=DIRETORIO_LEILOES):
+    """
+    Valores das chaves de partição lidos dos diretórios ``chave=valor``
+    """
+    caminho = Path(caminho)
+    chaves = dict.fromkeys(CHAVES_PARTICAO)
+    if caminho.is_relative_to(raiz):
+        for parte in caminho.relative_to(raiz).parent.parts:
+            chave, _, valor = parte.partition('=')
+            if chave in chaves and valor:
+                chaves[chave] = valor
+    chaves['leilao'] = chaves['leilao'] or caminho.stem
+    return chaves
+
+
+def listar_particoes(raiz=DIRETORIO_LEILOES):
+    """
+    Arquivos do catálogo com suas chaves de partição, do leilão mais antigo
+    para o mais recente. Apenas lista diretórios: nenhum arquivo é lido.
+    """
+    raiz = Path(raiz)
+    arquivos = sorted(
+        arquivo for arquivo in raiz.rglob('*.csv') if arquivo.parent.suffix != SUFIXO_DELTAS
+    ) if raiz.is_dir() else []
+    if not arquivos:
+        arquivos = [CAMINHO_TABELA]
+
+    particoes = pd.DataFrame([
+        {'caminho': arquivo, **_chaves_particao(arquivo, raiz)} for arquivo in arquivos
+    ], columns=['caminho', *CHAVES_PARTICAO])
+    return particoes.sort_values(['data', 'leilao'], na_position='first', kind='stable', ignore_index=True)
+
+
+def leiloes_disponiveis():
+    """
+    Nomes dos leilões do catálogo, do mais antigo para o mais recente
+    """
+    return list(dict.fromkeys(listar_particoes()['leilao']))
+
+
+def selecionar_particoes(particoes, leiloes=None):
+    """
+    Filtra as partições pelo leilão (predicate pushdown): só as partições
+    dos leilões selecionados serão lidas
+    """
+    if leiloes is None:
+        return particoes
+    return particoes[particoes['leilao'].isin(leiloes)]
+
+
+def unificar_categorias(partes):
+    """
+    Dá às colunas categóricas em comum das partes a união das categorias
+    (altera as partes, que devem ser cópias)
+    """
+    for col in partes[0].columns:
+        if isinstance(partes[0][col].dtype, pd.CategoricalDtype):
+            comuns = [
+                parte for parte in partes
+                if col in parte.columns and isinstance(parte[col].dtype, pd.CategoricalDtype)
+            ]
+            categorias = comuns[0][col].cat.categories
+            for parte in comuns[1:]:
+                categorias = categorias.union(parte[col].cat.categories)
+            for parte in comuns:
+                parte[col] = parte[col].cat.set_categories(categorias)
+    return partes
+
+
+def _concatenar(partes):
+    """
+    Concatena partições mantendo as colunas categóricas como categóricas
+    """
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat(unificar_categorias(partes), ignore_index=True)
+
+
+def identificador_particao(caminho):
+    """
+    Valor de ``COLUNA_PARTICAO`` para as linhas de ``caminho``
+    """
+    caminho = Path(caminho)
+    if caminho.is_relative_to(DIRETORIO_DADOS):
+        return caminho.relative_to(DIRETORIO_DADOS).as_posix()
+    return str(caminho)
+
+
+def com_chaves_particao(parte, caminho):
+    """
+    Acrescenta as chaves de partição de ``caminho`` e a partição de origem
+    como colunas categóricas
+    """
+    valores = {CHAVES_PARTICAO[chave]: valor for chave, valor in _chaves_particao(caminho).items()}
+    valores[COLUNA_PARTICAO] = identificador_particao(caminho)
+    for coluna, valor in valores.items():
+        if valor is not None:
+            parte[coluna] = pd.Categorical.from_codes(np.zeros(len(parte), dtype=np.int8), categories=[valor])
+    return parte
+
+
+def mascara_particao(df, caminho):
+    """
+    Linhas de ``df`` (uma carga de várias partições) que vêm de ``caminho``
+    """
+    return (df[COLUNA_PARTICAO] == identificador_particao(caminho)).to_numpy()
+
+
+def carregar_particoes(caminhos):
+    """
+    Lê as partições informadas (cada uma pelo seu cache colunar) e acrescenta
+    as chaves e a partição de origem como colunas categóricas
+    """
+    return _concatenar([com_chaves_particao(carregar_tabela(caminho), caminho) for caminho in caminhos])
+
+
+def versao_dados(leiloes=None):
+    """
+    Versão da seleção atual: (arquivo, mtime, último delta) de cada
+    partição selecionada, ou None se algum arquivo não existir.
+
+    Caches derivados da tabela (índices, agregados) devem usar este valor
+    como parte da chave para serem refeitos quando a seleção ou os arquivos
+    mudarem. Um delta novo muda só a versão das seleções que incluem a
+    partição dele.
+    """
+    particoes = selecionar_particoes(listar_particoes(), leiloes)
+    try:
+        return tuple(
+            (str(caminho), caminho.stat().st_mtime_ns, ultimo_delta(caminho)) for caminho in particoes['caminho']
+        )
+    except FileNotFoundError:
+        return None
+
+
+def versao_consolidada(versao):
+    """
+    Versão que ignora os deltas ainda não consolidados: (arquivo, mtime,
+    primeiro delta pendente) de cada partição. Muda quando um arquivo muda
+    ou os deltas são consolidados, e não a cada micro-lote do modo ao vivo:
+    serve de chave para caches caros que podem ficar um pouco atrás.
+    """
+    return tuple((caminho, mtime, primeiro_delta(caminho)) for caminho, mtime, _ in versao)
+
+
+@medido('carregar: dados')
+def carregar_dados(leiloes=None):
+    """
+    Carrega os lotes dos leilões selecionados (todos, se ``leiloes`` for None),
+    uma única vez por versão da seleção.
+
+    Já inclui as colunas de ``nucleo.derivadas``. O DataFrame retornado é
+    compartilhado entre todas as páginas e sessões, portanto as páginas não
+    devem alterá-lo: colunas derivadas novas devem ir para
+    ``nucleo.derivadas`` ou ser criadas em uma cópia rasa
+    (``df.copy(deep=False)``) ou em um filtro.
+    """
+    versao = versao_dados(leiloes)
+    if versao is None:
+        raise FileNotFoundError(f'Arquivo de dados não encontrado: {CAMINHO_TABELA}')
+    consultar_cache('dados')
+    return _carregar_versao(versao)
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, show_spinner="Carregando dados do leilão...")
+def _carregar_versao(versao):
+    registrar_falta('dados')
+    from nucleo.ingestao import cargas_incrementais  # evita import circular
+    return cargas_incrementais().tabela(versao)
+
+
+@medido('carregar: cubo')
+def carregar_cubo(leiloes=None):
+    """
+    Cubo de agregação da seleção atual, construído uma vez por versão.
+
+    Com ``MOTOR_SQL`` definido, as células são somadas pelo banco embutido
+    (``nucleo.banco``), sem carregar as linhas na memória.
+    """
+    if MOTOR_SQL:
+        from nucleo.banco import carregar_cubo as carregar_cubo_sql  # evita import circular
+        return carregar_cubo_sql(leiloes)
+
+    versao = versao_dados(leiloes)
+    if versao is None:
+        raise FileNotFoundError(f'Arquivo de dados não encontrado: {CAMINHO_TABELA}')
+    consultar_cache('cubo')
+    return _cubo_versao(versao)
+
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, show_spinner="Preparando agregados...")
+def _cubo_versao(versao):
+    registrar_falta('cubo')
+    from nucleo.ingestao import cargas_incrementais  # evita import circular
+    return cargas_incrementais().cubo(versao, _carregar_versao)
+
+
+def seletor_leiloes():
+    """
+    Multiselect de leilões na barra lateral, com a escolha mantida entre as
+    páginas. Começa pelo leilão mais recente, para que a memória acompanhe a
+    seleção e não o histórico inteiro.
+    """
+    opcoes = leiloes_disponiveis()
+    if len(opcoes) == 1:
+        return opcoes
+
+    anteriores = [leilao for leilao in st.session_state.get('leiloes_selecionados', []) if leilao in opcoes]
+    selecionados = st.sidebar.multiselect(
+        "Leilão:",
+        options=opcoes,
+        default=anteriores or opcoes[-1:]
+    )
+    st.session_state['leiloes_selecionados'] = selecionados
+
+    if not selecionados:
+        st.warning("⚠️ Selecione pelo menos um leilão.")
+        st.stop()
+    return selecionados
+
+
+def aviso_linhas_em_memoria():
+    """
+    Nota na barra lateral das páginas que filtram lote a lote: mesmo com o
+    motor SQL, elas carregam as linhas dos leilões selecionados na memória
+    """
+    if MOTOR_SQL:
+        st.sidebar.caption(
+            "ℹ️ Motor SQL: esta página filtra lote a lote e carrega na memória todos os lotes "
+            "dos leilões selecionados; só os agregados saem do banco."
+        )
+
+
+if __name__ == '__main__':
+    # python -m nucleo.dados (a partir de leilão/) regrava o cache colunar de cada partição
+    for caminho in listar_particoes()['caminho']:
+        tabela = preprocessar(caminho)
+        print(f'{caminho_cache(caminho)}: {len(tabela)} lotes')
@@ -0,0 +1,92 @@
+"""
+Colunas derivadas da tabela limpa, calculadas de forma vetorizada.
+
+As colunas são calculadas uma única vez, dentro da carga compartilhada
+(``nucleo.dados.carregar_dados``). Mapeamentos por valor (cor ajustada,
+localização no cadastro de municípios) percorrem em Python apenas os
+valores distintos da coluna e depois são aplicados às linhas pelos códigos
+inteiros.
+"""
+import numpy as np
+import pandas as pd
+
+from nucleo.geo import localizar
+
+LIMITES_CATEGORIA_VALOR = [0, 15000, 50000, 100000, float('inf')]
+ROTULOS_CATEGORIA_VALOR = ['Econômico', 'Médio', 'Alto', 'Premium']
+
+ROTULOS_STATUS = ['Arrematado', 'Não Arrematado']
+
+CORES_PRINCIPAIS = ['PRETA', 'VERMELHA', 'BRANCA', 'PRATA', 'AZUL', 'CINZA']
+COR_OUTRAS = 'OUTRAS'
+
+
+def _por_valor(serie, funcao, ausente):
+    """
+    Aplica ``funcao`` a cada valor distinto e espalha o resultado pelas linhas
+    """
+    codigos, valores = pd.factorize(serie)
+    resultado = np.array([funcao(valor) for valor in valores] + [ausente])
+    return resultado[codigos]
+
+
+def categoria_valor(avaliacao):
+    """
+    Faixa de valor do lote a partir da avaliação
+    """
+    return pd.cut(avaliacao, bins=LIMITES_CATEGORIA_VALOR, labels=ROTULOS_CATEGORIA_VALOR)
+
+
+def status_arrematacao(arrematacao):
+    """
+    'Arrematado' quando há valor de arrematação, senão 'Não Arrematado'
+    """
+    codigos = np.where(arrematacao.notna().to_numpy(), 0, 1)
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, categories=ROTULOS_STATUS),
+        index=arrematacao.index,
+    )
+
+
+def eficiencia_arrematacao(arrematacao, avaliacao):
+    """
+    Razão arrematação / avaliação (0 para lotes não arrematados)
+    """
+    return (arrematacao / avaliacao).fillna(0)
+
+
+def diferenca_percentual(arrematacao, avaliacao):
+    """
+    Diferença percentual entre arrematação e avaliação
+    """
+    return ((arrematacao - avaliacao) / avaliacao) * 100
+
+
+def cor_ajustada(cor):
+    """
+    Cor do lote, com as cores fora de CORES_PRINCIPAIS agrupadas em 'OUTRAS'
+    """
+    categorias = CORES_PRINCIPAIS + [COR_OUTRAS]
+    codigos = _por_valor(
+        cor,
+        lambda valor: categorias.index(valor) if valor in CORES_PRINCIPAIS else len(CORES_PRINCIPAIS),
+        ausente=len(CORES_PRINCIPAIS),
+    )
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=cor.index)
+
+
+def adicionar_derivadas(df):
+    """
+    Acrescenta à tabela limpa todas as colunas derivadas usadas pelas páginas
+    """
+    arrematacao = df['Valor da Arrematação']
+    avaliacao = df['AVALIAÇÃO']
+
+    df['COR_AJUSTADA'] = cor_ajustada(df['COR'])
+    df['Status Arrematação'] = status_arrematacao(arrematacao)
+    df['Categoria Valor'] = categoria_valor(avaliacao)
+    df['Eficiência Arrematação'] = eficiencia_arrematacao(arrematacao, avaliacao)
+    df['Diferença Percentual'] = diferenca_percentual(arrematacao, avaliacao)
+    localizacao = localizar(df['MUNICÍPIO'], df['UF'])
+    df['COD_IBGE'], df['lat'], df['lon'] = localizacao['COD_IBGE'], localizacao['lat'], localizacao['lon']
+    return df
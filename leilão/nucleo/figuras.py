@@ -0,0 +1,102 @@
+"""
+Cache de figuras Plotly compartilhado entre reruns e sessões.
+
+As figuras são guardadas já serializadas (JSON), com a chave formada pelo
+nome do gráfico, a versão dos dados e os filtros que o afetam. Um rerun
+causado por outro widget encontra a figura pronta e não roda o Plotly
+Express de novo. O cache descarta as figuras menos usadas (LRU) quando o
+total de bytes passa do limite.
+"""
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+import streamlit as st
+
+from nucleo.instrumentacao import consultar_cache, cronometro, registrar_falta
+
+# Orçamento de memória para as figuras serializadas (todas as páginas)
+LIMITE_BYTES_FIGURAS = 64 * 1024 * 1024
+
+
+def _congelar(valor):
+    """
+    Converte listas, conjuntos e dicionários (valores de widgets) em tuplas
+    """
+    if isinstance(valor, dict):
+        return tuple((chave, _congelar(item)) for chave, item in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(item) for item in valor)
+    if isinstance(valor, (set, frozenset)):
+        return tuple(sorted(_congelar(item) for item in valor))
+    return valor
+
+
+class CacheFiguras:
+    """
+    LRU de figuras em JSON limitado pelo total de bytes
+    """
+
+    def __init__(self, limite_bytes=LIMITE_BYTES_FIGURAS):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, chave, construir):
+        """
+        Figura da chave, montada com ``construir()`` só quando não está no cache
+        """
+        with self._trava:
+            especificacao = self._itens.get(chave)
+            if especificacao is not None:
+                self._itens.move_to_end(chave)
+
+        consultar_cache('figuras')
+        if especificacao is None:
+            registrar_falta('figuras')
+            especificacao = construir().to_json()
+            self._guardar(chave, especificacao)
+        return pio.from_json(especificacao)
+
+    def _guardar(self, chave, especificacao):
+        tamanho = len(especificacao)
+        if tamanho > self.limite_bytes:
+            return
+
+        with self._trava:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._itens[chave] = especificacao
+            self.bytes += tamanho
+            while self.bytes > self.limite_bytes:
+                _, removida = self._itens.popitem(last=False)
+                self.bytes -= len(removida)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.bytes = 0
+
+
+@st.cache_resource
+def cache_figuras():
+    """
+    Instância única do cache no processo do servidor
+    """
+    return CacheFiguras()
+
+
+def figura_em_cache(nome, versao, filtros, construir):
+    """
+    Figura ``nome`` para a versão dos dados e os filtros informados.
+
+    ``filtros`` deve conter todo valor de widget que muda a figura;
+    ``construir`` é chamado sem argumentos quando a figura não está no cache.
+    """
+    with cronometro(f'figura: {nome}'):
+        return cache_figuras().obter((nome, versao, _congelar(filtros)), construir)
@@ -0,0 +1,145 @@
+"""
+Índice de filtros para os multiselects e sliders da barra lateral.
+
+Cada valor de cada coluna filtrável guarda um bitmap compactado (1 bit por
+lote, ``np.packbits``); valores raros guardam só as posições dos lotes, que
+ocupam menos memória que o bitmap. Uma combinação de filtros vira OR dos
+bitmaps dos valores escolhidos em cada coluna e AND entre colunas, sem
+reler as colunas de texto. Lotes sem valor na coluna formam um grupo
+próprio (NaN, o último valor), para que a seleção completa devolva todos os
+lotes, como o ``isin`` dos valores de ``unique()``. Faixas numéricas usam a
+ordenação da coluna e duas buscas binárias.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _marcar(bits, posicoes):
+    """
+    Liga, no bitmap compactado, os bits das posições informadas
+    """
+    np.bitwise_or.at(bits, posicoes >> 3, (128 >> (posicoes & 7)).astype(np.uint8))
+
+
+class IndiceFiltros:
+    """
+    Bitmaps por valor de categoria e índice ordenado para filtros de faixa
+    """
+
+    def __init__(self, df, colunas, faixa=None):
+        self.n = len(df)
+        self._bytes = (self.n + 7) // 8
+        self._valores = {}
+        self._bitmaps = {}
+
+        for col in colunas:
+            codigos, valores = pd.factorize(df[col])
+            valores = list(valores)
+            ausentes = codigos < 0
+            if ausentes.any():
+                # Ausentes recebem o último código
+                codigos = np.where(ausentes, len(valores), codigos)
+                valores.append(np.nan)
+            self._valores[col] = valores
+            self._bitmaps[col] = self._construir_bitmaps(codigos, len(valores))
+
+        self.faixa = faixa
+        if faixa is not None:
+            valores_faixa = df[faixa].to_numpy(dtype=np.float64)
+            self._ordem = np.argsort(valores_faixa, kind='stable')
+            self._ordenados = valores_faixa[self._ordem]
+
+    def _construir_bitmaps(self, codigos, quantidade):
+        """
+        Um bitmap (ou lista de posições, se o valor for raro) por valor da coluna
+        """
+        ordem = np.argsort(codigos, kind='stable').astype(np.int64)
+        limites = np.searchsorted(codigos[ordem], np.arange(quantidade + 1))
+
+        bitmaps = []
+        for k in range(quantidade):
+            posicoes = ordem[limites[k]:limites[k + 1]]
+            # Lista de posições int32 é menor que o bitmap quando há < n/32 lotes
+            if len(posicoes) * 32 < self.n:
+                bitmaps.append(posicoes.astype(np.int32))
+            else:
+                # No máximo 32 valores chegam aqui, então a comparação direta é barata
+                bitmaps.append(np.packbits(codigos == k))
+        return bitmaps
+
+    def valores(self, col, ordenar=False):
+        """
+        Valores distintos da coluna, na ordem em que aparecem na tabela (ou em
+        ordem crescente, com ``ordenar``); NaN, se houver, vem por último
+        """
+        valores = self._valores[col]
+        if ordenar:
+            return sorted(valor for valor in valores if not pd.isna(valor)) + [
+                valor for valor in valores if pd.isna(valor)
+            ]
+        return list(valores)
+
+    def limites(self):
+        """
+        Menor e maior valor da coluna de faixa (ignorando ausentes)
+        """
+        validos = self._ordenados[~np.isnan(self._ordenados)]
+        return float(validos[0]), float(validos[-1])
+
+    def _bitmap_selecao(self, col, selecionados):
+        """
+        OR dos bitmaps dos valores selecionados, ou None se todos estiverem
+        """
+        valores = self._valores[col]
+        selecionados = set(selecionados)
+        # NaN não é igual a si mesmo: o grupo dos ausentes é comparado à parte
+        ausentes = any(pd.isna(valor) for valor in selecionados)
+        escolhidos = [
+            k for k, valor in enumerate(valores) if (ausentes if pd.isna(valor) else valor in selecionados)
+        ]
+        if len(escolhidos) == len(valores):
+            return None
+
+        bits = np.zeros(self._bytes, dtype=np.uint8)
+        for k in escolhidos:
+            bitmap = self._bitmaps[col][k]
+            if bitmap.dtype == np.uint8:
+                np.bitwise_or(bits, bitmap, out=bits)
+            else:
+                _marcar(bits, bitmap.astype(np.int64))
+        return bits
+
+    def _bitmap_faixa(self, minimo, maximo):
+        """
+        Bitmap dos lotes com minimo <= valor <= maximo
+        """
+        inicio = np.searchsorted(self._ordenados, minimo, side='left')
+        fim = np.searchsorted(self._ordenados, maximo, side='right')
+        if inicio == 0 and fim == self.n:
+            return None
+
+        dentro = np.zeros(self.n, dtype=bool)
+        dentro[self._ordem[inicio:fim]] = True
+        return np.packbits(dentro)
+
+    def mascara(self, selecoes, faixa=None):
+        """
+        Máscara booleana dos lotes que atendem a todas as seleções.
+
+        ``selecoes`` mapeia coluna -> valores escolhidos (OR dentro da coluna,
+        AND entre colunas); ``faixa`` é um par (mínimo, máximo) aplicado à
+        coluna de faixa do índice.
+        """
+        partes = [self._bitmap_selecao(col, valores) for col, valores in selecoes.items()]
+        if faixa is not None:
+            partes.append(self._bitmap_faixa(*faixa))
+
+        resultado = None
+        for bits in partes:
+            if bits is None:
+                continue
+            resultado = bits.copy() if resultado is None else np.bitwise_and(resultado, bits, out=resultado)
+
+        if resultado is None:
+            return np.ones(self.n, dtype=bool)
+        return np.unpackbits(resultado, count=self.n).view(bool)
@@ -0,0 +1,228 @@
+"""
+Cadastro offline de municípios brasileiros e localização vetorizada dos lotes.
+
+``dados/municipios.csv`` é a lista completa dos 5.570 municípios do IBGE:
+código IBGE, nome, UF, latitude e longitude da sede. ``LEILAO_MUNICIPIOS``
+aponta para outro arquivo com as mesmas colunas (por exemplo, um cadastro
+próprio com as coordenadas dos pátios). Os nomes são comparados
+normalizados: sem acentos, sem diferença de caixa e com pontuação e espaços
+reduzidos a um espaço.
+
+A localização é resolvida por par (município, UF) distinto, nunca por
+linha: primeiro por nome e UF; os pares sem correspondência (no catálogo
+a UF é a do emplacamento, não a do pátio) ficam com o município desse nome
+mais votado entre os lotes resolvidos, ou com o único município do
+cadastro com esse nome. O resultado volta às linhas por indexação NumPy.
+
+A busca por raio a partir da base de um comprador usa a distância de
+círculo máximo (haversine) vetorizada. Como os lotes herdam a sede do
+município, ``IndiceLocalizacoes`` calcula a distância uma vez por código
+IBGE e a leva aos lotes pelos códigos inteiros, sem árvore espacial.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_MUNICIPIOS = Path(
+    os.environ.get('LEILAO_MUNICIPIOS') or Path(__file__).resolve().parent.parent / 'dados' / 'municipios.csv'
+)
+
+RAIO_TERRA_KM = 6371.0088
+
+# Distância por estrada estimada a partir da distância em linha reta
+FATOR_ROTA = 1.3
+
+# Grafias do catálogo que diferem do nome oficial
+APELIDOS_MUNICIPIOS = {
+    'Alto Garçal': 'Alto Garças',
+    'Pontes e Licentia': 'Pontes e Lacerda',
+}
+
+
+def normalizar(nomes):
+    """
+    Nomes sem acentos, em maiúsculas, com pontuação e espaços repetidos
+    reduzidos a um espaço ('Pontes-e  lacerda' -> 'PONTES E LACERDA')
+    """
+    return (
+        pd.Series(nomes, dtype=object)
+        .str.normalize('NFKD')
+        .str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.upper()
+        .str.replace(r'[^A-Z0-9]+', ' ', regex=True)
+        .str.strip()
+    )
+
+
+@lru_cache(maxsize=None)
+def carregar_municipios(caminho=CAMINHO_MUNICIPIOS):
+    """
+    Cadastro de municípios com o nome normalizado em ``chave`` (lido uma vez)
+    """
+    municipios = pd.read_csv(caminho, encoding='utf-8', dtype={'codigo_ibge': np.int32, 'uf': str})
+    return municipios.assign(chave=normalizar(municipios['nome']))
+
+
+def _resolver(pares, municipios):
+    """
+    Linha do cadastro (ou -1) de cada par distinto (chave, uf, lotes)
+    """
+    exatos = pd.MultiIndex.from_frame(municipios[['chave', 'uf']])
+    linhas = exatos.get_indexer(pd.MultiIndex.from_frame(pares[['chave', 'uf']]))
+
+    # Município de cada nome mais votado pelos lotes dos pares com nome e UF exatos
+    votos = (
+        pares.assign(linha=linhas)[linhas >= 0]
+        .groupby(['chave', 'linha'])['lotes'].sum()
+        .reset_index()
+        .sort_values('lotes', ascending=False, kind='stable')
+        .drop_duplicates('chave')
+    )
+    mais_votado = dict(zip(votos['chave'], votos['linha']))
+
+    # Nomes que existem em uma única UF
+    homonimos = municipios['chave'].duplicated(keep=False)
+    unico = dict(zip(municipios.loc[~homonimos, 'chave'], np.flatnonzero(~homonimos)))
+
+    faltando = linhas < 0
+    linhas[faltando] = [mais_votado.get(chave, unico.get(chave, -1)) for chave in pares['chave'][faltando]]
+    return linhas
+
+
+def localizar(municipios, ufs=None, cadastro=None):
+    """
+    Código IBGE, latitude e longitude de cada lote pelo município e pela UF
+    (ausentes quando o município não está no cadastro)
+    """
+    cadastro = carregar_municipios() if cadastro is None else cadastro
+    municipios = pd.Series(municipios)
+    ufs = pd.Series(np.nan if ufs is None else ufs, index=municipios.index, dtype=object if ufs is None else None)
+
+    codigos_municipio, nomes = pd.factorize(municipios)
+    codigos_uf, siglas = pd.factorize(ufs)
+    base = len(siglas) + 1
+    distintos, inverso, lotes = np.unique(
+        (codigos_municipio + 1) * base + codigos_uf + 1, return_inverse=True, return_counts=True
+    )
+
+    apelidos = dict(zip(normalizar(list(APELIDOS_MUNICIPIOS)), normalizar(list(APELIDOS_MUNICIPIOS.values()))))
+    chaves = normalizar(np.append(np.asarray(nomes, dtype=object), np.nan)).map(lambda chave: apelidos.get(chave, chave)).to_numpy()
+    siglas = np.append(np.asarray(siglas, dtype=object), np.nan)
+    pares = pd.DataFrame({
+        'chave': chaves[distintos // base - 1],
+        'uf': siglas[distintos % base - 1],
+        'lotes': lotes,
+    })
+    linhas = _resolver(pares, cadastro)[inverso]
+
+    ausentes = linhas < 0
+    localizacao = cadastro[['codigo_ibge', 'latitude', 'longitude']].iloc[np.where(ausentes, 0, linhas)]
+    codigos = pd.array(localizacao['codigo_ibge'].to_numpy(), dtype='Int32')
+    codigos[ausentes] = pd.NA
+    return pd.DataFrame({
+        'COD_IBGE': codigos,
+        'lat': np.where(ausentes, np.nan, localizacao['latitude'].to_numpy()),
+        'lon': np.where(ausentes, np.nan, localizacao['longitude'].to_numpy()),
+    }, index=municipios.index)
+
+
+def coordenadas_por_municipio(df):
+    """
+    Latitude e longitude de cada MUNICÍPIO da tabela: a localização mais
+    comum entre os seus lotes (municípios fora do cadastro ficam de fora)
+    """
+    localizacoes = (
+        df.groupby(['MUNICÍPIO', 'lat', 'lon'], observed=True).size()
+        .reset_index(name='lotes')
+        .sort_values('lotes', ascending=False, kind='stable')
+        .drop_duplicates('MUNICÍPIO')
+    )
+    return localizacoes.set_index(localizacoes['MUNICÍPIO'].astype(str))[['lat', 'lon']]
+
+
+def enquadramento(lat, lon):
+    """
+    Centro e zoom de um mapa Mapbox que mostra todos os pontos
+    """
+    lat, lon = pd.Series(lat).dropna(), pd.Series(lon).dropna()
+    if lat.empty:
+        return None, 4
+    centro = {'lat': (lat.min() + lat.max()) / 2, 'lon': (lon.min() + lon.max()) / 2}
+    # A 360° / 2^zoom por ~1000 px de largura; no mínimo 2° de extensão
+    extensao = max(lat.max() - lat.min(), lon.max() - lon.min(), 2)
+    return centro, float(np.clip(np.log2(360 / extensao), 2, 10))
+
+
+def distancia_km(lat, lon, lat_base, lon_base):
+    """
+    Distância de círculo máximo (haversine), em km, de cada ponto à base
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat_base, lon_base = np.radians(lat_base), np.radians(lon_base)
+    a = np.sin((lat - lat_base) / 2) ** 2 + np.cos(lat) * np.cos(lat_base) * np.sin((lon - lon_base) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class IndiceLocalizacoes:
+    """
+    Localizações distintas dos lotes (uma por código IBGE), para calcular
+    distâncias por município e não por lote
+    """
+
+    def __init__(self, df):
+        self.codigos, unicos = pd.factorize(df['COD_IBGE'])
+        self.lat = np.empty(len(unicos))
+        self.lon = np.empty(len(unicos))
+        localizados = self.codigos >= 0
+        self.lat[self.codigos[localizados]] = df['lat'].to_numpy()[localizados]
+        self.lon[self.codigos[localizados]] = df['lon'].to_numpy()[localizados]
+
+    def distancias(self, lat_base, lon_base):
+        """
+        Distância (km) de cada lote à base; NaN nos lotes sem localização
+        """
+        por_local = distancia_km(self.lat, self.lon, lat_base, lon_base)
+        return np.append(por_local, np.nan)[self.codigos]
+
+
+def custo_frete(distancias, custo_km, fator=FATOR_ROTA):
+    """
+    Frete estimado (R$) de cada lote até a base, pela distância por estrada
+    """
+    return distancias * fator * custo_km
+
+
+def oportunidades_no_raio(df, distancias, raio_km, custo_km, limite=50):
+    """
+    Lotes a até ``raio_km`` da base, ordenados pela margem estimada: o
+    desconto sobre a avaliação (pelo valor arrematado ou, sem arremate, pelo
+    lance inicial) menos o frete. Devolve os ``limite`` melhores e os
+    totais do raio; só os melhores viram DataFrame.
+    """
+    no_raio = np.flatnonzero(distancias <= raio_km)
+    avaliacao = df['AVALIAÇÃO'].to_numpy(dtype=np.float64, na_value=np.nan)[no_raio]
+    arrematacao = df['Valor da Arrematação'].to_numpy(dtype=np.float64, na_value=np.nan)[no_raio]
+    lance = df['Lance Inicial'].to_numpy(dtype=np.float64, na_value=np.nan)[no_raio]
+    preco = np.where(np.isnan(arrematacao), lance, arrematacao)
+    frete = custo_frete(distancias[no_raio], custo_km)
+    margem = avaliacao - preco - frete
+
+    ordenavel = np.where(np.isnan(margem), -np.inf, margem)
+    melhores = np.argpartition(-ordenavel, limite)[:limite] if len(ordenavel) > limite else np.arange(len(ordenavel))
+    melhores = melhores[np.argsort(-ordenavel[melhores], kind='stable')]
+
+    ranking = df.iloc[no_raio[melhores]][['LOTE', 'NOME_POPULAR', 'TIPO', 'MUNICÍPIO', 'AVALIAÇÃO']].assign(**{
+        'Preço': preco[melhores],
+        'Distância (km)': distancias[no_raio[melhores]],
+        'Frete': frete[melhores],
+        'Margem Estimada': margem[melhores],
+    })
+    totais = {
+        'lotes': len(no_raio),
+        'margem_total': float(np.nansum(margem)),
+        'frete_medio': float(frete.mean()) if len(frete) else np.nan,
+    }
+    return ranking.reset_index(drop=True), totais
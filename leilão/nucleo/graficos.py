@@ -0,0 +1,70 @@
+"""
+Pizzas de arrematação da página de análise geral.
+
+Por padrão a pizza é desenhada com o Matplotlib, pela API de ``Figure`` (sem
+o registro global do pyplot, que mantinha cada figura viva), e o PNG fica em
+cache pelas contagens: reruns e outras sessões reaproveitam a imagem. Com
+``LEILAO_GRAFICOS_LEVES=1`` a pizza é um gráfico Plotly e o Matplotlib não
+chega a ser importado.
+"""
+import io
+import os
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from nucleo.instrumentacao import consultar_cache, registrar_falta
+
+GRAFICOS_LEVES = os.environ.get('LEILAO_GRAFICOS_LEVES', '').strip() not in ('', '0')
+
+ROTULOS_PIZZA = ['Arrematados', 'Não Arrematados']
+CORES_PIZZA = ['#4CAF50', '#F44336']
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def pizza_png(titulo, arrematados, nao_arrematados):
+    """
+    PNG da pizza arrematados x não arrematados, desenhado uma vez por contagem
+    """
+    from matplotlib.figure import Figure  # só carregado quando a imagem não está em cache
+
+    registrar_falta('pizzas')
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie([arrematados, nao_arrematados], labels=ROTULOS_PIZZA, colors=CORES_PIZZA, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+    ax.set_title(titulo, fontsize=14, fontweight='bold', pad=20)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def pizza_plotly(titulo, arrematados, nao_arrematados):
+    """
+    Mesma pizza como gráfico Plotly (começando às 12h, no sentido anti-horário)
+    """
+    fig = go.Figure(go.Pie(
+        labels=ROTULOS_PIZZA,
+        values=[arrematados, nao_arrematados],
+        marker=dict(colors=CORES_PIZZA),
+        textinfo='label+percent',
+        texttemplate='%{label}<br>%{percent:.1%}',
+        sort=False,
+        direction='counterclockwise',
+        showlegend=False
+    ))
+    fig.update_layout(title=dict(text=f'<b>{titulo}</b>', x=0.5, xanchor='center'))
+    return fig
+
+
+def mostrar_pizza_arrematacao(titulo, arrematados, nao_arrematados):
+    """
+    Exibe a pizza no formato configurado (PNG em cache ou Plotly)
+    """
+    if GRAFICOS_LEVES:
+        st.plotly_chart(pizza_plotly(titulo, arrematados, nao_arrematados), use_container_width=True)
+    else:
+        consultar_cache('pizzas')
+        st.image(pizza_png(titulo, int(arrematados), int(nao_arrematados)), use_container_width=True)
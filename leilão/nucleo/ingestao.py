@@ -0,0 +1,320 @@
+"""
+Ingestão incremental de lotes: deltas com upsert pela chave LOTE.
+
+Durante o leilão chegam lotes novos e resultados (``Valor da Arrematação``)
+de lotes já publicados. Em vez de regravar o CSV da partição, cada remessa
+é registrada como um arquivo de delta em ``<csv>.deltas/``
+(``registrar_delta`` ou ``python -m nucleo.ingestao delta.csv``). Um delta
+é um CSV com a coluna LOTE e qualquer subconjunto das demais colunas de
+tabela.csv: nos lotes existentes só essas colunas são substituídas (célula
+vazia = valor ausente) e os lotes novos são acrescentados.
+
+Nada é relido por inteiro:
+
+- o cache colunar da partição (``nucleo.dados.carregar_tabela``) recebe só
+  os deltas que ainda não tem e é regravado;
+- ``versao_dados`` leva o número do último delta de cada partição, então só
+  os caches das seleções que incluem a partição são invalidados;
+- a tabela carregada e o cubo da seleção saem da versão anterior que está
+  na memória: as colunas derivadas são recalculadas só nas linhas tocadas e
+  o cubo desconta as linhas antigas e soma as novas.
+
+Os esboços de quantis e o banco do motor SQL são refeitos a partir do cache
+colunar já atualizado, apenas para as partições que receberam deltas.
+
+Para que o diretório de deltas não cresça sem fim (no modo ao vivo chega um
+delta a cada poucos segundos), ``consolidar_deltas`` funde os deltas da
+partição em um só arquivo, com o número do último, e atualiza o cache
+colunar. Como os números só crescem, a consolidação não muda a versão.
+"""
+import argparse
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from nucleo.cubo import CuboAgregado
+from nucleo.dados import (
+    CAMINHO_TABELA, COLUNAS_MOEDA, ESQUEMA, VERSOES_EM_CACHE, caminho_deltas, carregar_particoes,
+    carregar_tabela, com_chaves_particao, deltas_entre, listar_deltas, mascara_particao, ultimo_delta,
+    unificar_categorias, versao_dados,
+)
+from nucleo.derivadas import adicionar_derivadas
+from nucleo.moeda import para_reais
+
+
+def ler_delta(caminho):
+    """
+    Lê um arquivo de delta, com as colunas presentes tipadas como em
+    ``ESQUEMA``. Um LOTE repetido no mesmo delta fica com a última linha.
+    """
+    df = pd.read_csv(caminho, encoding='utf-8', dtype=str)
+    if 'LOTE' not in df.columns:
+        raise ValueError('Delta sem a coluna LOTE')
+    lotes = pd.to_numeric(df['LOTE'], errors='coerce')
+    if lotes.isna().any():
+        raise ValueError(f"Delta com LOTE vazio ou não numérico: {df.loc[lotes.isna(), 'LOTE'].tolist()[:5]}")
+
+    df['LOTE'] = lotes.astype(ESQUEMA['LOTE'])
+    for col in df.columns.intersection(COLUNAS_MOEDA):
+        df[col] = para_reais(df[col]).astype(ESQUEMA[col])
+    for col in df.columns.intersection([col for col, tipo in ESQUEMA.items() if tipo == 'category']):
+        df[col] = df[col].astype('category')
+    return df.drop_duplicates('LOTE', keep='last', ignore_index=True)
+
+
+def upsert(df, delta, mascara=None, completar=None):
+    """
+    Insere ou atualiza as linhas de ``delta`` em ``df`` pela chave LOTE,
+    procurando os lotes só entre as linhas de ``mascara`` (se informada).
+
+    ``completar`` recalcula as colunas derivadas das linhas tocadas. ``df``
+    não é alterado: devolve a tabela nova, as linhas removidas (como
+    estavam) e as inseridas (como ficaram), para atualizar agregados.
+    """
+    desconhecidas = delta.columns.difference(df.columns)
+    if len(desconhecidas):
+        raise ValueError(f'Colunas do delta que não existem na tabela: {list(desconhecidas)}')
+
+    candidatas = np.arange(len(df)) if mascara is None else np.flatnonzero(mascara)
+    lotes = pd.Index(df['LOTE'].to_numpy()[candidatas])
+    if not lotes.is_unique:
+        raise ValueError('LOTE repetido na tabela: o upsert precisa de um lote por linha')
+    encontrados = lotes.get_indexer(delta['LOTE'].to_numpy())
+    existentes = encontrados >= 0
+    posicoes = candidatas[encontrados[existentes]]
+
+    base, delta = unificar_categorias([df.copy(deep=False), delta.copy(deep=False)])
+    atualizadas = base.iloc[posicoes].copy()
+    for col in delta.columns:
+        atualizadas[col] = delta[col].to_numpy()[existentes]
+    novas = delta[~existentes].reindex(columns=base.columns)
+
+    tipos = base.dtypes.to_dict()
+    inseridas = pd.concat([atualizadas.astype(tipos), novas.astype(tipos)], ignore_index=True)
+    if completar is not None:
+        inseridas = completar(inseridas).astype(tipos)
+
+    # Lotes atualizados ficam na posição original; os novos vão para o fim
+    ordem = np.arange(len(base))
+    ordem[posicoes] = len(base) + np.arange(len(posicoes))
+    ordem = np.concatenate([ordem, np.arange(len(base) + len(posicoes), len(base) + len(inseridas))])
+    resultado = pd.concat([base, inseridas], ignore_index=True).take(ordem).reset_index(drop=True)
+    return resultado, df.iloc[posicoes], inseridas
+
+
+def aplicar_deltas(df, arquivos):
+    """
+    Aplica os arquivos de delta, em ordem, à tabela limpa de uma partição
+    """
+    for arquivo in arquivos:
+        df, _, _ = upsert(df, ler_delta(arquivo))
+    return df
+
+
+def lotes_dos_deltas(arquivos):
+    """
+    LOTEs tocados por um conjunto de arquivos de delta
+    """
+    lotes = [pd.read_csv(arquivo, usecols=['LOTE'])['LOTE'].to_numpy() for arquivo in arquivos]
+    return np.unique(np.concatenate(lotes)).astype(ESQUEMA['LOTE']) if lotes else np.array([], dtype=ESQUEMA['LOTE'])
+
+
+def para_csv_delta(df):
+    """
+    Linhas da tabela limpa como conteúdo CSV de delta (valores em "R$1234,56")
+    """
+    texto = df.copy()
+    for col in texto.columns.intersection(COLUNAS_MOEDA):
+        valores = texto[col].astype(np.float64)
+        texto[col] = valores.map('R${:.2f}'.format).str.replace('.', ',', regex=False).where(valores.notna())
+    return texto.to_csv(index=False).encode('utf-8')
+
+
+def registrar_delta(origem, particao=CAMINHO_TABELA):
+    """
+    Valida o arquivo de delta e o copia para o diretório de deltas da partição
+    """
+    return gravar_delta(Path(origem).read_bytes(), particao)
+
+
+def gravar_delta(conteudo, particao=CAMINHO_TABELA):
+    """
+    Valida o conteúdo CSV de um delta e o grava no diretório de deltas da
+    partição com o próximo número de sequência; devolve o arquivo gravado.
+
+    O número é reservado com ``os.link``, que falha se o nome já existe:
+    dois registros simultâneos nunca gravam o mesmo arquivo.
+    """
+    ler_delta(io.BytesIO(conteudo))
+    diretorio = caminho_deltas(particao)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    temporario = diretorio / f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    temporario.write_bytes(conteudo)
+
+    numero = ultimo_delta(particao) + 1
+    try:
+        while True:
+            destino = diretorio / f'{numero:06d}.csv'
+            try:
+                os.link(temporario, destino)
+                return destino
+            except FileExistsError:
+                numero += 1
+    finally:
+        temporario.unlink()
+
+
+def consolidar_deltas(particao=CAMINHO_TABELA):
+    """
+    Funde os deltas da partição em um só arquivo, com o número do último, e
+    atualiza o cache colunar; devolve quantos arquivos foram removidos.
+
+    O arquivo consolidado traz as linhas completas, como estão na tabela, de
+    todos os lotes tocados. Aplicá-lo sobre o CSV, sobre um cache que já tem
+    parte dos deltas ou depois dos deltas antigos dá a mesma tabela: um
+    leitor concorrente nunca vê um estado errado.
+    """
+    deltas = listar_deltas(particao)
+    if len(deltas) < 2:
+        return 0
+    lotes = lotes_dos_deltas(deltas)
+    df = carregar_tabela(particao)
+    destino = deltas[-1]
+    temporario = destino.with_name(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    temporario.write_bytes(para_csv_delta(df[df['LOTE'].isin(lotes)]))
+    os.replace(temporario, destino)
+    for arquivo in deltas[:-1]:
+        arquivo.unlink(missing_ok=True)
+    return len(deltas) - 1
+
+
+def _selecao(versao):
+    """
+    Arquivos base (caminho, mtime) de uma versão, sem o número dos deltas
+    """
+    return tuple((caminho, mtime) for caminho, mtime, _ in versao)
+
+
+class CargasIncrementais:
+    """
+    Última carga (tabela com derivadas e cubo) de cada seleção de partições,
+    para que uma versão nova aplique só os deltas que faltam
+    """
+
+    def __init__(self, limite=VERSOES_EM_CACHE):
+        self.limite = limite
+        self._cargas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _anterior(self, versao):
+        with self._trava:
+            carga = self._cargas.get(_selecao(versao))
+        if carga is None or any(antes[2] > agora[2] for antes, agora in zip(carga['versao'], versao)):
+            return None
+        return carga
+
+    def _guardar(self, carga):
+        with self._trava:
+            selecao = _selecao(carga['versao'])
+            self._cargas.pop(selecao, None)
+            self._cargas[selecao] = carga
+            while len(self._cargas) > self.limite:
+                self._cargas.popitem(last=False)
+
+    def tabela(self, versao):
+        """
+        Tabela da versão com as colunas derivadas, a partir da carga anterior
+        da mesma seleção quando só chegaram deltas
+        """
+        anterior = self._anterior(versao)
+        if anterior is None:
+            df = adicionar_derivadas(carregar_particoes([Path(caminho) for caminho, *_ in versao]))
+            carga = {'versao': versao, 'df': df, 'cubo': None}
+        elif anterior['versao'] == versao:
+            return anterior['df']
+        else:
+            carga = self._aplicar(anterior, versao)
+        self._guardar(carga)
+        return carga['df']
+
+    def avancar(self):
+        """
+        Aplica às cargas guardadas os deltas registrados desde então, para que
+        a próxima versão já esteja pronta quando as sessões a pedirem
+        """
+        with self._trava:
+            cargas = list(self._cargas.values())
+        for carga in cargas:
+            versao = tuple((caminho, mtime, ultimo_delta(caminho)) for caminho, mtime, _ in carga['versao'])
+            if versao != carga['versao']:
+                self._guardar(self._aplicar(carga, versao))
+
+    @staticmethod
+    def _aplicar(anterior, versao):
+        df, cubo = anterior['df'], anterior['cubo']
+        for (caminho, _, aplicados), (_, _, ultimo) in zip(anterior['versao'], versao):
+            arquivos = deltas_entre(caminho, aplicados, ultimo)
+            while arquivos:
+                try:
+                    delta = com_chaves_particao(ler_delta(arquivos[0]), caminho)
+                except FileNotFoundError:
+                    # Consolidados durante a leitura: o arquivo consolidado (talvez
+                    # depois de ``ultimo``) traz os lotes; reaplicar um delta não muda nada
+                    arquivos = deltas_entre(caminho, aplicados)
+                    continue
+                df, removidas, inseridas = upsert(df, delta, mascara_particao(df, caminho), adicionar_derivadas)
+                if cubo is not None:
+                    cubo = cubo.atualizar(removidas, inseridas)
+                arquivos = arquivos[1:]
+        return {'versao': versao, 'df': df, 'cubo': cubo}
+
+    def cubo(self, versao, carregar):
+        """
+        Cubo da versão: o atualizado pelos deltas, se houver, ou construído
+        das linhas de ``carregar(versao)``
+        """
+        df = carregar(versao)
+        carga = self._anterior(versao)
+        if carga is None or carga['versao'] != versao:
+            return CuboAgregado.de_linhas(df)
+        if carga['cubo'] is None:
+            carga['cubo'] = CuboAgregado.de_linhas(df)
+        return carga['cubo']
+
+
+@st.cache_resource
+def cargas_incrementais():
+    """
+    Instância única no processo do servidor
+    """
+    return CargasIncrementais()
+
+
+if __name__ == '__main__':
+    # python -m nucleo.ingestao delta.csv [--particao dados/tabela.csv] (a partir de leilão/)
+    # python -m nucleo.ingestao --consolidar funde os deltas de todas as partições
+    parser = argparse.ArgumentParser(description='Registra um delta de lotes e atualiza o cache colunar')
+    parser.add_argument('delta', type=Path, nargs='?')
+    parser.add_argument('--particao', type=Path, default=CAMINHO_TABELA)
+    parser.add_argument('--consolidar', action='store_true', help='funde os deltas de cada partição em um só')
+    args = parser.parse_args()
+
+    if args.consolidar:
+        for caminho, *_ in versao_dados() or ():
+            print(f'{caminho}: {consolidar_deltas(caminho)} deltas consolidados')
+        raise SystemExit
+    if args.delta is None:
+        parser.error('informe o delta ou --consolidar')
+
+    antes = carregar_tabela(args.particao)
+    lotes = ler_delta(args.delta)['LOTE']
+    destino = registrar_delta(args.delta, args.particao)
+    depois = carregar_tabela(args.particao)
+    novos = int((~lotes.isin(antes['LOTE'])).sum())
+    print(f'{destino}: {len(lotes) - novos} lotes atualizados, {novos} novos ({len(depois)} na partição)')
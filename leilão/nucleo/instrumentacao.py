@@ -0,0 +1,277 @@
+"""
+Instrumentação dos caminhos quentes: tempo por seção, contagens e acertos de cache.
+
+Cada página chama ``iniciar_execucao`` no topo e ``marcar`` ao fim de cada
+bloco (carga, filtros, métricas, cada gráfico e cada tabela): o tempo desde
+a marca anterior vira uma observação da seção. Funções de ``nucleo`` usam
+``medido`` ou ``cronometro``. As observações alimentam histogramas de
+latência por seção, mantidos no processo do servidor e exportados no
+formato texto do Prometheus:
+
+- ``LEILAO_METRICAS=arquivo`` regrava o arquivo a cada rerun;
+- ``LEILAO_METRICAS_PORTA=9108`` serve ``/metrics`` por HTTP, só na
+  interface local (``LEILAO_METRICAS_HOST=0.0.0.0`` expõe na rede).
+
+O painel de depuração na barra lateral, com o detalhamento do rerun atual,
+aparece com ``?depurar=1`` na URL ou ``LEILAO_DEPURAR=1``.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ARQUIVO_METRICAS = os.environ.get('LEILAO_METRICAS') or None
+
+PORTA_METRICAS = int(os.environ.get('LEILAO_METRICAS_PORTA') or 0) or None
+
+HOST_METRICAS = os.environ.get('LEILAO_METRICAS_HOST') or '127.0.0.1'
+
+DEPURACAO = os.environ.get('LEILAO_DEPURAR', '').strip() not in ('', '0')
+
+# Limites superiores (s) dos baldes dos histogramas de latência
+LIMITES_HISTOGRAMA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_CHAVE_EXECUCAO = '_instrumentacao'
+
+_log = logging.getLogger(__name__)
+
+
+class Registro:
+    """
+    Contadores e histogramas do processo, seguros entre threads
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.baldes = defaultdict(lambda: [0] * (len(LIMITES_HISTOGRAMA) + 1))
+        self.somas = defaultdict(float)
+        self.reruns = defaultdict(int)
+        self.consultas_cache = defaultdict(int)
+        self.faltas_cache = defaultdict(int)
+
+    def observar(self, secao, segundos):
+        balde = next((i for i, limite in enumerate(LIMITES_HISTOGRAMA) if segundos <= limite), len(LIMITES_HISTOGRAMA))
+        with self._trava:
+            self.baldes[secao][balde] += 1
+            self.somas[secao] += segundos
+
+    def contar_rerun(self, pagina):
+        with self._trava:
+            self.reruns[pagina] += 1
+
+    def consultar_cache(self, cache):
+        with self._trava:
+            self.consultas_cache[cache] += 1
+
+    def registrar_falta(self, cache):
+        with self._trava:
+            self.faltas_cache[cache] += 1
+
+    def taxas_acerto(self):
+        with self._trava:
+            return {
+                cache: 1 - self.faltas_cache[cache] / consultas
+                for cache, consultas in self.consultas_cache.items() if consultas
+            }
+
+    def prometheus(self):
+        """
+        Métricas no formato de exposição em texto do Prometheus
+        """
+        with self._trava:
+            linhas = [
+                '# HELP leilao_secao_segundos Tempo de cada seção das páginas e do núcleo.',
+                '# TYPE leilao_secao_segundos histogram',
+            ]
+            for secao, baldes in sorted(self.baldes.items()):
+                rotulo = f'secao="{_escapar(secao)}"'
+                acumulado = 0
+                for limite, quantidade in zip((*LIMITES_HISTOGRAMA, '+Inf'), baldes):
+                    acumulado += quantidade
+                    linhas.append(f'leilao_secao_segundos_bucket{{{rotulo},le="{limite}"}} {acumulado}')
+                linhas.append(f'leilao_secao_segundos_sum{{{rotulo}}} {self.somas[secao]:.6f}')
+                linhas.append(f'leilao_secao_segundos_count{{{rotulo}}} {acumulado}')
+
+            linhas += ['# HELP leilao_reruns_total Execuções de cada página.', '# TYPE leilao_reruns_total counter']
+            linhas += [f'leilao_reruns_total{{pagina="{_escapar(p)}"}} {n}' for p, n in sorted(self.reruns.items())]
+
+            linhas += ['# HELP leilao_cache_consultas_total Consultas aos caches.', '# TYPE leilao_cache_consultas_total counter']
+            linhas += [f'leilao_cache_consultas_total{{cache="{_escapar(c)}"}} {n}' for c, n in sorted(self.consultas_cache.items())]
+
+            linhas += ['# HELP leilao_cache_faltas_total Consultas que não acharam o valor no cache.', '# TYPE leilao_cache_faltas_total counter']
+            linhas += [f'leilao_cache_faltas_total{{cache="{_escapar(c)}"}} {self.faltas_cache[c]}' for c in sorted(self.consultas_cache)]
+        return '\n'.join(linhas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@st.cache_resource
+def registro():
+    """
+    Instância única do registro no processo do servidor
+    """
+    return Registro()
+
+
+def _execucao():
+    """
+    Detalhamento do rerun atual, guardado na sessão (None fora do Streamlit)
+    """
+    if get_script_run_ctx() is None:
+        return None
+    return st.session_state.get(_CHAVE_EXECUCAO)
+
+
+def depuracao_ativa():
+    return DEPURACAO or st.query_params.get('depurar') == '1'
+
+
+def iniciar_execucao(pagina):
+    """
+    Início do rerun de uma página: zera o detalhamento, exporta as métricas
+    acumuladas e, com depuração, reserva o painel na barra lateral
+    """
+    registro().contar_rerun(pagina)
+    exportar_metricas()
+    if PORTA_METRICAS:
+        servidor_metricas(HOST_METRICAS, PORTA_METRICAS)
+
+    agora = time.perf_counter()
+    painel = None
+    if depuracao_ativa():
+        painel = st.sidebar.expander("⏱️ Depuração", expanded=True).empty()
+    st.session_state[_CHAVE_EXECUCAO] = {
+        'pagina': pagina, 'inicio': agora, 'ultima_marca': agora, 'secoes': [], 'nivel': 0, 'painel': painel
+    }
+
+
+def _observar(secao, segundos, nivel):
+    registro().observar(secao, segundos)
+    execucao = _execucao()
+    if execucao is not None:
+        execucao['secoes'].append({'Seção': secao, 'ms': round(segundos * 1000, 1), 'Nível': nivel})
+
+
+def marcar(secao):
+    """
+    Registra o tempo desde a marca anterior (ou o início do rerun) como
+    ``secao`` da página atual
+    """
+    execucao = _execucao()
+    if execucao is None:
+        return
+    agora = time.perf_counter()
+    inicio, execucao['ultima_marca'] = execucao['ultima_marca'], agora
+    _observar(f"{execucao['pagina']}: {secao}", agora - inicio, 0)
+    # Só as marcas (no corpo da página) redesenham o painel: um elemento
+    # desenhado dentro de uma função em cache do Streamlit quebraria o replay
+    if execucao['painel'] is not None:
+        _mostrar_painel(execucao)
+
+
+@contextmanager
+def cronometro(secao):
+    """
+    Mede o bloco ``with`` como ``secao`` (também quando ele termina em exceção)
+    """
+    execucao = _execucao()
+    nivel = 1
+    if execucao is not None:
+        execucao['nivel'] += 1
+        nivel = execucao['nivel']
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if execucao is not None:
+            execucao['nivel'] -= 1
+        _observar(secao, time.perf_counter() - inicio, nivel)
+
+
+def medido(secao):
+    """
+    Decorador: mede cada chamada da função como ``secao``
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with cronometro(secao):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def consultar_cache(cache):
+    registro().consultar_cache(cache)
+
+
+def registrar_falta(cache):
+    """
+    Chamada dentro do corpo de uma função em cache: só roda quando falta o valor
+    """
+    registro().registrar_falta(cache)
+
+
+def _mostrar_painel(execucao):
+    with execucao['painel'].container():
+        total = time.perf_counter() - execucao['inicio']
+        st.caption(f"Rerun atual: {total * 1000:,.0f} ms".replace(',', '.'))
+        st.dataframe(execucao['secoes'], hide_index=True, use_container_width=True)
+        taxas = registro().taxas_acerto()
+        if taxas:
+            st.caption(' · '.join(f"{cache}: {taxa:.0%} acertos" for cache, taxa in sorted(taxas.items())))
+
+
+def exportar_metricas(caminho=ARQUIVO_METRICAS):
+    """
+    Regrava o arquivo de métricas (substituição atômica), se configurado
+    """
+    if not caminho:
+        return
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    try:
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(registro().prometheus())
+        os.replace(temporario, caminho)
+    except OSError:
+        pass
+
+
+class _Metricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        corpo = registro().prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@st.cache_resource
+def servidor_metricas(host, porta):
+    """
+    Servidor HTTP de ``/metrics`` em uma thread, iniciado uma vez por processo.
+    Se a porta estiver ocupada, o app segue sem o servidor (None).
+    """
+    try:
+        servidor = ThreadingHTTPServer((host, porta), _Metricas)
+    except OSError as erro:
+        _log.warning('Métricas sem servidor HTTP: não foi possível abrir %s:%s (%s)', host, porta, erro)
+        return None
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
@@ -0,0 +1,102 @@
+"""
+Contagens da página de análise geral calculadas em uma única passada.
+
+Com o motor SQL as mesmas contagens chegam agrupadas pelo banco
+(``MetricasGerais.de_contagens``), sem carregar as linhas.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class MetricasGerais:
+    """
+    Lotes por tipo (total e arrematados) e por cor (original e ajustada)
+    """
+    total: int
+    arrematados: int
+    por_tipo: pd.Series
+    arrematados_por_tipo: pd.Series
+    por_cor: pd.Series
+    por_cor_ajustada: pd.Series
+
+    @classmethod
+    def de_contagens(cls, contagens):
+        """
+        Métricas a partir de lotes contados por TIPO, COR, COR_AJUSTADA e
+        arrematado (0/1), como devolvidos por um GROUP BY
+        """
+        lotes = contagens['lotes'].astype(np.int64)
+        arrematados = lotes.where(contagens['arrematado'].astype(bool), 0)
+        return cls(
+            total=int(lotes.sum()),
+            arrematados=int(arrematados.sum()),
+            por_tipo=lotes.groupby(contagens['TIPO']).sum(),
+            arrematados_por_tipo=arrematados.groupby(contagens['TIPO']).sum(),
+            por_cor=lotes.groupby(contagens['COR']).sum(),
+            por_cor_ajustada=lotes.groupby(contagens['COR_AJUSTADA']).sum(),
+        )
+
+    @property
+    def nao_arrematados(self):
+        return self.total - self.arrematados
+
+    def lotes(self, tipo):
+        return int(self.por_tipo.get(tipo, 0))
+
+    def arrematados_tipo(self, tipo):
+        return int(self.arrematados_por_tipo.get(tipo, 0))
+
+    def nao_arrematados_tipo(self, tipo):
+        return self.lotes(tipo) - self.arrematados_tipo(tipo)
+
+    def lotes_cor(self, cor):
+        return int(self.por_cor.get(cor, 0))
+
+    def distribuicao_cores(self, ajustada=False):
+        """
+        Lotes por cor (original ou ajustada), da mais para a menos frequente,
+        como um ``value_counts`` da coluna
+        """
+        coluna = 'COR_AJUSTADA' if ajustada else 'COR'
+        contagens = self.por_cor_ajustada if ajustada else self.por_cor
+        return contagens[contagens > 0].sort_values(ascending=False, kind='stable').rename_axis(coluna).rename('count')
+
+
+def _codigos(serie):
+    """
+    Códigos inteiros da coluna (ausentes recebem o último código) e seus valores
+    """
+    codigos, valores = pd.factorize(serie)
+    codigos = np.where(codigos < 0, len(valores), codigos)
+    return codigos, valores
+
+
+def calcular_metricas_gerais(df):
+    """
+    Conta lotes por tipo × arrematado e por cor com um bincount sobre os
+    códigos das categorias, em vez de uma máscara booleana por contagem
+    """
+    codigos_tipo, tipos = _codigos(df['TIPO'])
+    arrematado = df['Valor da Arrematação'].notna().to_numpy()
+
+    # Linha = tipo (+1 para ausentes), coluna = não arrematado / arrematado
+    tabela = np.bincount(
+        codigos_tipo * 2 + arrematado, minlength=(len(tipos) + 1) * 2
+    ).reshape(-1, 2)[:len(tipos)]
+
+    codigos_cor, cores = _codigos(df['COR'])
+    por_cor = np.bincount(codigos_cor, minlength=len(cores) + 1)[:len(cores)]
+    codigos_ajustada, ajustadas = _codigos(df['COR_AJUSTADA'])
+    por_ajustada = np.bincount(codigos_ajustada, minlength=len(ajustadas) + 1)[:len(ajustadas)]
+
+    return MetricasGerais(
+        total=len(df),
+        arrematados=int(arrematado.sum()),
+        por_tipo=pd.Series(tabela.sum(axis=1), index=tipos),
+        arrematados_por_tipo=pd.Series(tabela[:, 1], index=tipos),
+        por_cor=pd.Series(por_cor, index=cores),
+        por_cor_ajustada=pd.Series(por_ajustada, index=ajustadas),
+    )
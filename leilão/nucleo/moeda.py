@@ -0,0 +1,155 @@
+"""
+Conversão vetorizada de valores monetários no formato brasileiro ("R$1.234,56").
+
+As células são vistas como uma matriz de bytes (uma linha por célula, uma
+coluna por caractere). Cada linha é reduzida ao seu "formato" (ex.: ``R$d.ddd,dd``)
+e apenas os poucos formatos distintos são validados; os dígitos são então
+acumulados direto em centavos com pesos por formato. O laço em Python percorre
+apenas a largura do texto mais longo, nunca as linhas.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Classes de caractere usadas para montar o formato de cada célula
+_ESPACO, _DIGITO, _PONTO, _VIRGULA, _REAL, _CIFRAO, _OUTRO = range(7)
+_SIMBOLOS = ' d.,R$?'
+
+_CLASSES = np.full(256, _OUTRO, dtype=np.uint8)
+_CLASSES[[0, ord(' '), 0xA0]] = _ESPACO
+_CLASSES[ord('0'):ord('9') + 1] = _DIGITO
+_CLASSES[ord('.')] = _PONTO
+_CLASSES[ord(',')] = _VIRGULA
+_CLASSES[ord('R')] = _REAL
+_CLASSES[ord('$')] = _CIFRAO
+
+_FORMATO_VALIDO = re.compile(r' *(?:R\$)? *(d{1,3}(?:\.ddd)*|d+)(?:,(dd?))? *')
+
+# int64 comporta 18 dígitos em centavos (até 16 dígitos inteiros); o formato
+# é codificado em base 8 num int64
+_MAX_DIGITOS_CENTAVOS = 18
+_MAX_LARGURA = 21
+
+
+class ValorMonetarioInvalido(ValueError):
+    """
+    Células que não seguem o formato "R$1.234,56"
+    """
+
+    def __init__(self, celulas):
+        self.celulas = celulas
+        exemplos = ', '.join(f'{indice}: {valor!r}' for indice, valor in list(celulas.items())[:5])
+        super().__init__(f'{len(celulas)} valor(es) monetário(s) inválido(s) - {exemplos}')
+
+
+def _matriz_codigos(texto):
+    """
+    Códigos dos caracteres (linhas x colunas) e suas classes
+    """
+    try:
+        bytes_ = texto.astype('S')
+        codigos = bytes_.view(np.uint8).reshape(len(texto), bytes_.dtype.itemsize)
+        classes = _CLASSES[codigos]
+    except UnicodeEncodeError:
+        unicode_ = texto.astype('U')
+        codigos = unicode_.view(np.uint32).reshape(len(texto), unicode_.dtype.itemsize // 4)
+        classes = np.where(codigos < 256, _CLASSES[np.minimum(codigos, 255)], _OUTRO).astype(np.uint8)
+    return codigos, classes
+
+
+def _formatos(classes):
+    """
+    Identificador de formato por linha e a matriz de formatos distintos
+    """
+    if classes.shape[1] <= _MAX_LARGURA:
+        chave = np.zeros(len(classes), dtype=np.int64)
+        for j in range(classes.shape[1]):
+            chave = chave * 8 + classes[:, j]
+        _, primeira, inverso = np.unique(chave, return_index=True, return_inverse=True)
+    else:
+        linhas = np.ascontiguousarray(classes).view(np.dtype((np.void, classes.shape[1]))).ravel()
+        _, primeira, inverso = np.unique(linhas, return_index=True, return_inverse=True)
+    return inverso.ravel(), classes[primeira]
+
+
+def _pesos(formato):
+    """
+    Peso em centavos de cada posição do formato, ou None se ele for inválido
+    """
+    texto = ''.join(_SIMBOLOS[c] for c in formato)
+    encontrado = _FORMATO_VALIDO.fullmatch(texto)
+    if encontrado is None:
+        return None
+
+    casas = len(encontrado.group(2) or '')
+    # Dígitos do valor já em centavos: os que faltam nas casas decimais contam
+    if texto.count('d') + (2 - casas) > _MAX_DIGITOS_CENTAVOS:
+        return None
+    digitos = formato == _DIGITO
+    # expoente = dígitos à direita da posição + casas que faltam para os centavos
+    expoentes = np.cumsum(digitos[::-1])[::-1] - 1 + (2 - casas)
+    return np.where(digitos, 10 ** np.maximum(expoentes, 0).astype(np.int64), 0)
+
+
+def _converter_texto(texto):
+    """
+    Converte um array de strings em centavos e indica quais células são válidas
+    """
+    n = len(texto)
+    codigos, classes = _matriz_codigos(texto)
+    if classes.shape[1] == 0:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=bool)
+
+    inverso, formatos = _formatos(classes)
+    pesos = np.zeros(formatos.shape, dtype=np.int64)
+    formato_valido = np.zeros(len(formatos), dtype=bool)
+    for k, formato in enumerate(formatos):
+        pesos_formato = _pesos(formato)
+        if pesos_formato is not None:
+            pesos[k] = pesos_formato
+            formato_valido[k] = True
+
+    centavos = np.zeros(n, dtype=np.int64)
+    for j in np.flatnonzero(pesos.any(axis=0)):
+        centavos += (codigos[:, j].astype(np.int64) - ord('0')) * pesos[inverso, j]
+
+    return centavos, formato_valido[inverso]
+
+
+def para_centavos(serie, erros='raise'):
+    """
+    Converte uma série de valores "R$1.234,56" em centavos (Int64).
+
+    Células vazias (NaN) continuam ausentes. Células preenchidas fora do formato
+    levantam ``ValorMonetarioInvalido`` quando ``erros='raise'`` ou viram
+    ausentes quando ``erros='coerce'``.
+    """
+    if erros not in ('raise', 'coerce'):
+        raise ValueError("erros deve ser 'raise' ou 'coerce'")
+
+    serie = pd.Series(serie, copy=False)
+    if pd.api.types.is_numeric_dtype(serie):
+        return (serie * 100).round().astype('Int64')
+
+    ausente = serie.isna().to_numpy()
+    texto = serie.to_numpy(dtype=object, na_value='')
+    centavos, valido = _converter_texto(texto)
+
+    invalido = ~valido & ~ausente
+    if invalido.any() and erros == 'raise':
+        raise ValorMonetarioInvalido(serie[invalido])
+
+    return pd.Series(
+        pd.arrays.IntegerArray(centavos, ausente | invalido),
+        index=serie.index,
+        name=serie.name,
+    )
+
+
+def para_reais(serie, erros='raise'):
+    """
+    Converte uma série de valores "R$1.234,56" em float64 (reais)
+    """
+    centavos = para_centavos(serie, erros=erros)
+    return centavos.astype('float64') / 100
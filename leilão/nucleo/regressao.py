@@ -0,0 +1,87 @@
+"""
+Regressão linear e correlação a partir de somas acumuladas.
+
+O acumulador guarda n, Σx, Σy, Σx², Σy² e Σxy dos pares (avaliação,
+arrematação) presentes. Os campos são somas, então acumuladores de células
+diferentes se combinam somando campo a campo; é assim que o cubo de
+agregação responde à regressão de qualquer combinação de filtros sem reler
+as linhas. Inclinação, intercepto e r coincidem com ``scipy.stats.linregress``
+dentro da tolerância de ponto flutuante.
+"""
+import math
+from dataclasses import dataclass
+
+# Medida do cubo -> campo do acumulador
+MEDIDAS_REGRESSAO = {
+    'qtd_pares': 'n',
+    'soma_avaliacao_par': 'soma_x',
+    'soma_arrematacao_par': 'soma_y',
+    'soma2_avaliacao_par': 'soma_x2',
+    'soma2_arrematacao_par': 'soma_y2',
+    'soma_produto': 'soma_xy',
+}
+
+
+@dataclass(frozen=True)
+class AcumuladorRegressao:
+    """
+    Somas suficientes para a regressão de y (arrematação) em x (avaliação)
+    """
+    n: int = 0
+    soma_x: float = 0.0
+    soma_y: float = 0.0
+    soma_x2: float = 0.0
+    soma_y2: float = 0.0
+    soma_xy: float = 0.0
+
+    @classmethod
+    def de_totais(cls, total):
+        """
+        Acumulador a partir de um total do cubo (``CuboAgregado.total()``)
+        """
+        somas = {campo: float(total[medida]) for medida, campo in MEDIDAS_REGRESSAO.items()}
+        return cls(**{**somas, 'n': int(somas['n'])})
+
+    def __add__(self, outro):
+        return AcumuladorRegressao(
+            n=self.n + outro.n,
+            soma_x=self.soma_x + outro.soma_x,
+            soma_y=self.soma_y + outro.soma_y,
+            soma_x2=self.soma_x2 + outro.soma_x2,
+            soma_y2=self.soma_y2 + outro.soma_y2,
+            soma_xy=self.soma_xy + outro.soma_xy,
+        )
+
+    # Somas de quadrados centradas (n vezes variância e covariância)
+    @property
+    def sxx(self):
+        return self.soma_x2 - self.soma_x * self.soma_x / self.n if self.n else math.nan
+
+    @property
+    def syy(self):
+        return self.soma_y2 - self.soma_y * self.soma_y / self.n if self.n else math.nan
+
+    @property
+    def sxy(self):
+        return self.soma_xy - self.soma_x * self.soma_y / self.n if self.n else math.nan
+
+    @property
+    def inclinacao(self):
+        return self.sxy / self.sxx if self.n > 1 and self.sxx > 0 else math.nan
+
+    @property
+    def intercepto(self):
+        return (self.soma_y - self.inclinacao * self.soma_x) / self.n if self.n else math.nan
+
+    @property
+    def r(self):
+        """
+        Coeficiente de correlação de Pearson (NaN sem variação em x ou y)
+        """
+        if self.n < 2 or not (self.sxx > 0 and self.syy > 0):
+            return math.nan
+        return max(-1.0, min(1.0, self.sxy / math.sqrt(self.sxx * self.syy)))
+
+    @property
+    def r2(self):
+        return self.r ** 2
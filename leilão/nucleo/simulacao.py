@@ -0,0 +1,63 @@
+"""
+Simulação Monte Carlo da viabilidade de alugar caminhões arrematados.
+
+Cada cenário sorteia um caminhão arrematado (com reposição, pelo seu valor
+de arrematação), a diária (normal truncada em zero), os dias alugados por
+mês e a fração da receita gasta com manutenção (uniformes nas faixas
+informadas). Todos os cenários são arrays NumPy calculados de uma vez.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+PERCENTIS_SIMULACAO = (5, 25, 50, 75, 95)
+
+
+@dataclass(frozen=True)
+class PremissasAluguel:
+    """
+    Distribuições das premissas do aluguel (valores padrão da análise fixa)
+    """
+    diaria_media: float = 800.0
+    diaria_desvio: float = 150.0
+    utilizacao_minima: float = 15.0
+    utilizacao_maxima: float = 25.0
+    manutencao_minima: float = 0.2
+    manutencao_maxima: float = 0.4
+    horizonte_meses: int = 24
+    cenarios: int = 200_000
+    semente: int = 0
+
+
+def simular_aluguel(valores_arrematacao, premissas=PremissasAluguel()):
+    """
+    Percentis de payback (meses) e ROI anual (%), e a probabilidade de o
+    lucro líquido acumulado no horizonte não cobrir o preço do caminhão.
+
+    Devolve None sem valores de arrematação.
+    """
+    valores = np.asarray(valores_arrematacao, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return None
+
+    p = premissas
+    rng = np.random.default_rng(p.semente)
+    preco = valores[rng.integers(0, len(valores), size=p.cenarios)]
+    diaria = np.maximum(rng.normal(p.diaria_media, p.diaria_desvio, size=p.cenarios), 0)
+    utilizacao = rng.uniform(p.utilizacao_minima, p.utilizacao_maxima, size=p.cenarios)
+    manutencao = rng.uniform(p.manutencao_minima, p.manutencao_maxima, size=p.cenarios)
+
+    lucro_mensal = diaria * utilizacao * (1 - manutencao)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Sem lucro o payback nunca chega: infinito
+        payback = np.where(lucro_mensal > 0, preco / lucro_mensal, np.inf)
+        roi_anual = np.where(preco > 0, lucro_mensal * 12 / preco * 100, np.nan)
+
+    return {
+        'payback_meses': dict(zip(PERCENTIS_SIMULACAO, np.percentile(payback, PERCENTIS_SIMULACAO))),
+        'roi_anual': dict(zip(PERCENTIS_SIMULACAO, np.nanpercentile(roi_anual, PERCENTIS_SIMULACAO))),
+        'prob_prejuizo': float(np.mean(lucro_mensal * p.horizonte_meses < preco)),
+        'cenarios': p.cenarios,
+        'amostra': len(valores),
+    }
@@ -1,56 +1,48 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from collections import Counter
-import re
+from nucleo.dados import carregar_cubo, seletor_leiloes, versao_dados
+from nucleo.figuras import figura_em_cache
+from nucleo.instrumentacao import iniciar_execucao, marcar
 st.set_page_config(page_title="Análise de Leilão - Marcas e Modelos", layout="wide")
+iniciar_execucao('marcas_modelos')
 st.markdown("# 🚗 Análise de Marcas e Modelos - Leilão de Veículos")
 st.sidebar.markdown("# 🚗 Análise de Marcas e Modelos - Leilão de Veículos")
 
 st.markdown("---")
 
-@st.cache_data
-def load_data():
-  
-    df = pd.read_csv('leilão/dados/tabela.csv')
-    
-    currency_columns = ['AVALIAÇÃO', 'Lance Inicial', 'Valor da Arrematação']
-    
-    for col in currency_columns:
-        df[col] = df[col].str.replace('R$', '').str.replace('.', '').str.replace(',', '.').str.strip()
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    return df
-
 try:
-    df = load_data()
+    leiloes = seletor_leiloes()
+    versao = versao_dados(leiloes)
+    cubo_completo = carregar_cubo(leiloes)
+    marcar('carga')
     
     st.sidebar.header("🔧 Filtros")
     
     tipos = st.sidebar.multiselect(
         "Tipo de Veículo:",
-        options=df['TIPO'].unique(),
-        default=df['TIPO'].unique()
+        options=cubo_completo.valores('TIPO'),
+        default=cubo_completo.valores('TIPO')
     )
     
     municipios = st.sidebar.multiselect(
         "Município:",
-        options=df['MUNICÍPIO'].unique(),
-        default=df['MUNICÍPIO'].unique()
+        options=cubo_completo.valores('MUNICÍPIO'),
+        default=cubo_completo.valores('MUNICÍPIO')
     )
     
-    df_filtered = df[
-        (df['TIPO'].isin(tipos)) & 
-        (df['MUNICÍPIO'].isin(municipios))
-    ]
+    # Todos os resumos desta página saem do cubo: nenhuma linha é relida
+    cubo = cubo_completo.filtrar({'TIPO': tipos, 'MUNICÍPIO': municipios})
+    total = cubo.total()
+    por_marca = cubo.agregar(['MARCA']).set_index('MARCA')['qtd_lotes']
+    por_modelo = cubo.agregar(['NOME_POPULAR']).set_index('NOME_POPULAR')['qtd_lotes']
+    marcar('filtro e agregação')
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("🏆 Top 10 Marcas com Mais Lotes")
         
-        marcas_count = df_filtered['MARCA'].value_counts().head(10)
+        marcas_count = por_marca.sort_values(ascending=False, kind='stable').head(10)
         
         fig_marcas = px.bar(
             x=marcas_count.values,
@@ -69,17 +61,18 @@ try:
         )
         
         st.plotly_chart(fig_marcas, use_container_width=True)
+        marcar('gráfico: marcas')
         
         st.markdown("**📊 Estatísticas das Marcas:**")
-        total_marcas = df_filtered['MARCA'].nunique()
+        total_marcas = len(por_marca)
         st.write(f"- **Total de marcas diferentes:** {total_marcas}")
         st.write(f"- **Marca mais frequente:** {marcas_count.index[0]} ({marcas_count.values[0]} lotes)")
-        st.write(f"- **Participação do top 5:** {marcas_count.head(5).sum() / len(df_filtered) * 100:.1f}% do total")
+        st.write(f"- **Participação do top 5:** {marcas_count.head(5).sum() / total['qtd_lotes'] * 100:.1f}% do total")
     
     with col2:
         st.subheader("📈 Modelos Mais Frequentes")
         
-        modelos_count = df_filtered['NOME_POPULAR'].value_counts().head(10)
+        modelos_count = por_modelo.sort_values(ascending=False, kind='stable').head(10)
         
         fig_modelos = px.bar(
             x=modelos_count.values,
@@ -98,39 +91,46 @@ try:
         )
         
         st.plotly_chart(fig_modelos, use_container_width=True)
+        marcar('gráfico: modelos')
         
         st.markdown("**📈 Estatísticas dos Modelos:**")
-        total_modelos = df_filtered['NOME_POPULAR'].nunique()
+        total_modelos = len(por_modelo)
         st.write(f"- **Total de modelos diferentes:** {total_modelos}")
         st.write(f"- **Modelo mais frequente:** {modelos_count.index[0]} ({modelos_count.values[0]} lotes)")
     st.markdown("---")
 
     st.subheader("Distribuição de Veículos por Marca e Modelo")
     
-    treemap_data = df_filtered.groupby(['MARCA', 'NOME_POPULAR']).size().reset_index(name='QUANTIDADE')
-    
-    fig_treemap = px.treemap(
-        treemap_data,
-        path=['MARCA', 'NOME_POPULAR'],
-        values='QUANTIDADE',
-        color='QUANTIDADE',
-        color_continuous_scale='viridis',
-        title='🌳 Hierarquia Marca → Modelo'
-    )
+    def montar_treemap():
+        treemap_data = cubo.agregar(['MARCA', 'NOME_POPULAR'])[['MARCA', 'NOME_POPULAR', 'qtd_lotes']]
+        treemap_data = treemap_data.rename(columns={'qtd_lotes': 'QUANTIDADE'})
+        # O treemap agrupa pelas colunas do caminho; como texto, evita o produto de todas as categorias
+        treemap_data = treemap_data.astype({'MARCA': str, 'NOME_POPULAR': str})
+        
+        fig_treemap = px.treemap(
+            treemap_data,
+            path=['MARCA', 'NOME_POPULAR'],
+            values='QUANTIDADE',
+            color='QUANTIDADE',
+            color_continuous_scale='viridis',
+            title='🌳 Hierarquia Marca → Modelo'
+        )
+        
+        fig_treemap.update_layout(height=600)
+        return fig_treemap
     
-    fig_treemap.update_layout(height=600)
+    fig_treemap = figura_em_cache('treemap', versao, (tipos, municipios), montar_treemap)
     
     st.plotly_chart(fig_treemap, use_container_width=True)
+    marcar('gráfico: treemap')
     st.markdown("---")
     
     st.subheader("📋 Detalhamento por Marca e Modelo")
     with st.expander("🔍 Clique para ver a tabela detalhada"):
 
-        resumo_table = df_filtered.groupby(['MARCA', 'NOME_POPULAR', 'TIPO']).agg({
-            'LOTE': 'count',
-            'AVALIAÇÃO': 'mean',
-            'Valor da Arrematação': 'mean'
-        }).round(2).reset_index()
+        resumo_table = cubo.agregar(['MARCA', 'NOME_POPULAR', 'TIPO'])[[
+            'MARCA', 'NOME_POPULAR', 'TIPO', 'qtd_lotes', 'media_avaliacao', 'media_arrematacao'
+        ]].round(2)
         
         resumo_table.columns = ['Marca', 'Modelo', 'Tipo', 'Quantidade', 'Valor Médio Avaliação', 'Valor Médio Arrematação']
         
@@ -138,6 +138,7 @@ try:
         resumo_table = resumo_table.sort_values('Quantidade', ascending=False)
         
         st.dataframe(resumo_table, use_container_width=True)
+        marcar('tabela: marca e modelo')
     
  
     
@@ -145,17 +146,18 @@ try:
         col_met1, col_met2, col_met3, col_met4 = st.columns(4)
         
         with col_met1:
-            st.metric("Total de Lotes", len(df_filtered))
+            st.metric("Total de Lotes", int(total['qtd_lotes']))
         
         with col_met2:
-            st.metric("Marcas Únicas", df_filtered['MARCA'].nunique())
+            st.metric("Marcas Únicas", total_marcas)
         
         with col_met3:
-            st.metric("Modelos Únicos", df_filtered['NOME_POPULAR'].nunique())
+            st.metric("Modelos Únicos", total_modelos)
         
         with col_met4:
-            taxa_arrematacao = (df_filtered['Valor da Arrematação'].notna().sum() / len(df_filtered)) * 100
+            taxa_arrematacao = total['taxa_arrematacao'] * 100
             st.metric("Taxa de Arrematação", f"{taxa_arrematacao:.1f}%")
+    marcar('métricas gerais')
         
 
     st.subheader("📥 Download dos Dados Processados")
@@ -167,6 +169,7 @@ try:
         file_name="resumo_marcas_modelos.csv",
         mime="text/csv"
     )
+    marcar('download')
 
 except FileNotFoundError:
     st.error("❌ Arquivo 'tabela.csv' não encontrado. Certifique-se de que o arquivo está no diretório correto.")
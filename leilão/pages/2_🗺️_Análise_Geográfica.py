@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
-from math import radians, sin, cos, sqrt, atan2
+from nucleo.dados import (
+    VERSOES_EM_CACHE, aviso_linhas_em_memoria, carregar_cubo, carregar_dados, seletor_leiloes, versao_dados,
+)
+from nucleo.figuras import figura_em_cache
+from nucleo.filtros import IndiceFiltros
+from nucleo.geo import (
+    FATOR_ROTA, IndiceLocalizacoes, carregar_municipios, coordenadas_por_municipio, enquadramento,
+    oportunidades_no_raio,
+)
+from nucleo.instrumentacao import iniciar_execucao, marcar
 
 
 st.set_page_config(page_title="Análise Geográfica - Leilão de Veículos", layout="wide")
+iniciar_execucao('geografica')
 
 
 st.title("🌍 Análise Geográfica Estratégica - Mato Grosso")
@@ -15,106 +24,101 @@ st.markdown("""
 """)
 st.markdown("---")
 
-# Coordenadas dos municípios de Mato Grosso
-COORDENADAS_MUNICIPIOS = {
-    'Diamantino': {'lat': -14.4086, 'lon': -56.4464},
-    'Cuiabá': {'lat': -15.6010, 'lon': -56.0974},
-    'Rondonópolis': {'lat': -16.4673, 'lon': -54.6370},
-    'Alto Garçal': {'lat': -11.8422, 'lon': -55.4808},
-    'Cáceres': {'lat': -15.5366, 'lon': -57.4587},
-    'Poconé': {'lat': -16.2560, 'lon': -56.6227},
-    'Pontes e Licentia': {'lat': -15.2267, 'lon': -52.6711},
-    'Comodoro': {'lat': -13.6631, 'lon': -59.7876},
-    'Primavera do Leste': {'lat': -15.5238, 'lon': -54.3430},
-    'Campo Verde': {'lat': -15.5450, 'lon': -55.1620},
-    'Sorriso': {'lat': -12.5425, 'lon': -55.7211},
-    'Nova Santa Helena': {'lat': -10.8167, 'lon': -55.8167},
-    'Barra do Garças': {'lat': -15.8900, 'lon': -52.2567},
-    'Água Boa': {'lat': -14.0500, 'lon': -52.1600}
-}
-
-@st.cache_data
-def load_data():
-    try:
-        df = pd.read_csv('leilão/dados/tabela.csv', encoding='utf-8')
-        
-        municipios_mt = list(COORDENADAS_MUNICIPIOS.keys())
-        df = df[df['MUNICÍPIO'].isin(municipios_mt)]
-        
-        currency_columns = ['AVALIAÇÃO', 'Lance Inicial', 'Valor da Arrematação']
-        
-        for col in currency_columns:
-            if df[col].dtype == 'object':
-                df[col] = df[col].str.replace('R$', '').str.replace('.', '').str.replace(',', '.').str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df['lat'] = df['MUNICÍPIO'].map(lambda x: COORDENADAS_MUNICIPIOS.get(x, {}).get('lat', np.nan))
-        df['lon'] = df['MUNICÍPIO'].map(lambda x: COORDENADAS_MUNICIPIOS.get(x, {}).get('lon', np.nan))
-        
-        df['Categoria Valor'] = pd.cut(df['AVALIAÇÃO'], 
-                                     bins=[0, 15000, 50000, 100000, float('inf')],
-                                     labels=['Econômico', 'Médio', 'Alto', 'Premium'])
-        
-
-        df['Eficiência Arrematação'] = (df['Valor da Arrematação'] / df['AVALIAÇÃO']).fillna(0)
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erro ao carregar dados: {str(e)}")
-        return pd.DataFrame()
-
-df = load_data()
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_indice(_df, versao):
+    return IndiceFiltros(_df, ['MUNICÍPIO', 'Categoria Valor', 'TIPO'])
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_coordenadas(_df, versao):
+    return coordenadas_por_municipio(_df)
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_localizacoes(_df, versao):
+    return IndiceLocalizacoes(_df)
+
+leiloes = seletor_leiloes()
+aviso_linhas_em_memoria()
+versao = versao_dados(leiloes)
+try:
+    # lat/lon (cadastro de municípios), Categoria Valor e Eficiência Arrematação já vêm da carga compartilhada
+    df = carregar_dados(leiloes)
+except Exception as e:
+    # Fora de qualquer cache: uma falha de leitura não fica gravada para a versão
+    st.error(f"❌ Erro ao carregar dados: {str(e)}")
+    df = pd.DataFrame()
 
 if df.empty:
     st.warning("⚠️ Nenhum dado foi carregado. Verifique o arquivo CSV.")
     st.stop()
 
+indice = carregar_indice(df, versao)
+coordenadas = carregar_coordenadas(df, versao)
+localizacoes = carregar_localizacoes(df, versao)
+marcar('carga')
+
 st.sidebar.header("🎯 Filtros Estratégicos")
 
 municipios = st.sidebar.multiselect(
     "Município:",
-    options=sorted(df['MUNICÍPIO'].unique()),
-    default=sorted(df['MUNICÍPIO'].unique())
+    options=indice.valores('MUNICÍPIO', ordenar=True),
+    default=indice.valores('MUNICÍPIO', ordenar=True)
 )
 
 categorias = st.sidebar.multiselect(
     "Categoria de Valor:",
-    options=df['Categoria Valor'].unique(),
-    default=df['Categoria Valor'].unique()
+    options=indice.valores('Categoria Valor'),
+    default=indice.valores('Categoria Valor')
 )
 
 tipos = st.sidebar.multiselect(
     "Tipo de Veículo:",
-    options=df['TIPO'].unique(),
-    default=df['TIPO'].unique()
+    options=indice.valores('TIPO'),
+    default=indice.valores('TIPO')
 )
 
 
-df_filtered = df[
-    (df['MUNICÍPIO'].isin(municipios)) & 
-    (df['Categoria Valor'].isin(categorias)) &
-    (df['TIPO'].isin(tipos))
-]
+filtros = {
+    'MUNICÍPIO': municipios,
+    'Categoria Valor': categorias,
+    'TIPO': tipos
+}
+mascara = indice.mascara(filtros)
+df_filtered = df[mascara]
+
+st.sidebar.header("📍 Base do Comprador")
+bases = carregar_municipios()
+base = st.sidebar.selectbox(
+    "Município da base:",
+    options=bases.index,
+    index=int(np.flatnonzero(bases['nome'] == 'Cuiabá')[0]) if (bases['nome'] == 'Cuiabá').any() else 0,
+    format_func=lambda i: f"{bases.at[i, 'nome']} - {bases.at[i, 'uf']}"
+)
+raio_km = st.sidebar.slider("Raio (km):", min_value=50, max_value=3000, value=300, step=50)
+custo_km = st.sidebar.number_input("Frete (R$/km rodado):", min_value=0.0, value=5.0, step=0.5)
+marcar('filtros')
 
 if df_filtered.empty:
     st.warning("🚫 Nenhum dado encontrado com os filtros selecionados.")
     st.stop()
 
+# Indicadores e resumos por município saem do cubo de agregação
+cubo = carregar_cubo(leiloes).filtrar(filtros)
+total = cubo.total()
+
 st.subheader("📊 Indicadores Estratégicos - Mato Grosso")
 
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    valor_total = df_filtered['AVALIAÇÃO'].sum()
+    valor_total = total['soma_avaliacao']
     st.metric("Valor Total em Leilão", f"R$ {valor_total:,.0f}")
 
 with col2:
-    taxa_arrematacao = (df_filtered['Valor da Arrematação'].notna().sum() / len(df_filtered)) * 100
+    taxa_arrematacao = total['taxa_arrematacao'] * 100
     st.metric("Taxa de Arrematação", f"{taxa_arrematacao:.1f}%")
 
 with col3:
-    eficiencia_media = df_filtered[df_filtered['Valor da Arrematação'].notna()]['Eficiência Arrematação'].mean() * 100
+    eficiencia_media = (total['soma_eficiencia'] / total['qtd_arrematados'] * 100) if total['qtd_arrematados'] else np.nan
     if not np.isnan(eficiencia_media):
         st.metric(
             "Eficiência Média", 
@@ -125,55 +129,69 @@ with col3:
         st.metric("Eficiência Média", "N/A")
 
 with col4:
-    municipios_ativos = df_filtered['MUNICÍPIO'].nunique()
+    municipios_ativos = len(cubo.valores('MUNICÍPIO'))
     st.metric("Municípios Ativos", municipios_ativos)
+marcar('métricas')
 
 st.markdown("---")
 st.subheader("🗺️ Mapa de Oportunidades - Mato Grosso")
 
-municipio_stats = df_filtered.groupby('MUNICÍPIO').agg({
-    'AVALIAÇÃO': ['count', 'sum', 'mean'],
-    'Valor da Arrematação': ['sum', lambda x: x.notna().sum()],
-    'Eficiência Arrematação': 'mean',
-    'lat': 'first',
-    'lon': 'first'
+resumo_municipios = cubo.agregar(['MUNICÍPIO'])
+municipio_stats = pd.DataFrame({
+    'MUNICÍPIO': resumo_municipios['MUNICÍPIO'].astype(str),
+    'Qtd Lotes': resumo_municipios['qtd_avaliacao'],
+    'Valor Total': resumo_municipios['soma_avaliacao'],
+    'Valor Médio': resumo_municipios['media_avaliacao'],
+    'Valor Arrematado': resumo_municipios['soma_arrematacao'],
+    'Lotes Arrematados': resumo_municipios['qtd_arrematados'],
+    'Eficiência Média': resumo_municipios['eficiencia_media'],
 }).round(2)
+municipio_stats = municipio_stats.join(coordenadas, on='MUNICÍPIO')
+centro_mapa, zoom_mapa = enquadramento(municipio_stats['lat'], municipio_stats['lon'])
+marcar('agregação: municípios')
+
+def montar_mapa_oportunidades():
+    fig_oportunidades = px.scatter_mapbox(
+        municipio_stats,
+        lat="lat",
+        lon="lon",
+        size="Valor Total",
+        color="Eficiência Média",
+        size_max=40,
+        center=centro_mapa,
+        zoom=zoom_mapa,
+        height=500,
+        hover_name="MUNICÍPIO",
+        hover_data={
+            'Qtd Lotes': True,
+            'Valor Total': ':.0f',
+            'Eficiência Média': ':.1%',
+            'Valor Médio': ':.0f',
+            'lat': False,
+            'lon': False
+        },
+        title="Mapa de Oportunidades por Município - Mato Grosso (Cor: Eficiência Média = Performance do mercado local)",
+        color_continuous_scale=px.colors.sequential.Viridis
+    )
 
-municipio_stats.columns = ['Qtd Lotes', 'Valor Total', 'Valor Médio', 
-                           'Valor Arrematado', 'Lotes Arrematados', 
-                           'Eficiência Média', 'lat', 'lon']
-
-municipio_stats = municipio_stats.reset_index()
-
-fig_oportunidades = px.scatter_mapbox(
-    municipio_stats,
-    lat="lat",
-    lon="lon",
-    size="Valor Total",
-    color="Eficiência Média",
-    size_max=40,
-    zoom=5.5,
-    height=500,
-    hover_name="MUNICÍPIO",
-    hover_data={
-        'Qtd Lotes': True,
-        'Valor Total': ':.0f',
-        'Eficiência Média': ':.1%',
-        'Valor Médio': ':.0f',
-        'lat': False,
-        'lon': False
-    },
-    title="Mapa de Oportunidades por Município - Mato Grosso (Cor: Eficiência Média = Performance do mercado local)",
-    color_continuous_scale=px.colors.sequential.Viridis
-)
+    fig_oportunidades.update_layout(
+        mapbox_style="open-street-map",
+        margin={"r":0,"t":40,"l":0,"b":0}
+    )
+    return fig_oportunidades
 
-fig_oportunidades.update_layout(
-    mapbox_style="open-street-map",
-    margin={"r":0,"t":40,"l":0,"b":0}
-)
+fig_oportunidades = figura_em_cache('mapa_oportunidades', versao, filtros, montar_mapa_oportunidades)
 
 st.plotly_chart(fig_oportunidades, use_container_width=True)
 
+sem_coordenadas = municipio_stats[municipio_stats['lat'].isna()]
+if not sem_coordenadas.empty:
+    st.caption(
+        f"ℹ️ {int(sem_coordenadas['Qtd Lotes'].sum())} lote(s) de municípios fora do cadastro "
+        f"({', '.join(sem_coordenadas['MUNICÍPIO'])}) não aparecem nos mapas, mas entram nas demais análises."
+    )
+marcar('gráfico: mapa de oportunidades')
+
 st.markdown("---")
 st.subheader("📈 Análise Comparativa por Município")
 
@@ -190,6 +208,7 @@ with col_analise1:
     )
     fig_valor_municipio.update_layout(height=400, xaxis_tickangle=45)
     st.plotly_chart(fig_valor_municipio, use_container_width=True)
+    marcar('gráfico: valor por município')
 
 with col_analise2:
     fig_eficiencia = px.bar(
@@ -203,6 +222,7 @@ with col_analise2:
     fig_eficiencia.update_layout(height=400, xaxis_tickangle=45)
     fig_eficiencia.update_yaxes(tickformat=".1%")
     st.plotly_chart(fig_eficiencia, use_container_width=True)
+    marcar('gráfico: eficiência por município')
 
 st.markdown("---")
 st.subheader("🔥 Heatmap de Concentração de Valor")
@@ -210,49 +230,76 @@ st.subheader("🔥 Heatmap de Concentração de Valor")
 df_heatmap = df_filtered[df_filtered['lat'].notna()].copy()
 
 if not df_heatmap.empty:
-    fig_heatmap = px.density_mapbox(
-        df_heatmap,
-        lat='lat',
-        lon='lon',
-        z='AVALIAÇÃO',
-        radius=25,
-        zoom=5.5,
-        height=500,
-        title="Concentração de Valor por Localização - Mato Grosso",
-        hover_data=['MARCA', 'NOME_POPULAR', 'AVALIAÇÃO', 'MUNICÍPIO'],
-        color_continuous_scale=px.colors.sequential.Hot
-    )
+    def montar_heatmap():
+        fig_heatmap = px.density_mapbox(
+            df_heatmap,
+            lat='lat',
+            lon='lon',
+            z='AVALIAÇÃO',
+            radius=25,
+            center=centro_mapa,
+            zoom=zoom_mapa,
+            height=500,
+            title="Concentração de Valor por Localização - Mato Grosso",
+            hover_data=['MARCA', 'NOME_POPULAR', 'AVALIAÇÃO', 'MUNICÍPIO'],
+            color_continuous_scale=px.colors.sequential.Hot
+        )
     
-    fig_heatmap.update_layout(
-        mapbox_style="open-street-map",
-        margin={"r":0,"t":40,"l":0,"b":0}
-    )
+        fig_heatmap.update_layout(
+            mapbox_style="open-street-map",
+            margin={"r":0,"t":40,"l":0,"b":0}
+        )
+        return fig_heatmap
+    
+    fig_heatmap = figura_em_cache('heatmap', versao, filtros, montar_heatmap)
     
     st.plotly_chart(fig_heatmap, use_container_width=True)
+    marcar('gráfico: heatmap')
 
 st.markdown("---")
-st.subheader("🏙️ Segmentação por Município")
+st.subheader(f"🚚 Lotes a até {raio_km} km de {bases.at[base, 'nome']}")
 
-municipio_opp = df_filtered.groupby('MUNICÍPIO').agg({
-    'AVALIAÇÃO': ['count', 'sum'],
-    'Valor da Arrematação': lambda x: x.notna().sum(),
-    'Eficiência Arrematação': 'mean'
-}).round(2)
+distancias = localizacoes.distancias(bases.at[base, 'latitude'], bases.at[base, 'longitude'])[mascara]
+ranking_raio, totais_raio = oportunidades_no_raio(df_filtered, distancias, raio_km, custo_km)
 
-municipio_opp.columns = ['Qtd Lotes', 'Valor Total', 'Lotes Arrematados', 'Eficiência Média']
-municipio_opp = municipio_opp.reset_index()
+col_raio1, col_raio2, col_raio3 = st.columns(3)
+col_raio1.metric("Lotes no Raio", totais_raio['lotes'])
+col_raio2.metric("Margem Estimada Total", f"R$ {totais_raio['margem_total']:,.0f}")
+col_raio3.metric("Frete Médio", f"R$ {totais_raio['frete_medio']:,.0f}" if totais_raio['lotes'] else "N/A")
+
+if ranking_raio.empty:
+    st.info("Nenhum lote no raio selecionado.")
+else:
+    tabela_raio = ranking_raio.copy()
+    for col in ['AVALIAÇÃO', 'Preço', 'Frete', 'Margem Estimada']:
+        tabela_raio[col] = tabela_raio[col].apply(lambda x: f"R$ {x:,.0f}" if pd.notna(x) else "-")
+    tabela_raio['Distância (km)'] = tabela_raio['Distância (km)'].apply(lambda x: f"{x:,.0f}")
+    st.dataframe(tabela_raio, hide_index=True, use_container_width=True)
+st.caption(
+    f"Margem estimada = avaliação − preço (valor arrematado ou, sem arremate, lance inicial) − frete. "
+    f"Frete = distância em linha reta × {FATOR_ROTA} (estimativa da rota por estrada) × R$/km; "
+    f"os lotes ficam na sede do município."
+)
+marcar('busca por raio')
+
+st.markdown("---")
+st.subheader("🏙️ Segmentação por Município")
+
+municipio_opp = municipio_stats[['MUNICÍPIO', 'Qtd Lotes', 'Valor Total', 'Lotes Arrematados', 'Eficiência Média']].copy()
 
 municipio_opp['Taxa Arrematação'] = (municipio_opp['Lotes Arrematados'] / municipio_opp['Qtd Lotes'] * 100).round(1)
 
-def classificar_oportunidade(row):
-    if row['Taxa Arrematação'] < 50 and row['Valor Total'] > 100000:
-        return 'Alta Oportunidade'
-    elif row['Taxa Arrematação'] < 70 and row['Valor Total'] > 50000:
-        return 'Média Oportunidade'
-    else:
-        return 'Baixa Oportunidade'
+def classificar_oportunidade(taxa, valor_total):
+    return np.select(
+        [
+            (taxa < 50) & (valor_total > 100000),
+            (taxa < 70) & (valor_total > 50000)
+        ],
+        ['Alta Oportunidade', 'Média Oportunidade'],
+        default='Baixa Oportunidade'
+    )
 
-municipio_opp['Classificação'] = municipio_opp.apply(classificar_oportunidade, axis=1)
+municipio_opp['Classificação'] = classificar_oportunidade(municipio_opp['Taxa Arrematação'], municipio_opp['Valor Total'])
 
 fig_oportunidades_municipio = px.scatter(
     municipio_opp,
@@ -270,6 +317,7 @@ fig_oportunidades_municipio = px.scatter(
 )
 
 st.plotly_chart(fig_oportunidades_municipio, use_container_width=True)
+marcar('gráfico: segmentação')
 
 st.markdown("---")
 st.subheader("💡 Recomendações Estratégicas")
@@ -291,6 +339,7 @@ if recomendacoes:
         st.info(rec)
 else:
     st.success("✅ Todas as regiões estão com boa performance!")
+marcar('recomendações')
 
 
 st.markdown("---")
@@ -324,6 +373,7 @@ else:
 
 fig_performance.update_layout(height=400, xaxis_tickangle=45)
 st.plotly_chart(fig_performance, use_container_width=True)
+marcar('gráfico: performance municipal')
 
 st.markdown("---")
 with st.expander("📋 Tabela Detalhada por Município"):
@@ -333,6 +383,7 @@ with st.expander("📋 Tabela Detalhada por Município"):
     tabela_display['Eficiência Média'] = tabela_display['Eficiência Média'].apply(lambda x: f"{x:.1%}")
     tabela_display['Taxa Arrematação'] = tabela_display['Taxa Arrematação'].apply(lambda x: f"{x}%")
     st.dataframe(tabela_display, use_container_width=True)
+marcar('tabela: municípios')
 
 
 st.sidebar.markdown("---")
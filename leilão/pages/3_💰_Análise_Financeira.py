@@ -3,55 +3,59 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from scipy import stats
+from nucleo.amostragem import MAXIMO_PONTOS_DISPERSAO, PONTOS_WEBGL, amostra_por_densidade
+from nucleo.ao_vivo import painel_ao_vivo
+from nucleo.cubo import CuboAgregado
+from nucleo.dados import (
+    VERSOES_EM_CACHE, aviso_linhas_em_memoria, carregar_cubo, carregar_dados, seletor_leiloes, versao_dados,
+)
+from nucleo.figuras import figura_em_cache
+from nucleo.filtros import IndiceFiltros
+from nucleo.instrumentacao import iniciar_execucao, marcar
+from nucleo.regressao import AcumuladorRegressao
 
 
 st.set_page_config(page_title="Análise Financeira - Leilão de Veículos", layout="wide")
+iniciar_execucao('financeira')
 
 st.title("💰 Análise Financeira - Leilão de Veículos")
 st.markdown("---")
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv('leilão/dados/tabela.csv')
-    currency_columns = ['AVALIAÇÃO', 'Lance Inicial', 'Valor da Arrematação']
-    
-    for col in currency_columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].str.replace('R$', '').str.replace('.', '').str.replace(',', '.').str.strip()
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df['Diferença Percentual'] = ((df['Valor da Arrematação'] - df['AVALIAÇÃO']) / df['AVALIAÇÃO']) * 100
-
-    df['Status Arrematação'] = df['Valor da Arrematação'].apply(lambda x: 'Arrematado' if pd.notna(x) else 'Não Arrematado')
-    
-    return df
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_indice(_df, versao):
+    return IndiceFiltros(_df, ['TIPO', 'MARCA', 'Status Arrematação'], faixa='AVALIAÇÃO')
 
 try:
-    df = load_data()
+    leiloes = seletor_leiloes()
+    aviso_linhas_em_memoria()
+    versao = versao_dados(leiloes)
+    # Diferença Percentual e Status Arrematação já vêm da carga compartilhada
+    df = carregar_dados(leiloes)
+    indice = carregar_indice(df, versao)
+    marcar('carga')
+    painel_ao_vivo(leiloes)
     
     st.sidebar.header("🔧 Filtros Financeiros")
     
     tipos = st.sidebar.multiselect(
         "Tipo de Veículo:",
-        options=df['TIPO'].unique(),
-        default=df['TIPO'].unique()
+        options=indice.valores('TIPO'),
+        default=indice.valores('TIPO')
     )
     
     marcas = st.sidebar.multiselect(
         "Marca:",
-        options=df['MARCA'].unique(),
-        default=df['MARCA'].unique()
+        options=indice.valores('MARCA'),
+        default=indice.valores('MARCA')
     )
     
     status_arrematacao = st.sidebar.multiselect(
         "Status de Arrematação:",
-        options=df['Status Arrematação'].unique(),
-        default=df['Status Arrematação'].unique()
+        options=indice.valores('Status Arrematação'),
+        default=indice.valores('Status Arrematação')
     )
     
-    min_avaliacao = float(df['AVALIAÇÃO'].min())
-    max_avaliacao = float(df['AVALIAÇÃO'].max())
+    min_avaliacao, max_avaliacao = indice.limites()
     
     faixa_avaliacao = st.sidebar.slider(
         "Faixa de Valor de Avaliação (R$):",
@@ -60,37 +64,48 @@ try:
         value=(min_avaliacao, max_avaliacao)
     )
     
-    df_filtered = df[
-        (df['TIPO'].isin(tipos)) & 
-        (df['MARCA'].isin(marcas)) &
-        (df['Status Arrematação'].isin(status_arrematacao)) &
-        (df['AVALIAÇÃO'] >= faixa_avaliacao[0]) &
-        (df['AVALIAÇÃO'] <= faixa_avaliacao[1])
-    ]
+    filtros_cubo = {
+        'TIPO': tipos,
+        'MARCA': marcas,
+        'Status Arrematação': status_arrematacao
+    }
+    df_filtered = df[indice.mascara(filtros_cubo, faixa=faixa_avaliacao)]
+    # Chave das figuras em cache: tudo o que muda as linhas filtradas
+    filtros = (filtros_cubo, faixa_avaliacao)
+    marcar('filtros')
+    
+    if tuple(faixa_avaliacao) == (min_avaliacao, max_avaliacao):
+        cubo = carregar_cubo(leiloes).filtrar(filtros_cubo)
+    else:
+        # A faixa do slider não é dimensão do cubo: agrega só as linhas já filtradas
+        cubo = CuboAgregado.de_linhas(df_filtered)
+    total = cubo.total()
+    total_arrematados = cubo.filtrar({'Status Arrematação': ['Arrematado']}).total()
+    marcar('agregação: cubo')
     
     st.subheader("📊 Métricas Financeiras Principais")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_avaliacao = df_filtered['AVALIAÇÃO'].sum()
+        total_avaliacao = total['soma_avaliacao']
         st.metric("Valor Total em Avaliação", f"R$ {total_avaliacao:,.0f}")
     
     with col2:
-        total_arrematado = df_filtered['Valor da Arrematação'].sum()
+        total_arrematado = total['soma_arrematacao']
         st.metric("Valor Total Arrematado", f"R$ {total_arrematado:,.0f}")
     
     with col3:
-        taxa_arrematacao = (df_filtered['Valor da Arrematação'].notna().sum() / len(df_filtered)) * 100
+        taxa_arrematacao = total['taxa_arrematacao'] * 100
         st.metric("Taxa de Arrematação", f"{taxa_arrematacao:.1f}%")
     
     with col4:
-        df_arrematados = df_filtered[df_filtered['Status Arrematação'] == 'Arrematado']
-        if len(df_arrematados) > 0:
-            desconto_medio = ((df_arrematados['AVALIAÇÃO'] - df_arrematados['Valor da Arrematação']).mean() / df_arrematados['AVALIAÇÃO'].mean()) * 100
+        if total_arrematados['qtd_arrematados'] > 0:
+            desconto_medio = (1 - total_arrematados['soma_arrematacao'] / total_arrematados['soma_avaliacao']) * 100
             st.metric("Desconto Médio", f"{desconto_medio:.1f}%")
         else:
             st.metric("Desconto Médio", "N/A")
+    marcar('métricas')
     
     st.subheader("📈 Gráfico de Dispersão: Avaliação vs Arrematação")
     
@@ -98,77 +113,104 @@ try:
     
     if not df_dispersao.empty:
        
-        correlacao = df_dispersao['AVALIAÇÃO'].corr(df_dispersao['Valor da Arrematação'])
+        # Correlação e regressão saem das somas acumuladas no cubo, sem reler as linhas
+        regressao = AcumuladorRegressao.de_totais(total_arrematados)
+        correlacao = regressao.r
         
         x = df_dispersao['AVALIAÇÃO']
         y = df_dispersao['Valor da Arrematação']
         
         mask = ~np.isnan(x) & ~np.isnan(y)
         x_clean = x[mask]
-        y_clean = y[mask]
         
-        if len(x_clean) > 1:
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x_clean, y_clean)
+        if regressao.n > 1:
+            slope, intercept = regressao.inclinacao, regressao.intercepto
             line = slope * x_clean + intercept
             
             equation = f"y = {slope:.4f}x + {intercept:.2f}"
-            r_squared = r_value**2
-            
-            fig_dispersao = px.scatter(
-                df_dispersao,
-                x='AVALIAÇÃO',
-                y='Valor da Arrematação',
-                color='TIPO',
-                size='AVALIAÇÃO',
-                hover_data=['MARCA', 'NOME_POPULAR', 'MUNICÍPIO'],
-                title=f'Relação entre Valor de Avaliação e Valor de Arrematação<br><sup>Correlação: {correlacao:.3f} | R²: {r_squared:.3f} | Equação: {equation}</sup>',
-                labels={
-                    'AVALIAÇÃO': 'Valor de Avaliação (R$)',
-                    'Valor da Arrematação': 'Valor de Arrematação (R$)',
-                    'TIPO': 'Tipo de Veículo'
-                }
-            )
+            r_squared = regressao.r2
+        
+        def montar_dispersao():
+            # Com muitos lotes o gráfico recebe uma amostra que preserva a densidade e
+            # usa WebGL; correlação, R² e a reta continuam calculados com todos os lotes
+            df_pontos = amostra_por_densidade(df_dispersao, 'AVALIAÇÃO', 'Valor da Arrematação')
+            modo_render = 'webgl' if len(df_pontos) > PONTOS_WEBGL else 'svg'
             
-            fig_dispersao.add_trace(
-                go.Scatter(
-                    x=x_clean,
-                    y=line,
-                    mode='lines',
-                    line=dict(color='red', width=3, dash='dash'),
-                    name=f'Linha de Tendência (R² = {r_squared:.3f})'
+            if regressao.n > 1:
+                fig_dispersao = px.scatter(
+                    df_pontos,
+                    x='AVALIAÇÃO',
+                    y='Valor da Arrematação',
+                    color='TIPO',
+                    size='AVALIAÇÃO',
+                    hover_data=['MARCA', 'NOME_POPULAR', 'MUNICÍPIO'],
+                    render_mode=modo_render,
+                    title=f'Relação entre Valor de Avaliação e Valor de Arrematação<br><sup>Correlação: {correlacao:.3f} | R²: {r_squared:.3f} | Equação: {equation}</sup>',
+                    labels={
+                        'AVALIAÇÃO': 'Valor de Avaliação (R$)',
+                        'Valor da Arrematação': 'Valor de Arrematação (R$)',
+                        'TIPO': 'Tipo de Veículo'
+                    }
                 )
-            )
             
-            max_val = max(df_dispersao['AVALIAÇÃO'].max(), df_dispersao['Valor da Arrematação'].max())
-            fig_dispersao.add_trace(
-                go.Scatter(
-                    x=[0, max_val],
-                    y=[0, max_val],
-                    mode='lines',
-                    line=dict(dash='dot', color='green', width=2),
-                    name='Linha de Igualdade (Avaliação = Arrematação)'
+                if len(x_clean) > PONTOS_WEBGL:
+                    # Uma reta só precisa dos extremos; um ponto por lote pesaria tanto quanto a nuvem
+                    x_linha = np.array([x_clean.min(), x_clean.max()])
+                    y_linha = slope * x_linha + intercept
+                else:
+                    x_linha, y_linha = x_clean, line
+                
+                fig_dispersao.add_trace(
+                    go.Scatter(
+                        x=x_linha,
+                        y=y_linha,
+                        mode='lines',
+                        line=dict(color='red', width=3, dash='dash'),
+                        name=f'Linha de Tendência (R² = {r_squared:.3f})'
+                    )
                 )
-            )
             
-        else:
-            # Caso não haja dados suficientes para regressão
-            fig_dispersao = px.scatter(
-                df_dispersao,
-                x='AVALIAÇÃO',
-                y='Valor da Arrematação',
-                color='TIPO',
-                size='AVALIAÇÃO',
-                hover_data=['MARCA', 'NOME_POPULAR', 'MUNICÍPIO'],
-                title=f'Relação entre Valor de Avaliação e Valor de Arrematação<br><sup>Correlação: {correlacao:.3f}</sup>',
-                labels={
-                    'AVALIAÇÃO': 'Valor de Avaliação (R$)',
-                    'Valor da Arrematação': 'Valor de Arrematação (R$)',
-                    'TIPO': 'Tipo de Veículo'
-                }
-            )
+                max_val = max(df_dispersao['AVALIAÇÃO'].max(), df_dispersao['Valor da Arrematação'].max())
+                fig_dispersao.add_trace(
+                    go.Scatter(
+                        x=[0, max_val],
+                        y=[0, max_val],
+                        mode='lines',
+                        line=dict(dash='dot', color='green', width=2),
+                        name='Linha de Igualdade (Avaliação = Arrematação)'
+                    )
+                )
+                
+            else:
+                # Caso não haja dados suficientes para regressão
+                fig_dispersao = px.scatter(
+                    df_pontos,
+                    x='AVALIAÇÃO',
+                    y='Valor da Arrematação',
+                    color='TIPO',
+                    size='AVALIAÇÃO',
+                    hover_data=['MARCA', 'NOME_POPULAR', 'MUNICÍPIO'],
+                    render_mode=modo_render,
+                    title=f'Relação entre Valor de Avaliação e Valor de Arrematação<br><sup>Correlação: {correlacao:.3f}</sup>',
+                    labels={
+                        'AVALIAÇÃO': 'Valor de Avaliação (R$)',
+                        'Valor da Arrematação': 'Valor de Arrematação (R$)',
+                        'TIPO': 'Tipo de Veículo'
+                    }
+                )
         
-        fig_dispersao.update_layout(height=600)
+            fig_dispersao.update_layout(height=600)
+            return fig_dispersao
+        
+        fig_dispersao = figura_em_cache('dispersao', versao, filtros, montar_dispersao)
         st.plotly_chart(fig_dispersao, use_container_width=True)
+        marcar('gráfico: dispersão')
+        if len(df_dispersao) > MAXIMO_PONTOS_DISPERSAO:
+            st.caption(
+                f"Exibindo uma amostra de até {MAXIMO_PONTOS_DISPERSAO:,} dos {len(df_dispersao):,} lotes arrematados, "
+                "com a mesma fração de cada região do gráfico (e todos os pontos isolados); "
+                "correlação e linha de tendência usam todos os lotes."
+            )
         
         st.markdown("**📋 Análise da Correlação:**")
         
@@ -186,7 +228,7 @@ try:
         direcao = "positiva" if correlacao > 0 else "negativa"
         
         st.write(f"- **Coeficiente de correlação (r):** {correlacao:.3f}")
-        if len(x_clean) > 1:
+        if regressao.n > 1:
             st.write(f"- **Coeficiente de determinação (R²):** {r_squared:.3f}")
         st.write(f"- **Força da relação:** {forca}")
         st.write(f"- **Direção da relação:** {direcao}")
@@ -200,15 +242,18 @@ try:
             st.write("🔍 A relação é fraca: outros fatores além do valor de avaliação podem estar influenciando mais os valores de arrematação.")
 
         st.markdown("**📊 Estatísticas Adicionais:**")
-        acima_linha = len(df_dispersao[df_dispersao['Valor da Arrematação'] > df_dispersao['AVALIAÇÃO']])
-        percentual_acima = (acima_linha / len(df_dispersao)) * 100
+        qtd_dispersao = int(total_arrematados['qtd_lotes'])
+        acima_linha = int(total_arrematados['qtd_acima_avaliacao'])
+        percentual_acima = (acima_linha / qtd_dispersao) * 100
         
         st.write(f"- **Lotes arrematados acima do valor de avaliação:** {acima_linha} ({percentual_acima:.1f}%)")
-        st.write(f"- **Lotes arrematados abaixo do valor de avaliação:** {len(df_dispersao) - acima_linha} ({(100 - percentual_acima):.1f}%)")
+        st.write(f"- **Lotes arrematados abaixo do valor de avaliação:** {qtd_dispersao - acima_linha} ({(100 - percentual_acima):.1f}%)")
         
-        if len(df_dispersao) > 0:
-            desconto_medio_real = ((df_dispersao['AVALIAÇÃO'] - df_dispersao['Valor da Arrematação']).mean() / df_dispersao['AVALIAÇÃO'].mean()) * 100
+        if qtd_dispersao > 0:
+            diferenca_media = (regressao.soma_x - regressao.soma_y) / regressao.n if regressao.n else np.nan
+            desconto_medio_real = (diferenca_media / total_arrematados['media_avaliacao']) * 100
             st.write(f"- **Desconto médio nos lotes arrematados:** {desconto_medio_real:.1f}%")
+        marcar('correlação')
         
     else:
         st.warning("⚠️ Não há dados de lotes arrematados para exibir o gráfico de dispersão.")
@@ -223,29 +268,35 @@ try:
         df_boxplot = df_filtered[df_filtered['Status Arrematação'] == 'Arrematado']
         
         if not df_boxplot.empty:
-            fig_boxplot = px.box(
-                df_boxplot,
-                x='TIPO',
-                y='Valor da Arrematação',
-                color='TIPO',
-                points="all",
-                hover_data=['MARCA', 'NOME_POPULAR'],
-                title='Distribuição dos Valores de Arrematação por Tipo de Veículo',
-                labels={
-                    'TIPO': 'Tipo de Veículo',
-                    'Valor da Arrematação': 'Valor de Arrematação (R$)'
-                }
-            )
+            def montar_boxplot():
+                fig_boxplot = px.box(
+                    df_boxplot,
+                    x='TIPO',
+                    y='Valor da Arrematação',
+                    color='TIPO',
+                    points="all",
+                    hover_data=['MARCA', 'NOME_POPULAR'],
+                    title='Distribuição dos Valores de Arrematação por Tipo de Veículo',
+                    labels={
+                        'TIPO': 'Tipo de Veículo',
+                        'Valor da Arrematação': 'Valor de Arrematação (R$)'
+                    }
+                )
+            
+                fig_boxplot.update_layout(height=500)
+                return fig_boxplot
             
-            fig_boxplot.update_layout(height=500)
+            fig_boxplot = figura_em_cache('boxplot', versao, filtros, montar_boxplot)
             st.plotly_chart(fig_boxplot, use_container_width=True)
+            marcar('gráfico: boxplot')
             
 
             st.markdown("**📊 Estatísticas por Tipo:**")
-            stats_by_type = df_boxplot.groupby('TIPO')['Valor da Arrematação'].agg(['mean', 'median', 'min', 'max', 'count']).round(2)
+            stats_by_type = df_boxplot.groupby('TIPO', observed=True)['Valor da Arrematação'].agg(['mean', 'median', 'min', 'max', 'count']).round(2)
             for tipo in stats_by_type.index:
                 stats = stats_by_type.loc[tipo]
                 st.write(f"**{tipo}:** {stats['count']} lotes, Média=R${stats['mean']:,.0f}, Mediana=R${stats['median']:,.0f}")
+            marcar('agregação: estatísticas por tipo')
         else:
             st.warning("⚠️ Não há dados de lotes arrematados para exibir o boxplot.")
     
@@ -254,11 +305,9 @@ try:
         st.subheader("🏙️ Valores Médios por Município")
         
 
-        municipio_stats = df_filtered.groupby('MUNICÍPIO').agg({
-            'AVALIAÇÃO': 'mean',
-            'Valor da Arrematação': 'mean',
-            'LOTE': 'count'
-        }).round(2).reset_index()
+        municipio_stats = cubo.agregar(['MUNICÍPIO'])[[
+            'MUNICÍPIO', 'media_avaliacao', 'media_arrematacao', 'qtd_lotes'
+        ]].round(2)
         
         municipio_stats.columns = ['Município', 'Avaliação Média', 'Arrematação Média', 'Quantidade de Lotes']
         
@@ -297,12 +346,14 @@ try:
         fig_linhas.update_xaxes(tickangle=45)
         
         st.plotly_chart(fig_linhas, use_container_width=True)
+        marcar('gráfico: médias por município')
         
         st.markdown("**📋 Resumo por Município:**")
         display_stats = municipio_stats.copy()
         display_stats['Avaliação Média'] = display_stats['Avaliação Média'].apply(lambda x: f"R$ {x:,.0f}" if pd.notna(x) else "N/A")
         display_stats['Arrematação Média'] = display_stats['Arrematação Média'].apply(lambda x: f"R$ {x:,.0f}" if pd.notna(x) else "N/A")
         st.dataframe(display_stats, use_container_width=True)
+        marcar('tabela: resumo por município')
     
     st.subheader("📈 Análise de Desempenho Financeiro")
     
@@ -329,6 +380,7 @@ try:
             st.metric("Maior Arrematação", 
                      f"R$ {maior_valor['Valor da Arrematação']:,.0f}",
                      f"{maior_valor['NOME_POPULAR']} - {maior_valor['MUNICÍPIO']}")
+        marcar('métricas de desempenho')
     
     st.subheader("🏆 Top 10 Maiores Arrematações")
     
@@ -344,6 +396,7 @@ try:
         top_arrematacoes['Diferença Percentual'] = top_arrematacoes['Diferença Percentual'].apply(lambda x: f"{x:.1f}%")
         
         st.dataframe(top_arrematacoes, use_container_width=True)
+        marcar('tabela: top 10')
     else:
         st.info("ℹ️ Não há dados de arrematações para exibir o ranking.")
 
@@ -356,6 +409,7 @@ try:
         file_name="dados_financeiros_filtrados.csv",
         mime="text/csv"
     )
+    marcar('download')
 
 except FileNotFoundError:
     st.error("❌ Arquivo 'tabela.csv' não encontrado. Certifique-se de que o arquivo está no diretório correto.")
@@ -1,69 +1,64 @@
-import pandas as pd
 import streamlit as st
-import plotly.express as px
+import numpy as np
+from nucleo.banco import lances_estrategicos, lotes_sql
+from nucleo.bootstrap import NIVEL_CONFIANCA, REAMOSTRAGENS, intervalos_por_tipo
+from nucleo.dados import (
+    MOTOR_SQL, VERSOES_EM_CACHE, carregar_cubo, carregar_dados, seletor_leiloes, versao_consolidada, versao_dados,
+)
+from nucleo.esbocos import CATEGORIA_TOTAL, esbocos_lances
+from nucleo.instrumentacao import iniciar_execucao, marcar
+from nucleo.simulacao import PremissasAluguel, simular_aluguel
 
-@st.cache_data
-def load_data():
+def load_data(leiloes=None):
     """
-    Carrega e limpa os dados - CORRIGIDO
+    Total de lotes e os lotes usados pelas análises: caminhões e arrematados.
+    Com o motor SQL só essas linhas e colunas saem do banco; sem ele, as
+    análises recebem a tabela compartilhada e filtram por conta própria
     """
     try:
-        df = pd.read_csv('leilão/dados/tabela.csv')
+        if MOTOR_SQL:
+            caminhoes = lotes_sql(
+                leiloes, ['TIPO', 'NOME_POPULAR', 'AVALIAÇÃO', 'Valor da Arrematação'], tipo='Caminhão'
+            )
+            arrematados = lotes_sql(leiloes, ['TIPO', 'Valor da Arrematação'], arrematados=True)
+            return carregar_cubo(leiloes).total()['qtd_lotes'], caminhoes, arrematados
         
-        currency_columns = ['AVALIAÇÃO', 'Lance Inicial', 'Valor da Arrematação']
-        
-        for col in currency_columns:
-            if df[col].dtype == 'object':
-                df[col] = df[col].str.replace('R$', '', regex=False)
-                df[col] = df[col].str.replace('.', '', regex=False)
-                df[col] = df[col].str.replace(',', '.', regex=False)
-                df[col] = df[col].str.strip()
-            
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        return df
+        df = carregar_dados(leiloes)
+        return len(df), df, df
     
     except FileNotFoundError:
         st.error("❌ Arquivo 'tabela.csv' não encontrado.")
         st.info("💡 Certifique-se de que o arquivo está na mesma pasta do script.")
         return None
 
-def calcular_lances_estrategicos(df):
+def calcular_lances_estrategicos(esbocos):
     """
-    Calcula lances estratégicos baseados na análise histórica - CORRIGIDO
+    Calcula lances estratégicos a partir dos esboços de quantis por categoria
+    (nucleo/esbocos.py), combinados das partições dos leilões selecionados
     """
-    if df is None:
+    if not esbocos:
         return {}
     
-    df_arrematados = df[df['Valor da Arrematação'].notna()]
-    
-    if len(df_arrematados) == 0:
+    if esbocos[CATEGORIA_TOTAL].n == 0:
         st.warning("⚠️ Nenhum veículo foi arrematado nos dados.")
         return {}
     
     estrategia = {}
     
-    for categoria in ['Total', 'Carro', 'Moto', 'Caminhão']:
-        if categoria == 'Total':
-            dados = df_arrematados
-        else:
-            dados = df_arrematados[df_arrematados['TIPO'] == categoria]
+    for categoria in [CATEGORIA_TOTAL, 'Carro', 'Moto', 'Caminhão']:
+        esboco = esbocos.get(categoria)
         
-        if len(dados) > 0:
+        if esboco is not None and esboco.n > 0:
             try:
-                valores_validos = dados['Valor da Arrematação'].dropna()
-                if len(valores_validos) == 0:
-                    continue
-                
-                media_arremate = valores_validos.mean()
-                mediana_arremate = valores_validos.median()
-                percentil_75 = valores_validos.quantile(0.75)
-                percentil_90 = valores_validos.quantile(0.90)
+                media_arremate = esboco.media
+                mediana_arremate = esboco.quantil(0.5)
+                percentil_75 = esboco.quantil(0.75)
+                percentil_90 = esboco.quantil(0.90)
                 
                 lance_recomendado = percentil_75
                 lance_maximo = percentil_90
                 
-                taxa_sucesso = (len(valores_validos[valores_validos <= lance_recomendado]) / len(valores_validos)) * 100
+                taxa_sucesso = esboco.posto(lance_recomendado) * 100
                 
                 estrategia[categoria] = {
                     'media_arremate': media_arremate,
@@ -71,7 +66,7 @@ def calcular_lances_estrategicos(df):
                     'lance_competitivo': lance_recomendado,
                     'lance_maximo': lance_maximo,
                     'taxa_sucesso_estimada': taxa_sucesso,
-                    'amostra': len(dados)
+                    'amostra': esboco.n
                 }
                 
             except Exception as e:
@@ -80,6 +75,23 @@ def calcular_lances_estrategicos(df):
     
     return estrategia
 
+@st.cache_data(max_entries=VERSOES_EM_CACHE, show_spinner="Calculando intervalos de confiança...")
+def calcular_intervalos(_df, versao):
+    """
+    Intervalos de confiança por bootstrap de média, mediana, p75 e p90 por
+    categoria, calculados uma vez por versão consolidada dos dados: no modo
+    ao vivo, refeitos a cada consolidação dos deltas, não a cada resultado
+    """
+    return intervalos_por_tipo(_df[_df['Valor da Arrematação'].notna()])
+
+def mostrar_intervalo(intervalos, categoria, estatistica='p75'):
+    """
+    Legenda com o intervalo de confiança de uma estatística da categoria
+    """
+    intervalo = intervalos.get(categoria, {}).get(estatistica)
+    if intervalo:
+        st.caption(f"IC {NIVEL_CONFIANCA:.0%}: R\\$ {intervalo[0]:,.0f} – R\\$ {intervalo[1]:,.0f}")
+
 def analise_viabilidade_caminhoes(df):
     """
     Analisa a viabilidade de entrar no ramo de aluguel de caminhões - CORRIGIDO
@@ -137,19 +149,108 @@ def analise_viabilidade_caminhoes(df):
         st.error(f"Erro na análise de viabilidade: {e}")
         return None
 
+def premissas_simulacao():
+    """
+    Controles da simulação de aluguel na barra lateral; None se desligada
+    """
+    st.sidebar.markdown("---")
+    if not st.sidebar.toggle("🎲 Simular aluguel de caminhões", value=False):
+        return None
+    
+    padrao = PremissasAluguel()
+    diaria_media = st.sidebar.slider("Diária média (R$)", 200, 2000, int(padrao.diaria_media), step=50)
+    diaria_desvio = st.sidebar.slider("Desvio da diária (R$)", 0, 600, int(padrao.diaria_desvio), step=25)
+    utilizacao = st.sidebar.slider(
+        "Dias alugados por mês", 0, 30, (int(padrao.utilizacao_minima), int(padrao.utilizacao_maxima))
+    )
+    manutencao = st.sidebar.slider(
+        "Manutenção (% da receita)", 0, 90,
+        (int(padrao.manutencao_minima * 100), int(padrao.manutencao_maxima * 100)), step=5
+    )
+    horizonte = st.sidebar.slider("Horizonte (meses)", 6, 60, padrao.horizonte_meses, step=6)
+    cenarios = st.sidebar.select_slider(
+        "Cenários", options=[100_000, 200_000, 500_000, 1_000_000], value=padrao.cenarios,
+        format_func=lambda n: f"{n:,}".replace(',', '.')
+    )
+    
+    return PremissasAluguel(
+        diaria_media=diaria_media,
+        diaria_desvio=diaria_desvio,
+        utilizacao_minima=utilizacao[0],
+        utilizacao_maxima=utilizacao[1],
+        manutencao_minima=manutencao[0] / 100,
+        manutencao_maxima=manutencao[1] / 100,
+        horizonte_meses=horizonte,
+        cenarios=cenarios,
+    )
+
+@st.cache_data(max_entries=32, show_spinner="Simulando cenários...")
+def simular_caminhoes(_df, versao, premissas):
+    """
+    Simulação Monte Carlo memoizada por versão dos dados e premissas
+    """
+    caminhoes = _df[_df['TIPO'] == 'Caminhão']
+    return simular_aluguel(caminhoes['Valor da Arrematação'].to_numpy(), premissas)
+
+def mostrar_simulacao(simulacao, premissas):
+    """
+    Percentis de payback e ROI e a probabilidade de prejuízo no horizonte
+    """
+    def meses(valor):
+        return f"{valor:.1f} meses" if np.isfinite(valor) else "nunca"
+    
+    st.subheader("🎲 Simulação Monte Carlo")
+    cenarios = f"{simulacao['cenarios']:,}".replace(',', '.')
+    st.caption(
+        f"{cenarios} cenários sorteando um dos {simulacao['amostra']} caminhões arrematados, "
+        "a diária, os dias alugados e a manutenção. Payback sobre o lucro líquido."
+    )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Payback Mediano", meses(simulacao['payback_meses'][50]))
+        st.caption(f"90% dos cenários: {meses(simulacao['payback_meses'][5])} a {meses(simulacao['payback_meses'][95])}")
+    with col2:
+        st.metric("ROI Anual Mediano", f"{simulacao['roi_anual'][50]:.1f}%")
+        st.caption(f"90% dos cenários: {simulacao['roi_anual'][5]:.1f}% a {simulacao['roi_anual'][95]:.1f}%")
+    with col3:
+        st.metric(f"Prejuízo em {premissas.horizonte_meses} meses", f"{simulacao['prob_prejuizo'] * 100:.1f}%")
+        st.caption("Probabilidade de o lucro acumulado não cobrir o preço do caminhão")
+    
+    st.dataframe(
+        [
+            {'Percentil': f"p{p}", 'Payback': meses(simulacao['payback_meses'][p]),
+             'ROI Anual': f"{simulacao['roi_anual'][p]:.1f}%"}
+            for p in simulacao['payback_meses']
+        ],
+        hide_index=True, use_container_width=True
+    )
+
 def show_estrategia():
+    iniciar_execucao('estrategia')
     st.title("🎯 Estratégia de Lances & Viabilidade")
     st.markdown("---")
     
-    df = load_data()
+    leiloes = seletor_leiloes()
+    dados = load_data(leiloes)
     
-    if df is None:
+    if dados is None:
         st.stop()
     
-    st.sidebar.info(f"📊 **Dados Carregados:** {len(df)} veículos")
+    total_lotes, caminhoes, arrematados = dados
+    st.sidebar.info(f"📊 **Dados Carregados:** {int(total_lotes)} veículos")
+    marcar('carga')
     
-    estrategia = calcular_lances_estrategicos(df)
-    viabilidade_caminhoes = analise_viabilidade_caminhoes(df)
+    if MOTOR_SQL:
+        estrategia = lances_estrategicos(leiloes)
+    else:
+        estrategia = calcular_lances_estrategicos(esbocos_lances(leiloes))
+    marcar('agregação: lances')
+    viabilidade_caminhoes = analise_viabilidade_caminhoes(caminhoes)
+    marcar('agregação: viabilidade')
+    intervalos = calcular_intervalos(arrematados, versao_consolidada(versao_dados(leiloes)))
+    marcar('agregação: intervalos bootstrap')
+    premissas = premissas_simulacao()
     
     if not estrategia:
         st.error("❌ Não foi possível calcular estratégias. Verifique os dados.")
@@ -163,6 +264,7 @@ def show_estrategia():
         st.subheader("🚗 Carros")
         if 'Carro' in estrategia:
             st.metric("Lance Competitivo", f"R$ {estrategia['Carro']['lance_competitivo']:,.0f}")
+            mostrar_intervalo(intervalos, 'Carro')
             st.metric("Taxa de Sucesso", f"{estrategia['Carro']['taxa_sucesso_estimada']:.1f}%")
         else:
             st.warning("Sem dados")
@@ -171,6 +273,7 @@ def show_estrategia():
         st.subheader("🏍️ Motos")
         if 'Moto' in estrategia:
             st.metric("Lance Competitivo", f"R$ {estrategia['Moto']['lance_competitivo']:,.0f}")
+            mostrar_intervalo(intervalos, 'Moto')
             st.metric("Taxa de Sucesso", f"{estrategia['Moto']['taxa_sucesso_estimada']:.1f}%")
         else:
             st.warning("Sem dados")
@@ -179,6 +282,7 @@ def show_estrategia():
         st.subheader("🚛 Caminhões")
         if 'Caminhão' in estrategia:
             st.metric("Lance Competitivo", f"R$ {estrategia['Caminhão']['lance_competitivo']:,.0f}")
+            mostrar_intervalo(intervalos, 'Caminhão')
             st.metric("Taxa de Sucesso", f"{estrategia['Caminhão']['taxa_sucesso_estimada']:.1f}%")
         else:
             st.warning("Sem dados")
@@ -187,17 +291,21 @@ def show_estrategia():
         st.subheader("📊 Base Estatística")
         if 'Total' in estrategia:
             st.metric("Amostra Total", estrategia['Total']['amostra'])
-            confianca = "Alta" if estrategia['Total']['amostra'] > 100 else "Média"
-            st.metric("Confiança", confianca)
+            intervalo = intervalos['Total'].get('p75')
+            if intervalo:
+                margem = (intervalo[1] - intervalo[0]) / 2 / estrategia['Total']['lance_competitivo'] * 100
+                st.metric(f"Margem do Lance (IC {NIVEL_CONFIANCA:.0%})", f"± {margem:.1f}%")
         else:
             st.warning("Sem dados")
+    marcar('métricas de lances')
     
     with st.expander("📈 Detalhes da Análise de Lances", expanded=False):
         st.subheader("Metodologia de Cálculo")
-        st.markdown("""
+        st.markdown(f"""
         - **Lance Competitivo**: Percentil 75 dos valores de arrematação históricos
         - **Taxa de Sucesso**: Percentual de arrematações abaixo do lance recomendado
         - **Base Estatística**: Quantidade de veículos arrematados na categoria
+        - **Intervalos de Confiança**: Bootstrap percentil com {REAMOSTRAGENS} reamostragens dos valores arrematados
         """)
         
         if 'Total' in estrategia:
@@ -217,8 +325,20 @@ def show_estrategia():
                     st.write(f"- Média: R$ {estrategia['Caminhão']['media_arremate']:,.0f}")
                     st.write(f"- Mediana: R$ {estrategia['Caminhão']['mediana_arremate']:,.0f}")
                     st.write(f"- Amostra: {estrategia['Caminhão']['amostra']} veículos")
+            
+            st.subheader(f"Intervalos de Confiança ({NIVEL_CONFIANCA:.0%})")
+            rotulos = {'media': 'Média', 'mediana': 'Mediana', 'p75': 'Lance Competitivo (p75)', 'p90': 'Lance Máximo (p90)'}
+            linhas = [
+                {'Categoria': categoria, 'Estatística': rotulo,
+                 'Inferior (R$)': f"{intervalos[categoria][chave][0]:,.0f}",
+                 'Superior (R$)': f"{intervalos[categoria][chave][1]:,.0f}"}
+                for categoria in ['Total', 'Carro', 'Moto', 'Caminhão'] if intervalos.get(categoria)
+                for chave, rotulo in rotulos.items()
+            ]
+            st.dataframe(linhas, hide_index=True, use_container_width=True)
+            marcar('tabela: intervalos de confiança')
     
-    with st.expander("🚛 Oportunidade: Aluguel de Caminhões", expanded=False):
+    with st.expander("🚛 Oportunidade: Aluguel de Caminhões", expanded=premissas is not None):
         if viabilidade_caminhoes:
             st.success("**✅ VIÁVEL - Análise Positiva**")
             
@@ -246,6 +366,14 @@ def show_estrategia():
             """)
         else:
             st.warning("⚠️ Dados insuficientes para análise de caminhões")
+        
+        if premissas is not None:
+            simulacao = simular_caminhoes(caminhoes, versao_dados(leiloes), premissas)
+            if simulacao:
+                mostrar_simulacao(simulacao, premissas)
+            marcar('simulação')
+        else:
+            st.caption("💡 Ative a simulação na barra lateral para variar diária, utilização e manutenção.")
     
     with st.expander("📋 Plano de Ação Recomendado", expanded=False):
         lance_caminhao = estrategia.get('Caminhão', {}).get('lance_competitivo', 'N/A')
@@ -272,6 +400,7 @@ def show_estrategia():
         """)
         
         st.success("**Conclusão Final:** Foco em caminhões para aluguel apresenta melhor relação risco-retorno")
+    marcar('plano de ação')
 
 if __name__ == "__main__":
 
@@ -1,5 +1,6 @@
 import streamlit as st
 from PIL import Image
+from nucleo.instrumentacao import iniciar_execucao, marcar
 
 def sobre_page():
     st.title("👨‍💻 Sobre o Projeto")
@@ -140,5 +141,7 @@ def sobre_page():
     except:
         st.info("Logo da UFBA")
         
+iniciar_execucao('sobre')
 sobre_page()
+marcar('conteúdo')
 
@@ -1,31 +1,46 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.express as px
 import plotly.graph_objects as go
+from nucleo.ao_vivo import painel_ao_vivo
+from nucleo.banco import lotes_sql, metricas_gerais
+from nucleo.dados import MOTOR_SQL, VERSOES_EM_CACHE, carregar_dados, seletor_leiloes, versao_dados
+from nucleo.graficos import mostrar_pizza_arrematacao
+from nucleo.instrumentacao import iniciar_execucao, marcar
+from nucleo.metricas import calcular_metricas_gerais
 st.set_page_config(layout="wide")
+iniciar_execucao('analise_geral')
 st.image("https://github.com/Thmeirelles/leil-o/blob/main/leil%C3%A3o/Imagens/ricardoauto.png")
-@st.cache_data
-def load_data():
-    return pd.read_csv("leilão/dados/tabela.csv")
 
-df = load_data()
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_metricas(_df, versao):
+    return calcular_metricas_gerais(_df)
+
+leiloes = seletor_leiloes()
+if MOTOR_SQL:
+    # Contagens e amostra de cores saem do banco, sem carregar as linhas
+    metricas = metricas_gerais(leiloes)
+    amostra_cores = lotes_sql(leiloes, ["COR", "COR_AJUSTADA"], limite=100)
+else:
+    df = carregar_dados(leiloes)
+    metricas = carregar_metricas(df, versao_dados(leiloes))
+    amostra_cores = df[["COR", "COR_AJUSTADA"]].head(100)
+marcar('carga')
 # Análise por Tipo de Veículo
 st.title("📊 Análise geral do leilão")
+painel_ao_vivo(leiloes)
 
-total_veiculos = len(df)
-carros = len(df[df["TIPO"] == "Carro"])
-motos = len(df[df["TIPO"] == "Moto"])
-caminhoes = len(df[df["TIPO"] == "Caminhão"])
+total_veiculos = metricas.total
+carros = metricas.lotes("Carro")
+motos = metricas.lotes("Moto")
+caminhoes = metricas.lotes("Caminhão")
 
 percentual_carros = (carros / total_veiculos) * 100
 percentual_motos = (motos / total_veiculos) * 100
 percentual_caminhoes = (caminhoes / total_veiculos) * 100
 
-total_cores = len(df)
-preta = len(df[df["COR"] == "PRETA"])
-vermelha = len(df[df["COR"] == "VERMELHA"])
-branca = len(df[df["COR"] == "BRANCA"])
+total_cores = metricas.total
+preta = metricas.lotes_cor("PRETA")
+vermelha = metricas.lotes_cor("VERMELHA")
+branca = metricas.lotes_cor("BRANCA")
 
 percentual_preta = (preta / total_cores) * 100
 percentual_vermelha = (vermelha / total_cores) * 100
@@ -44,6 +59,7 @@ with col3:
 with col4:
     st.metric("Caminhões", f"{caminhoes} ({percentual_caminhoes:.1f}%)")
 st.markdown("---")
+marcar('métricas por tipo')
 
 left_spacer, center_col, right_spacer = st.columns([1, 2, 1])
 with center_col:
@@ -86,6 +102,7 @@ with center_col:
         fig.update_yaxes(title_font=dict(size=14))
         
         st.plotly_chart(fig, use_container_width=True)
+        marcar('gráfico: tipos')
     st.markdown('</div>', unsafe_allow_html=True)
 #--------------------------------------------------------------------------
 st.markdown("---")
@@ -94,9 +111,9 @@ st.subheader("📊 Análise de Arrematações")
 tab1, tab2, tab3, tab4 = st.tabs(["Total", "🚗 Carros", "🏍️ Motos", "🚛 Caminhões"])
 
 with tab1:
-    total_veiculos = len(df)
-    arrematados = df["Valor da Arrematação"].notna().sum()
-    nao_arrematados = df["Valor da Arrematação"].isna().sum()
+    total_veiculos = metricas.total
+    arrematados = metricas.arrematados
+    nao_arrematados = metricas.nao_arrematados
 
     percentual_arrematados = (arrematados / total_veiculos) * 100
     percentual_nao_arrematados = (nao_arrematados / total_veiculos) * 100
@@ -112,21 +129,14 @@ with tab1:
     left_spacer, center_col, right_spacer = st.columns([1, 2, 1])
     with center_col:
         with st.expander("📊 Gráfico - Total",expanded=True):
-            fig, ax = plt.subplots()
-            labels = ['Arrematados', 'Não Arrematados']
-            sizes = [arrematados, nao_arrematados]
-            colors = ['#4CAF50', '#F44336']
-            ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            plt.title('Distribuição Geral de Veículos Arrematados', fontsize=14, fontweight='bold', pad=20)
-            st.pyplot(fig)
+            mostrar_pizza_arrematacao('Distribuição Geral de Veículos Arrematados', arrematados, nao_arrematados)
+            marcar('gráfico: pizza total')
     st.markdown("---")
 #--------------------------------------------------------------------------   
 with tab2:
-    df_carros = df[df["TIPO"] == "Carro"]
-    total_carros = len(df_carros)
-    arrematados_carros = df_carros["Valor da Arrematação"].notna().sum()
-    nao_arrematados_carros = df_carros["Valor da Arrematação"].isna().sum()
+    total_carros = metricas.lotes("Carro")
+    arrematados_carros = metricas.arrematados_tipo("Carro")
+    nao_arrematados_carros = metricas.nao_arrematados_tipo("Carro")
     
     percentual_arrematados_carros = (arrematados_carros / total_carros) * 100
     percentual_nao_arrematados_carros = (nao_arrematados_carros / total_carros) * 100
@@ -142,20 +152,13 @@ with tab2:
     left_spacer, center_col, right_spacer = st.columns([1, 2, 1])
     with center_col:
         with st.expander("📊 Gráfico - Carros",expanded=True):
-            fig, ax = plt.subplots()
-            labels = ['Arrematados', 'Não Arrematados']
-            sizes = [arrematados_carros, nao_arrematados_carros]
-            colors = ['#4CAF50', '#F44336']
-            ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            plt.title('Distribuição de Carros Arrematados', fontsize=14, fontweight='bold', pad=20)
-            st.pyplot(fig)
+            mostrar_pizza_arrematacao('Distribuição de Carros Arrematados', arrematados_carros, nao_arrematados_carros)
+            marcar('gráfico: pizza carros')
 
 with tab3:
-    df_motos = df[df["TIPO"] == "Moto"]
-    total_motos = len(df_motos)
-    arrematados_motos = df_motos["Valor da Arrematação"].notna().sum()
-    nao_arrematados_motos = df_motos["Valor da Arrematação"].isna().sum()
+    total_motos = metricas.lotes("Moto")
+    arrematados_motos = metricas.arrematados_tipo("Moto")
+    nao_arrematados_motos = metricas.nao_arrematados_tipo("Moto")
     
     percentual_arrematados_motos = (arrematados_motos / total_motos) * 100
     percentual_nao_arrematados_motos = (nao_arrematados_motos / total_motos) * 100
@@ -170,20 +173,13 @@ with tab3:
     left_spacer, center_col, right_spacer = st.columns([1, 2, 1])
     with center_col:
         with st.expander("📊 Gráfico - Motos",expanded=True):
-            fig, ax = plt.subplots()
-            labels = ['Arrematados', 'Não Arrematados']
-            sizes = [arrematados_motos, nao_arrematados_motos]
-            colors = ['#4CAF50', '#F44336']
-            ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            plt.title('Distribuição de Motos Arrematadas', fontsize=14, fontweight='bold', pad=20)
-            st.pyplot(fig)
+            mostrar_pizza_arrematacao('Distribuição de Motos Arrematadas', arrematados_motos, nao_arrematados_motos)
+            marcar('gráfico: pizza motos')
 
 with tab4:
-    df_caminhoes = df[df["TIPO"] == "Caminhão"]
-    total_caminhoes = len(df_caminhoes)
-    arrematados_caminhoes = df_caminhoes["Valor da Arrematação"].notna().sum()
-    nao_arrematados_caminhoes = df_caminhoes["Valor da Arrematação"].isna().sum()
+    total_caminhoes = metricas.lotes("Caminhão")
+    arrematados_caminhoes = metricas.arrematados_tipo("Caminhão")
+    nao_arrematados_caminhoes = metricas.nao_arrematados_tipo("Caminhão")
     
     percentual_arrematados_caminhoes = (arrematados_caminhoes / total_caminhoes) * 100
     percentual_nao_arrematados_caminhoes = (nao_arrematados_caminhoes / total_caminhoes) * 100
@@ -199,12 +195,11 @@ with tab4:
     with center_col:
         with st.expander("📊 Gráfico - Caminhões",expanded=True):
             st.write('Todos foram arrematados')
+            marcar('aba: caminhões')
 #--------------------------------------------------------------------------           
 # ANALISE CORES
 #--------------------------------------------------------------------------
 st.subheader("📊 Análise de Cores")
-cores_p = ["PRETA", "VERMELHA", "BRANCA", "PRATA", "AZUL", "CINZA"]
-df["COR_AJUSTADA"] = df["COR"].apply(lambda cor: cor if cor in cores_p else "OUTRAS")
 
 st.write("**Selecione as cores para visualizar:**")
 with st.container():
@@ -227,10 +222,10 @@ mapeamento_cores = {
 if not cores_selecionadas:
     st.warning("⚠️ Selecione pelo menos uma cor para visualizar o gráfico!")
 else:
-    df_filtrado = df[df["COR_AJUSTADA"].isin(cores_selecionadas)]
-    contagem_filtrada = df_filtrado["COR_AJUSTADA"].value_counts()
+    contagem_filtrada = metricas.distribuicao_cores(ajustada=True)
     
-    contagem_filtrada = contagem_filtrada.reindex(cores_selecionadas).fillna(0)
+    contagem_filtrada = contagem_filtrada.reindex(cores_selecionadas, fill_value=0)
+    marcar('filtro: cores')
     
     cores_barras = [mapeamento_cores[cor] for cor in contagem_filtrada.index]
     
@@ -267,6 +262,7 @@ else:
         showlegend=False
     )
     st.plotly_chart(fig, use_container_width=True)
+    marcar('gráfico: cores')
     
     col1, col2, col3 = st.columns(3)
     
@@ -299,22 +295,24 @@ else:
                 label="**Cor Mais Frequente**",
                 value="N/A"
             )
+    marcar('métricas: cores')
 #--------------------------------------------------------------------------
 # Seleção de dados brutos
 #--------------------------------------------------------------------------
 with st.expander("📋 Visualizar Dados Brutos"):
-    st.dataframe(df[["COR", "COR_AJUSTADA"]].head(100))
+    st.dataframe(amostra_cores)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.write("**Distribuição Original de Cores:**")
-        st.write(df["COR"].value_counts())
+        st.write(metricas.distribuicao_cores())
     
     with col2:
         st.write("**Distribuição Ajustada de Cores:**")
-        st.write(df["COR_AJUSTADA"].value_counts())
+        st.write(metricas.distribuicao_cores(ajustada=True))
 st.markdown("---")
+marcar('tabela: dados brutos')
 #--------------------------------------------------------------------------
 
 